@@ -0,0 +1,64 @@
+"""
+Compares the typed TimeSeries decoder with the pd.json_normalize path it replaced.
+
+Run from the gke_export_cli directory:
+
+    python -m benchmarks.bench_decoder --series 300 --points 1440
+"""
+import gc
+import time
+import tracemalloc
+
+import click
+import pandas as pd
+
+from benchmarks.synthetic import make_time_series_list
+from utils.decode import LABEL_FIELDS, decode_time_series
+
+# The flattening previously done in fetch_metrics_from_api
+JSON_NORMALIZE_META = [list(path) for _, path in LABEL_FIELDS]
+
+
+def decode_with_json_normalize(time_series):
+    return pd.json_normalize(time_series, record_path='points', meta=JSON_NORMALIZE_META, errors='ignore')
+
+
+def measure(decoder, time_series, repeat):
+    """
+    Returns the best wall time, peak traced allocation and result size of `decoder`.
+    """
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        df = decoder(time_series)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    df = decoder(time_series)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, df
+
+
+@click.command()
+@click.option('--series', default=300, show_default=True, help="Number of time series")
+@click.option('--points', default=1440, show_default=True, help="Points per time series")
+@click.option('--metric-type', default='kubernetes.io/container/memory/used_bytes', show_default=True, help="Metric type; '*_bytes' metrics use int64 values")
+@click.option('--repeat', default=3, show_default=True, help="Timed runs per decoder; the best is reported")
+def main(series, points, metric_type, repeat):
+    """Benchmark the TimeSeries decoders on synthetic data."""
+    time_series = make_time_series_list(metric_type, series, points)
+    click.echo(f"{series} series x {points} points = {series * points} rows ({metric_type})")
+    click.echo(f"{'decoder':<16}{'seconds':>10}{'rows/s':>14}{'peak MiB':>12}{'result MiB':>12}")
+
+    for name, decoder in (('json_normalize', decode_with_json_normalize), ('typed', decode_time_series)):
+        elapsed, peak, df = measure(decoder, time_series, repeat)
+        result_size = df.memory_usage(deep=True).sum()
+        click.echo(f"{name:<16}{elapsed:>10.3f}{len(df) / elapsed:>14,.0f}{peak / 2**20:>12.1f}{result_size / 2**20:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Measures the whole export pipeline, fetch_all_metrics and then save_dataframes, against a
+local stand-in for the Google APIs (see benchmarks/fake_api.py).
+
+Run from the gke_export_cli directory:
+
+    python -m benchmarks.bench_pipeline --series 200 --points 1440 --page-size 50 --latency-ms 50
+
+With --http-transport async the pages are requested through the async transport (see
+utils/async_http.py, needs httpx) instead of googleapiclient on the fetch threads.
+
+The first run warms the server's response cache and is not reported. Each stage reports
+its wall time, API pages, pages/s, rows, rows/s and the peak resident memory of the
+process while it ran.
+"""
+import gc
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import click
+import pandas as pd
+
+from benchmarks.fake_api import FakeApiServer
+from benchmarks.synthetic import SYNTHETIC_END_TIME, SYNTHETIC_WORKLOAD
+from utils.async_http import close_async_transport, set_endpoint_override
+from utils.clients import set_transport_factory
+from utils.encoding import with_change_points
+from utils.fetch_gke_metrics import DEFAULT_MAX_WORKERS, METRICS_INFO, fetch_all_metrics
+from utils.file import StreamingWriter, save_dataframes
+from utils.run_report import PeakRss
+from utils.scheduler import configure_scheduler, get_scheduler
+
+
+def _api_calls() -> int:
+    return sum(stats['calls'] for stats in get_scheduler().stats().values())
+
+
+def _rows(metrics_data: dict) -> int:
+    rows = 0
+    for data in metrics_data.values():
+        if isinstance(data, Path):
+            rows += len(pd.read_parquet(data)) if data.suffix == '.parquet' else sum(1 for _ in open(data)) - 1
+        else:
+            rows += len(data)
+    return rows
+
+
+def run_pipeline(output_dir: Path, start_time: str, end_time: str, format: str, max_workers: int,
+                 shard_duration, stream: bool, http_transport: str = 'sync', metrics_info: dict = METRICS_INFO) -> list:
+    """
+    Runs fetch_all_metrics and save_dataframes once.
+
+    Returns:
+    - list: One (stage, seconds, pages, rows, peak RSS bytes) tuple per stage.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    writer_factory = None
+    if stream:
+        writer_factory = lambda key: StreamingWriter(output_dir / f"bench_{key}.{format}", format)
+
+    gc.collect()
+    calls_before = _api_calls()
+    with PeakRss() as fetch_rss:
+        started = time.perf_counter()
+        metrics_data = fetch_all_metrics(
+            project_id=SYNTHETIC_WORKLOAD['project_id'],
+            location=SYNTHETIC_WORKLOAD['location'],
+            cluster_name=SYNTHETIC_WORKLOAD['cluster_name'],
+            namespace=SYNTHETIC_WORKLOAD['namespace'],
+            container_name='',
+            controller_name=SYNTHETIC_WORKLOAD['controller_name'],
+            controller_type=SYNTHETIC_WORKLOAD['controller_type'],
+            start_time=start_time,
+            end_time=end_time,
+            metrics_info=metrics_info,
+            max_workers=max_workers,
+            shard_duration=shard_duration,
+            writer_factory=writer_factory,
+            http_transport=http_transport
+        )
+        fetch_seconds = time.perf_counter() - started
+    fetch_pages = _api_calls() - calls_before
+    rows = _rows(metrics_data)
+
+    with PeakRss() as save_rss:
+        started = time.perf_counter()
+        save_dataframes(output_dir, format, metrics_data, 'bench', False)
+        save_seconds = time.perf_counter() - started
+
+    return [
+        ('fetch', fetch_seconds, fetch_pages, rows, fetch_rss.peak),
+        ('save', save_seconds, 0, rows, save_rss.peak)
+    ]
+
+
+@click.command()
+@click.option('--series', default=200, show_default=True, help="Series per metric")
+@click.option('--points', default=1440, show_default=True, help="Points per series (one per minute)")
+@click.option('--page-size', default=50, show_default=True, help="Series per timeSeries.list page")
+@click.option('--latency-ms', default=50.0, show_default=True, help="Delay of each API response in milliseconds")
+@click.option('--pods', default=20, show_default=True, help="Pods returned by the asset APIs")
+@click.option('--format', type=click.Choice(['csv', 'parquet']), default='parquet', show_default=True, help="Output file format")
+@click.option('--max-workers', default=DEFAULT_MAX_WORKERS, show_default=True, help="Fetch threads")
+@click.option('--shard-hours', type=int, help="Fetch the time range in windows of this many hours")
+@click.option('--stream', is_flag=True, help="Write pages to the output files as they arrive")
+@click.option('--http-transport', type=click.Choice(['sync', 'async']), default='sync', show_default=True, help="How API pages are requested")
+@click.option('--change-points', is_flag=True, help="Export cpu_request and memory_request as change-point intervals")
+@click.option('--repeat', default=3, show_default=True, help="Measured runs after the warm-up run")
+def main(series, points, page_size, latency_ms, pods, format, max_workers, shard_hours, stream, http_transport, change_points, repeat):
+    """Benchmark the export pipeline against a local fake Monitoring and Asset API."""
+    end = SYNTHETIC_END_TIME
+    start_time = (end - timedelta(minutes=points)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    end_time = end.strftime('%Y-%m-%dT%H:%M:%SZ')
+    shard_duration = timedelta(hours=shard_hours) if shard_hours else None
+    metrics_info = with_change_points(METRICS_INFO) if change_points else METRICS_INFO
+
+    # Only the tool's own overhead is measured, so the request rates are not limited
+    configure_scheduler(rate_limits={'monitoring': 1e9, 'cloudasset': 1e9})
+
+    click.echo(f"{len(METRICS_INFO)} metrics x {series} series x {points} points, {page_size} series per page, "
+               f"{latency_ms:g} ms latency, {format}{', streamed' if stream else ''}, {http_transport} transport")
+
+    with FakeApiServer(series=series, page_size=page_size, latency=latency_ms / 1000, pods=pods) as server:
+        set_transport_factory(server.transport)
+        set_endpoint_override(f"http://127.0.0.1:{server.port}")
+        work_dir = Path(tempfile.mkdtemp(prefix='bench_pipeline_'))
+        try:
+            results = []
+            for run in range(repeat + 1):
+                run_dir = work_dir / f"run_{run}"
+                stages = run_pipeline(run_dir, start_time, end_time, format, max_workers, shard_duration, stream, http_transport, metrics_info)
+                shutil.rmtree(run_dir)
+                if run > 0:
+                    results.extend(stages)
+        finally:
+            close_async_transport()
+            set_transport_factory(None)
+            set_endpoint_override(None)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    click.echo(f"\n{'stage':<8}{'seconds':>10}{'pages':>8}{'pages/s':>10}{'rows':>12}{'rows/s':>14}{'peak RSS MiB':>14}")
+    for stage in ('fetch', 'save'):
+        runs = [result for result in results if result[0] == stage]
+        # The fastest run is reported; memory is the highest peak of all runs
+        _, seconds, pages, rows, _ = min(runs, key=lambda result: result[1])
+        peak = max(result[4] for result in runs)
+        pages_per_second = f"{pages / seconds:,.1f}" if pages else '-'
+        click.echo(f"{stage:<8}{seconds:>10.3f}{pages or '-':>8}{pages_per_second:>10}{rows:>12,}{rows / seconds:>14,.0f}{peak / 2**20:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
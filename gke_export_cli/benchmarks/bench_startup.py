@@ -0,0 +1,84 @@
+"""
+Measures the start-up time of the command line tools: how long `--help` and a rejected
+invocation take, each run in a fresh interpreter as a user would.
+
+Run from the gke_export_cli directory:
+
+    python -m benchmarks.bench_startup --repeat 10 --budget-ms 400
+
+It also checks that importing cli and fleet does not load the heavy dependencies
+(pandas, pyarrow, the Google API clients), which are only needed once an export runs.
+With --budget-ms the benchmark exits with an error if any median exceeds the budget.
+"""
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+
+# Modules which must not be imported by `import cli` or `import fleet`
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'googleapiclient', 'google.auth', 'httplib2']
+
+# Invocations measured, as arguments to the Python interpreter
+INVOCATIONS = {
+    'cli --help': ['cli.py', '--help'],
+    'cli invalid options': ['cli.py', '--start-time', '2024-08-22T00:00:00Z', '--end-time', '2024-08-23T00:00:00Z'],
+    'fleet --help': ['fleet.py', '--help'],
+    'python -c pass': ['-c', 'pass']
+}
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+
+
+def time_invocation(arguments: list, repeat: int) -> list:
+    """
+    Runs the interpreter with `arguments` `repeat` times.
+
+    Returns:
+    - list: The wall time of each run in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=PACKAGE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def heavy_imports(module: str) -> list:
+    """
+    Returns the heavy modules loaded by importing `module` in a fresh interpreter.
+    """
+    check = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', check], cwd=PACKAGE_DIR, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+@click.command()
+@click.option('--repeat', default=10, show_default=True, help="Runs per invocation")
+@click.option('--budget-ms', type=float, help="Fail if the median of any invocation exceeds this many milliseconds")
+def main(repeat, budget_ms):
+    """Benchmark the start-up time of cli.py and fleet.py."""
+    failed = False
+    for module in ('cli', 'fleet'):
+        loaded = heavy_imports(module)
+        if loaded:
+            failed = True
+            click.echo(f"import {module} loads heavy modules: {', '.join(loaded)}")
+
+    click.echo(f"{'invocation':<22}{'median ms':>12}{'max ms':>10}")
+    for name, arguments in INVOCATIONS.items():
+        timings = time_invocation(arguments, repeat)
+        median = statistics.median(timings)
+        over_budget = budget_ms is not None and name != 'python -c pass' and median > budget_ms
+        failed = failed or over_budget
+        click.echo(f"{name:<22}{median:>12.0f}{max(timings):>10.0f}{'  over budget' if over_budget else ''}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
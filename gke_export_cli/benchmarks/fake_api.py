@@ -0,0 +1,182 @@
+"""
+A local stand-in for the Cloud Monitoring and Cloud Asset APIs serving synthetic data.
+
+The server runs in its own process, so generating the responses does not count against
+the measured pipeline. Responses are cached per request URL; a warm-up run therefore
+leaves only the tool's own work and the configured latency in later runs.
+
+    with FakeApiServer(series=100, page_size=50, latency=0.05) as server:
+        set_transport_factory(server.transport)
+        fetch_all_metrics(...)
+"""
+import gzip
+import json
+import multiprocessing
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+
+from benchmarks.synthetic import make_pod_asset, make_time_series
+
+# Extracts the metric type from a timeSeries.list filter
+METRIC_TYPE_PATTERN = re.compile(r'metric\.type = "([^"]+)"')
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive connections, as with the real APIs
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.config['latency'])
+
+        with server.lock:
+            body = server.responses.get(self.path)
+        if body is None:
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path.endswith('/timeSeries'):
+                response = self._time_series_page(query)
+            elif url.path.endswith(':searchAllResources'):
+                response = self._asset_page(query, search=True)
+            elif url.path.endswith('/assets'):
+                response = self._asset_page(query, search=False)
+            else:
+                self.send_error(404)
+                return
+            body = gzip.compress(json.dumps(response).encode('utf-8'), compresslevel=1)
+            with server.lock:
+                server.responses[self.path] = body
+
+        # Responses are cached gzip compressed, as the APIs send them
+        headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            headers['Content-Encoding'] = 'gzip'
+        else:
+            body = gzip.decompress(body)
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _page(self, query, total, page_size):
+        offset = int(query.get('pageToken', ['0'])[0] or 0)
+        end = min(offset + page_size, total)
+        return range(offset, end), (str(end) if end < total else None)
+
+    def _time_series_page(self, query):
+        config = self.server.config
+        metric_type = METRIC_TYPE_PATTERN.search(query['filter'][0]).group(1)
+        start = _parse_time(query['interval.startTime'][0])
+        end = _parse_time(query['interval.endTime'][0])
+        period = int(query['aggregation.alignmentPeriod'][0].rstrip('s'))
+        points = int((end - start).total_seconds()) // period
+
+        indexes, next_token = self._page(query, config['series'], config['page_size'])
+        response = {'timeSeries': [make_time_series(metric_type, index, points, period, end) for index in indexes]}
+        if next_token:
+            response['nextPageToken'] = next_token
+        return response
+
+    def _asset_page(self, query, search):
+        config = self.server.config
+        indexes, next_token = self._page(query, config['pods'], config['asset_page_size'])
+        assets = [make_pod_asset(index) for index in indexes]
+        if search:
+            response = {'results': [
+                {'name': asset['name'], 'versionedResources': [{'version': 'v1', 'resource': asset['resource']['data']}]}
+                for asset in assets
+            ]}
+        else:
+            response = {'assets': assets}
+        if next_token:
+            response['nextPageToken'] = next_token
+        return response
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(config, ready):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.config = config
+    server.responses = {}
+    server.lock = threading.Lock()
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class LocalTransport:
+    """
+    An httplib2.Http compatible transport sending Google API requests to the local server.
+    """
+
+    def __init__(self, port: int):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.http = httplib2.Http()
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        url = urlparse(uri)
+        local_uri = f"{self.base_url}{url.path}" + (f"?{url.query}" if url.query else '')
+        return self.http.request(local_uri, method=method, body=body, headers=headers, **kwargs)
+
+
+class FakeApiServer:
+    """
+    Runs the local stand-in server in a child process.
+
+    Parameters:
+    - series (int): Number of series returned per metric.
+    - page_size (int): Series per timeSeries.list page.
+    - latency (float): Seconds each response is delayed by.
+    - pods (int): Number of pods returned by the asset APIs.
+    - asset_page_size (int): Pods per asset page.
+    """
+
+    def __init__(self, series: int = 100, page_size: int = 50, latency: float = 0.0, pods: int = 20, asset_page_size: int = 100):
+        self.config = {
+            'series': series,
+            'page_size': page_size,
+            'latency': latency,
+            'pods': pods,
+            'asset_page_size': asset_page_size
+        }
+        self.port = None
+        self._process = None
+
+    def start(self):
+        ready = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(self.config, ready), daemon=True)
+        self._process.start()
+        self.port = ready.get(timeout=30)
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def transport(self) -> LocalTransport:
+        """
+        Returns a new transport to the server; pass this method to set_transport_factory.
+        """
+        return LocalTransport(self.port)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+
+# Fixed end of the synthetic data so runs are reproducible
+SYNTHETIC_END_TIME = datetime(2024, 9, 1, tzinfo=timezone.utc)
+
+# Workload the synthetic series and pods belong to
+SYNTHETIC_WORKLOAD = {
+    'project_id': 'synthetic-project',
+    'location': 'us-central1',
+    'cluster_name': 'synthetic-cluster',
+    'namespace': 'default',
+    'controller_name': 'frontend',
+    'controller_type': 'Deployment'
+}
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _pod_name(index):
+    return f"{SYNTHETIC_WORKLOAD['controller_name']}-6d4cf56db6-{index:05d}"
+
+
+def make_time_series(metric_type, series_index, points, period_seconds=60, end_time=SYNTHETIC_END_TIME, int_values=None, constant=None):
+    """
+    Builds one synthetic TimeSeries object in the shape returned by timeSeries.list.
+
+    Parameters:
+    - metric_type (str): The metric type of the series.
+    - series_index (int): Index of the series, used to derive pod and container names.
+    - points (int): Number of points in the series, newest first.
+    - period_seconds (int): Spacing between points.
+    - end_time (datetime): End time of the newest point.
+    - int_values (bool): Use int64Value instead of doubleValue. Defaults to True for '*_bytes' metrics.
+    - constant (bool): Give every point of the series the same value, like resource requests.
+      Defaults to True for '*/request_*' metrics.
+
+    Returns:
+    - dict: The TimeSeries object.
+    """
+    if int_values is None:
+        int_values = metric_type.endswith('bytes')
+    if constant is None:
+        constant = '/request_' in metric_type
+
+    point_list = []
+    for index in range(points):
+        point_end = end_time - timedelta(seconds=period_seconds * index)
+        step = 0 if constant else index
+        if int_values:
+            value = {'int64Value': str(100_000_000 + (series_index * 7919 + step * 104729) % 50_000_000)}
+        else:
+            value = {'doubleValue': 0.05 + ((series_index * 31 + step * 17) % 1000) / 1000}
+        point_list.append({
+            'interval': {
+                'startTime': _format_time(point_end - timedelta(seconds=period_seconds)),
+                'endTime': _format_time(point_end)
+            },
+            'value': value
+        })
+
+    return {
+        'metric': {'type': metric_type},
+        'resource': {
+            'type': 'k8s_container',
+            'labels': {
+                'project_id': SYNTHETIC_WORKLOAD['project_id'],
+                'location': SYNTHETIC_WORKLOAD['location'],
+                'cluster_name': SYNTHETIC_WORKLOAD['cluster_name'],
+                'namespace_name': SYNTHETIC_WORKLOAD['namespace'],
+                'container_name': f'container-{series_index % 3}',
+                'pod_name': _pod_name(series_index)
+            }
+        },
+        'metadata': {
+            'systemLabels': {
+                'top_level_controller_name': SYNTHETIC_WORKLOAD['controller_name'],
+                'top_level_controller_type': SYNTHETIC_WORKLOAD['controller_type']
+            }
+        },
+        'metricKind': 'GAUGE',
+        'valueType': 'INT64' if int_values else 'DOUBLE',
+        'points': point_list
+    }
+
+
+def make_time_series_list(metric_type, series, points, **kwargs):
+    """
+    Builds `series` synthetic TimeSeries objects of `points` points each.
+    """
+    return [make_time_series(metric_type, index, points, **kwargs) for index in range(series)]
+
+
+def make_pod_asset(pod_index, containers=3):
+    """
+    Builds one synthetic k8s.io/Pod asset in the shape returned by assets.list, with the
+    pod resource data read by extract_container_info.
+
+    Returns:
+    - dict: The asset, with 'name' and 'resource.data'.
+    """
+    workload = SYNTHETIC_WORKLOAD
+    started = SYNTHETIC_END_TIME - timedelta(days=1, seconds=pod_index * 37)
+    name = (
+        f"//container.googleapis.com/projects/{workload['project_id']}/locations/{workload['location']}"
+        f"/clusters/{workload['cluster_name']}/k8s/namespaces/{workload['namespace']}/pods/{_pod_name(pod_index)}"
+    )
+    return {
+        'name': name,
+        'resource': {
+            'data': {
+                'metadata': {'name': _pod_name(pod_index), 'namespace': workload['namespace']},
+                'spec': {
+                    'containers': [
+                        {'name': f'container-{index}', **({'readinessProbe': {'httpGet': {'path': '/healthz'}}} if index == 0 else {})}
+                        for index in range(containers)
+                    ]
+                },
+                'status': {
+                    'conditions': [
+                        {'type': 'PodScheduled', 'status': 'True', 'lastTransitionTime': _format_time(started)},
+                        {'type': 'Ready', 'status': 'True', 'lastTransitionTime': _format_time(started + timedelta(seconds=20 + pod_index % 40))}
+                    ]
+                }
+            }
+        }
+    }
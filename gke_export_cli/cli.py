@@ -1,35 +1,212 @@
-import os
-from google.auth import default
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+# Only light modules are imported here so that --help and argument validation stay fast;
+# modules depending on pandas and the Google API clients are imported once they are needed
 import click
-import pandas as pd
-from utils.fetch_gke_metrics import fetch_all_metrics
-from utils.config import get_storage_directory, load_config, save_config
-from utils.file import save_dataframes  # Import the save utility
+from utils.options import (ALIGNMENT_PERIOD, DEFAULT_CACHE_MAX_BYTES, DEFAULT_MAX_WORKERS, DEFAULT_PARQUET_CODEC,
+                           GRANULARITIES, HTTP_TRANSPORTS, PARQUET_CODECS, parse_statistics)
+from utils.time_windows import (DEFAULT_MAX_POINTS_PER_SERIES, choose_alignment_period, format_duration,
+                                parse_duration, parse_resolution_tiers, parse_rfc3339, split_resolution_tiers)
+from utils.config import get_storage_directory, load_config
+from utils.archive import ARCHIVE_FORMATS, ArchiveWriter, archive_path_for
+from utils.checkpoint import load_run, start_checkpoint
+from utils.run_report import RUN_REPORT_SUFFIX, phase, start_run_report
 from pathlib import Path
 from datetime import datetime
+import sys
 import uuid
 
+
+def validate_duration(ctx, param, value):
+    """
+    Click callback converting a duration option such as '1d' to a timedelta.
+    """
+    if value is None:
+        return None
+    try:
+        return parse_duration(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def validate_alignment_period(ctx, param, value):
+    """
+    Click callback accepting 'auto' or a duration for the alignment period option.
+    """
+    if value is None or value.strip().lower() == 'auto':
+        return value and 'auto'
+    return validate_duration(ctx, param, value)
+
+
+def validate_resolution_tiers(ctx, param, value):
+    """
+    Click callback parsing the multi-resolution tiers option (see parse_resolution_tiers).
+    """
+    if value is None:
+        return None
+    try:
+        return parse_resolution_tiers(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def validate_statistics(ctx, param, value):
+    """
+    Click callback parsing the statistics option (see parse_statistics).
+    """
+    if value is None:
+        return None
+    try:
+        return parse_statistics(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def resolved_args(ctx, args):
+    """
+    Returns the command line `args` of the command of `ctx` with the value of every path
+    option replaced by its absolute path, so that a run started with them can be resumed
+    from any directory.
+    """
+    paths = {}
+    for param in ctx.command.params:
+        value = ctx.params.get(param.name)
+        if isinstance(param, click.Option) and isinstance(param.type, click.Path) and value is not None:
+            paths.update({opt: str(Path(value).resolve()) for opt in param.opts})
+
+    resolved = []
+    args = iter(args)
+    for arg in args:
+        name, equals, _ = arg.partition('=')
+        if equals and name in paths:
+            resolved.append(f"{name}={paths[name]}")
+        elif arg in paths:
+            resolved += [arg, paths[arg]]
+            next(args, None)
+        else:
+            resolved.append(arg)
+    return resolved
+
+
+def resume_export(ctx, param, value):
+    """
+    Click callback running the interrupted export in the folder `value` again, with the
+    options it was started with. Pages saved by the interrupted run are not fetched again.
+    """
+    if value is None or ctx.resilient_parsing:
+        return
+    try:
+        run = load_run(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    ctx.meta['resumed_run'] = run
+    click.echo(f"Resuming the export {run['prefix']} in {value}.")
+    with ctx.command.make_context(ctx.info_name, list(run['args']), parent=ctx) as resumed_ctx:
+        ctx.command.invoke(resumed_ctx)
+    ctx.exit()
+
+
 @click.command()
-@click.option('--project-id', required=True, help="GCP Project ID")
-@click.option('--location', required=True, help="Location (e.g., 'us-central1')")
-@click.option('--cluster-name', required=True, help="Cluster Name (e.g., 'online-shop')")
-@click.option('--namespace', required=True, help="Namespace (e.g., 'default')")
-@click.option('--controller-name', required=True, help="Controller Name (e.g., 'frontend')")
+@click.option('--project-id', required=False, help="GCP Project ID")
+@click.option('--location', required=False, help="Location (e.g., 'us-central1')")
+@click.option('--cluster-name', required=False, help="Cluster Name (e.g., 'online-shop')")
+@click.option('--namespace', required=False, help="Namespace (e.g., 'default')")
+@click.option('--controller-name', required=False, help="Controller Name (e.g., 'frontend')")
 @click.option('--controller-type', required=False, default= 'Deployment', help="Controller Type (e.g., 'Deployment')")
 @click.option('--container-name', required=False, help="Container Name (e.g., 'server')")
 @click.option('--start-time', required=True, help="Start time in RFC3339 format (e.g., '2024-08-22T15:10:00Z')")
 @click.option('--end-time', required=True, help="End time in RFC3339 format (e.g., '2024-09-22T15:15:00Z')")
 @click.option('--format', type=click.Choice(['csv', 'parquet'], case_sensitive=False), default='parquet', help="File format (csv or parquet)")
-@click.option('--zip-files', is_flag=True, help="If set, compress and zip the output files")
-@click.option('--output-dir', help="Override the default storage directory with a custom directory path")
+@click.option('--zip-files', is_flag=True, help="If set, write the output files straight into one compressed archive instead of separate files")
+@click.option('--archive-format', type=click.Choice(list(ARCHIVE_FORMATS), case_sensitive=False), help="With --zip-files: compression of the archive (deflate zip, zstd zip or tar.zst)  [default: deflate]")
+@click.option('--archive-level', type=int, help="With --zip-files: compression level of the archive. Defaults to the level of the archive format")
+@click.option('--parquet-compression', type=click.Choice(PARQUET_CODECS, case_sensitive=False), default=DEFAULT_PARQUET_CODEC, show_default=True, help="Compression codec of Parquet files")
+@click.option('--parquet-compression-level', type=int, help="Compression level of the Parquet codec (e.g., 1-22 for zstd). Defaults to the codec default")
+@click.option('--no-parquet-dictionary', is_flag=True, help="Write Parquet columns without dictionary encoding")
+@click.option('--output-dir', type=click.Path(file_okay=False, path_type=Path), help="Override the default storage directory with a custom directory path")
+@click.option('--max-workers', type=click.IntRange(min=1), default=DEFAULT_MAX_WORKERS, show_default=True, help="Number of metric and asset fetches to run in parallel")
+@click.option('--http-transport', type=click.Choice(HTTP_TRANSPORTS, case_sensitive=False), default='sync', show_default=True, help="How API pages are requested: one blocking request per worker thread (sync), or all pagination chains at once on one event loop over pooled HTTP/2 connections (async, requires the 'httpx[http2]' package)")
+@click.option('--stream', is_flag=True, help="Write each page of metric data to its output file as it arrives instead of buffering the whole export in memory")
+@click.option('--no-cache', is_flag=True, help="Fetch the whole time range from the API instead of reusing locally cached data")
+@click.option('--shard-duration', callback=validate_duration, help="Split the time range into windows of this length (e.g., '1d', '6h') and fetch them in parallel")
+@click.option('--alignment-period', callback=validate_alignment_period, help="Alignment period of the metric points (e.g., '60s', '5m'), or 'auto' to pick it from --max-points-per-series  [default: 60s]")
+@click.option('--max-points-per-series', type=click.IntRange(min=1), default=DEFAULT_MAX_POINTS_PER_SERIES, show_default=True, help="Point budget per series used by --alignment-period auto")
+@click.option('--resolution-tiers', callback=validate_resolution_tiers, help="Fetch recent data finer than older data, as comma separated PERIOD:AGE tiers, newest first (e.g., '1m:1d,5m:7d,1h'). Each tier is written to its own folder")
+@click.option('--statistics', callback=validate_statistics, help="Export only these statistics per alignment period (comma separated: mean, max, p50, p90, p95, p99), computed by Cloud Monitoring where possible. The alignment period defaults to the whole time range")
+@click.option('--granularity', type=click.Choice(GRANULARITIES, case_sensitive=False), default='pod', show_default=True, help="With --statistics: compute each statistic per pod over time, or across the pods of each container")
+@click.option('--layout', type=click.Choice(['wide', 'normalized'], case_sensitive=False), default='wide', show_default=True, help="Output layout: one file per metric with the labels on every point (wide), or a shared series table plus compact points tables keyed by series id (normalized)")
+@click.option('--summary', is_flag=True, help="Also write a summary file with the p50/p90/p95/p99/max of each series per hour, day and whole time range. With --stream, each metric file is read back whole to compute it")
+@click.option('--summary-only', is_flag=True, help="Write only the summary file instead of the metric points")
+@click.option('--usage-table', is_flag=True, help="Also write a 'usage' file joining cpu and memory usage with the requests in effect, the utilization ratios and the pod startup times, one row per container and point in time. With --stream, the cpu and memory files are read back whole to build it")
+@click.option('--change-points', is_flag=True, help="Export cpu_request and memory_request as intervals of constant value (valid_from, valid_to) instead of one row per point, which is much smaller")
+@click.option('--profile', is_flag=True, help="Sample the Python stacks of all threads during the export; the hottest functions are added to the run report and the stacks are saved as '<prefix>_profile.folded' for flame graph tools")
+@click.option('--checkpoint', 'save_checkpoint', is_flag=True, help="Save the fetched pages in the output folder while the export runs, so that an interrupted export can be continued with --resume. Writes every page to disk a second time")
+@click.option('--resume', type=click.Path(exists=True, file_okay=False, path_type=Path), is_eager=True, expose_value=False, callback=resume_export, help="Continue an interrupted export from its output folder, with its original options, without fetching the saved pages again")
+@click.option('--manifest', type=click.Path(exists=True, dir_okay=False, path_type=Path), help="YAML, JSON or CSV file listing the workloads to export in one run. Workload options given on the command line are used as defaults")
 
 def main(project_id, location, cluster_name, namespace, container_name, controller_name, 
-         controller_type, start_time, end_time, format, zip_files, output_dir):
+         controller_type, start_time, end_time, format, zip_files, archive_format, archive_level,
+         parquet_compression, parquet_compression_level, no_parquet_dictionary, output_dir, max_workers,
+         http_transport, shard_duration, stream, no_cache, alignment_period, max_points_per_series, resolution_tiers, statistics, granularity, layout, summary, summary_only, usage_table, change_points, profile, save_checkpoint, manifest):
     """Fetch GKE metrics, save each metric type to its own file, optionally fetch the asset inventory, and optionally zip all files into one folder."""
+
+    # Validate the workload options before doing any work
+    workload_options = {
+        'project_id': project_id,
+        'location': location,
+        'cluster_name': cluster_name,
+        'namespace': namespace,
+        'controller_name': controller_name,
+        'controller_type': controller_type,
+        'container_name': container_name
+    }
+    if summary_only and stream:
+        raise click.UsageError("--summary-only cannot be combined with --stream.")
+    if summary and stream and layout == 'normalized':
+        raise click.UsageError("--summary cannot be combined with --stream and --layout normalized.")
+    if usage_table and statistics:
+        raise click.UsageError("--usage-table cannot be combined with --statistics.")
+    if usage_table and stream and layout == 'normalized':
+        raise click.UsageError("--usage-table cannot be combined with --stream and --layout normalized.")
+
+    if statistics and stream:
+        raise click.UsageError("--statistics cannot be combined with --stream.")
+    if resolution_tiers and alignment_period:
+        raise click.UsageError("--alignment-period cannot be combined with --resolution-tiers.")
+    if (archive_format or archive_level is not None) and not zip_files:
+        raise click.UsageError("--archive-format and --archive-level require --zip-files.")
+
+    workloads = None
+    if manifest:
+        if stream:
+            raise click.UsageError("--stream cannot be combined with --manifest.")
+        from utils.batch import load_manifest
+        try:
+            workloads = load_manifest(manifest, defaults=workload_options)
+        except (OSError, ValueError) as e:
+            raise click.UsageError(f"Invalid manifest: {e}")
+    else:
+        missing = [f"--{name.replace('_', '-')}" for name in ('project_id', 'location', 'cluster_name', 'namespace', 'controller_name') if not workload_options[name]]
+        if missing:
+            raise click.UsageError(f"Missing option(s): {', '.join(missing)} (or use --manifest).")
     
-    unique_prefix = f"{datetime.now().strftime('%Y%m%d')}_{uuid.uuid4().hex[:4]}"
+    from utils.cache import WindowCache
+    from utils.encoding import with_change_points
+    from utils.fetch_gke_metrics import METRICS_INFO
+    from utils.file import parquet_options, remove_empty_dirs
+    from utils.scheduler import configure_scheduler, get_scheduler, report_stats, scheduler_options_from_config
+
+    if http_transport == 'async':
+        from utils.async_http import check_async_transport
+        try:
+            check_async_transport()
+        except ValueError as e:
+            raise click.UsageError(str(e))
+
+    # A resumed export continues in the output folder and with the prefix of the interrupted one
+    resumed_run = click.get_current_context().meta.get('resumed_run')
+    unique_prefix = resumed_run['prefix'] if resumed_run else f"{datetime.now().strftime('%Y%m%d')}_{uuid.uuid4().hex[:4]}"
+
+    # Durations, API traffic, rows and memory of each stage are written to the run report
+    run_report = start_run_report(profile)
 
     # Load configuration and set up storage directory
     config = load_config()
@@ -40,53 +217,210 @@ def main(project_id, location, cluster_name, namespace, container_name, controll
         storage_dir.mkdir(parents=True, exist_ok=True)
     
     # Full path for output files
-    output_dir = storage_dir / unique_prefix
+    output_dir = resumed_run['run_dir'] if resumed_run else storage_dir / unique_prefix
     if not output_dir.exists():
         output_dir.mkdir(parents=True, exist_ok=True)
 
+    # Pages are saved as they arrive, so that an interrupted export can be resumed with --resume
+    checkpoint = None
+    if save_checkpoint:
+        checkpoint = start_checkpoint(output_dir)
+        if resumed_run:
+            checkpoint.clear_outputs()
+        else:
+            checkpoint.save_run(unique_prefix, resolved_args(click.get_current_context(), sys.argv[1:]))
+
+    # Output files are written straight into the archive instead of to disk
+    archive = None
+    if zip_files:
+        archive_format = archive_format or 'deflate'
+        try:
+            archive = ArchiveWriter(archive_path_for(output_dir, unique_prefix, archive_format), output_dir, archive_format, archive_level, max_workers)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+    parquet = parquet_options(parquet_compression, parquet_compression_level, not no_parquet_dictionary)
+
     # Metric Info Configuration for Fetching Multiple Metrics
-    metrics_info = {
-        "cpu_usage": {
-            "metric_type": "kubernetes.io/container/cpu/core_usage_time",
-            "aligner": "ALIGN_RATE",
-            "reducer": "REDUCE_MEAN",
-        },
-        "memory_usage": {
-            "metric_type": "kubernetes.io/container/memory/used_bytes",
-            "aligner": "ALIGN_MAX",
-            "reducer": "REDUCE_MAX",
-        },
-        "cpu_request": {
-            "metric_type": "kubernetes.io/container/cpu/request_cores",
-            "aligner": "ALIGN_MEAN",
-            "reducer": "REDUCE_MEAN",
-        },
-        "memory_request": {
-            "metric_type": "kubernetes.io/container/memory/request_bytes",
-            "aligner": "ALIGN_MEAN",
-            "reducer": "REDUCE_MEAN",
-        }
-    }
+    metrics_info = with_change_points(METRICS_INFO) if change_points else METRICS_INFO
+
+    # All API calls go through the request scheduler (rate limits, retries and backoff)
+    configure_scheduler(**scheduler_options_from_config(config))
+
+    # Reuse previously fetched time ranges unless disabled
+    cache = None
+    if not no_cache:
+        cache = WindowCache(max_bytes=int(config.get("cache_max_bytes", DEFAULT_CACHE_MAX_BYTES)))
+
+    # Each resolution tier is fetched with its own alignment period into its own folder
+    if resolution_tiers:
+        tiers = [
+            (tier_start, tier_end, period, output_dir / f"tier_{format_duration(period)}")
+            for tier_start, tier_end, period in split_resolution_tiers(start_time, end_time, resolution_tiers)
+        ]
+    else:
+        period = alignment_period or ALIGNMENT_PERIOD
+        if statistics and not alignment_period:
+            # One statistic per series over the whole time range, in whole minutes
+            period = -(-(parse_rfc3339(end_time) - parse_rfc3339(start_time)) // ALIGNMENT_PERIOD) * ALIGNMENT_PERIOD
+        if alignment_period == 'auto':
+            period = choose_alignment_period(start_time, end_time, max_points_per_series)
+            click.echo(f"Using an alignment period of {format_duration(period)}.")
+        tiers = [(start_time, end_time, period, output_dir)]
+
+    completed = False
+    try:
+        for index, (tier_start, tier_end, period, tier_dir) in enumerate(tiers):
+            tier_dir.mkdir(parents=True, exist_ok=True)
+            if len(tiers) > 1:
+                click.echo(f"Fetching {tier_start} to {tier_end} with an alignment period of {format_duration(period)}.")
+            # The asset inventory does not depend on the resolution, so only the first tier fetches it
+            export_tier(
+                tier_dir, unique_prefix, tier_start, tier_end, period, index == 0,
+                workloads=workloads,
+                workload_options=workload_options,
+                metrics_info=metrics_info,
+                format=format,
+                max_workers=max_workers,
+                shard_duration=shard_duration,
+                stream=stream,
+                cache=cache,
+                layout=layout,
+                summary=summary,
+                summary_only=summary_only,
+                usage_table=usage_table,
+                statistics=statistics,
+                granularity=granularity,
+                archive=archive,
+                parquet_options=parquet,
+                http_transport=http_transport
+            )
+
+        # Queries that failed are fetched by a resumed run; otherwise the checkpoint is not needed anymore
+        incomplete = checkpoint.incomplete() if checkpoint is not None else 0
+        if incomplete:
+            click.echo(f"{incomplete} metric quer{'y' if incomplete == 1 else 'ies'} did not complete.")
+        else:
+            if checkpoint is not None:
+                checkpoint.remove()
+            completed = True
+    finally:
+        start_checkpoint(None)
+        if not completed and checkpoint is not None:
+            click.echo(f"To fetch only what is missing, run again with: --resume {output_dir}")
+        if http_transport == 'async':
+            from utils.async_http import close_async_transport
+            close_async_transport()
+        if archive is not None:
+            with phase('archive'):
+                archive.close()
+            remove_empty_dirs(output_dir)
+    report_stats()
 
-    # Initialize placeholders for data
-    all_metrics_data = {}
+    # The run report goes next to the outputs: into the output folder, or next to the archive
+    report_dir = archive.archive_path.parent if archive is not None else output_dir
+    report_path = run_report.write(
+        report_dir / f"{unique_prefix}{RUN_REPORT_SUFFIX}",
+        prefix=unique_prefix,
+        options=click.get_current_context().params,
+        apis=get_scheduler().stats()
+    )
+    click.echo(f"Saved run report to {report_path}")
 
 
+def export_tier(output_dir, unique_prefix, start_time, end_time, alignment_period, fetch_assets,
+                workloads, workload_options, metrics_info, format, max_workers, shard_duration,
+                stream, cache, layout, summary, summary_only, usage_table=False, statistics=None, granularity='pod',
+                archive=None, parquet_options=None, http_transport='sync'):
+    """
+    Fetches and saves the metrics of one time range and alignment period into `output_dir`,
+    or into `archive` if given.
+
+    With `statistics`, only the requested statistics are fetched, using the cheapest
+    queries chosen by plan_statistics.
+    """
+    from utils.aggregation import compute_statistics, plan_statistics
+    from utils.batch import fetch_batch_metrics
+    from utils.fetch_gke_metrics import fetch_all_metrics
+    from utils.file import StreamingWriter, save_dataframes
+    from utils.layout import POINTS_SUFFIX, NormalizingWriter, SeriesRegistry, normalize_metrics
+    from utils.rollup import add_summary
+    from utils.usage_table import add_usage_table
+
+    plan = None
+    if statistics:
+        plan = plan_statistics(metrics_info, statistics, granularity, alignment_period)
+        metrics_info = plan['queries']
+
+    # When streaming, each metric is written to its output file page by page
+    writer_factory = None
+    registry = SeriesRegistry()
+    if stream and layout == 'normalized':
+        writer_factory = lambda key: NormalizingWriter(StreamingWriter(output_dir / f"{unique_prefix}_{key}{POINTS_SUFFIX}.{format}", format, parquet_options=parquet_options), registry)
+    elif stream:
+        writer_factory = lambda key: StreamingWriter(output_dir / f"{unique_prefix}_{key}.{format}", format, parquet_options=parquet_options)
+
+    # Batch mode: coalesced queries for all workloads, one output folder per workload
+    if workloads:
+        try:
+            with phase('fetch'):
+                batch_data = fetch_batch_metrics(
+                    workloads,
+                    start_time=start_time,
+                    end_time=end_time,
+                    metrics_info=metrics_info,
+                    max_workers=max_workers,
+                    shard_duration=shard_duration,
+                    cache=cache,
+                    fetch_assets=fetch_assets,
+                    alignment_period=alignment_period,
+                    http_transport=http_transport
+                )
+        except Exception as e:
+            click.echo(f"Error fetching data: {e}. Please check your input parameters.")
+            return
+
+        for key, workload_data in batch_data.items():
+            if plan:
+                with phase('statistics'):
+                    workload_data = compute_statistics(plan, workload_data, end_time, alignment_period)
+            workload_dir = output_dir / key
+            workload_dir.mkdir(parents=True, exist_ok=True)
+            if usage_table:
+                with phase('usage_table'):
+                    workload_data = add_usage_table(workload_data)
+            if summary or summary_only:
+                with phase('summary'):
+                    workload_data = add_summary(workload_data, start_time, summary_only)
+            if layout == 'normalized':
+                with phase('normalize'):
+                    workload_data = normalize_metrics(workload_data)
+            with phase('save'):
+                save_dataframes(workload_dir, format, workload_data, f"{unique_prefix}_{key}", False, archive, parquet_options)
+        return
+
     # Try block for fetching both metrics and asset inventory data
     try:
         # Fetch GKE metrics
-        all_metrics_data = fetch_all_metrics(
-            project_id=project_id,
-            location=location,
-            cluster_name=cluster_name,
-            namespace=namespace,
-            container_name=container_name,
-            controller_name=controller_name,
-            controller_type=controller_type,
-            start_time=start_time,
-            end_time=end_time,
-            metrics_info=metrics_info
-        )
+        with phase('fetch'):
+            all_metrics_data = fetch_all_metrics(
+                project_id=workload_options['project_id'],
+                location=workload_options['location'],
+                cluster_name=workload_options['cluster_name'],
+                namespace=workload_options['namespace'],
+                container_name=workload_options['container_name'],
+                controller_name=workload_options['controller_name'],
+                controller_type=workload_options['controller_type'],
+                start_time=start_time,
+                end_time=end_time,
+                metrics_info=metrics_info,
+                max_workers=max_workers,
+                shard_duration=shard_duration,
+                writer_factory=writer_factory,
+                cache=cache,
+                fetch_assets=fetch_assets,
+                alignment_period=alignment_period,
+                http_transport=http_transport
+            )
         if not all_metrics_data:
             click.echo("No metrics data found. Please ensure the parameters are correct.")
             return
@@ -95,8 +429,25 @@ def main(project_id, location, cluster_name, namespace, container_name, controll
         click.echo(f"Error fetching data: {e}. Please check your input parameters.")
         return
 
-    # Save all dataframes (metrics and assets), and optionally zip them
-    save_dataframes(output_dir, format, all_metrics_data, unique_prefix, zip_files)
+    if plan:
+        with phase('statistics'):
+            all_metrics_data = compute_statistics(plan, all_metrics_data, end_time, alignment_period)
+
+    # Optional usage table and rightsizing summary, computed before the labels are normalized
+    if usage_table:
+        with phase('usage_table'):
+            all_metrics_data = add_usage_table(all_metrics_data)
+    if summary or summary_only:
+        with phase('summary'):
+            all_metrics_data = add_summary(all_metrics_data, start_time, summary_only)
+
+    if layout == 'normalized':
+        with phase('normalize'):
+            all_metrics_data = normalize_metrics(all_metrics_data, registry)
+
+    # Save all dataframes (metrics and assets)
+    with phase('save'):
+        save_dataframes(output_dir, format, all_metrics_data, unique_prefix, False, archive, parquet_options)
 
 if __name__ == '__main__':
     main()
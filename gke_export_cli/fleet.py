@@ -0,0 +1,109 @@
+# Only light modules are imported here, see cli.py
+import click
+from utils.config import get_storage_directory, load_config
+from utils.options import (DEFAULT_CACHE_MAX_BYTES, DEFAULT_MAX_PROCESSES, DEFAULT_MAX_WORKERS, DEFAULT_PARQUET_CODEC,
+                           PARQUET_CODECS)
+from utils.archive import ARCHIVE_FORMATS, DEFAULT_ARCHIVE_FORMAT
+from cli import validate_duration
+from pathlib import Path
+from datetime import datetime
+import uuid
+
+@click.command()
+@click.option('--targets', type=click.Path(exists=True, dir_okay=False, path_type=Path), help="YAML, JSON or CSV file listing the project_id, location and cluster_name of each target")
+@click.option('--project-id', multiple=True, help="GCP Project ID whose clusters are discovered and exported. Can be repeated")
+@click.option('--namespace', required=False, help="Only export this namespace (e.g., 'default')")
+@click.option('--controller-name', required=False, help="Only export this controller (e.g., 'frontend')")
+@click.option('--start-time', required=True, help="Start time in RFC3339 format (e.g., '2024-08-22T15:10:00Z')")
+@click.option('--end-time', required=True, help="End time in RFC3339 format (e.g., '2024-09-22T15:15:00Z')")
+@click.option('--format', type=click.Choice(['csv', 'parquet'], case_sensitive=False), default='parquet', help="File format (csv or parquet)")
+@click.option('--zip-files', is_flag=True, help="If set, compress and zip the output files")
+@click.option('--archive-format', type=click.Choice(list(ARCHIVE_FORMATS), case_sensitive=False), default=DEFAULT_ARCHIVE_FORMAT, show_default=True, help="With --zip-files: compression of the archive (deflate zip, zstd zip or tar.zst)")
+@click.option('--archive-level', type=int, help="With --zip-files: compression level of the archive. Defaults to the level of the archive format")
+@click.option('--parquet-compression', type=click.Choice(PARQUET_CODECS, case_sensitive=False), default=DEFAULT_PARQUET_CODEC, show_default=True, help="Compression codec of Parquet files")
+@click.option('--parquet-compression-level', type=int, help="Compression level of the Parquet codec (e.g., 1-22 for zstd). Defaults to the codec default")
+@click.option('--no-parquet-dictionary', is_flag=True, help="Write Parquet columns without dictionary encoding")
+@click.option('--output-dir', help="Override the default storage directory with a custom directory path")
+@click.option('--max-processes', type=click.IntRange(min=1), default=DEFAULT_MAX_PROCESSES, show_default=True, help="Number of targets exported in parallel")
+@click.option('--max-workers', type=click.IntRange(min=1), default=DEFAULT_MAX_WORKERS, show_default=True, help="Number of metric fetches run in parallel per target")
+@click.option('--no-cache', is_flag=True, help="Fetch the whole time range from the API instead of reusing locally cached data")
+@click.option('--change-points', is_flag=True, help="Export cpu_request and memory_request as intervals of constant value (valid_from, valid_to) instead of one row per point, which is much smaller")
+@click.option('--shard-duration', callback=validate_duration, help="Split the time range into windows of this length (e.g., '1d', '6h') and fetch them in parallel")
+@click.option('--no-assets', is_flag=True, help="Do not fetch the pod startup times of each target from the Cloud Asset Inventory")
+
+def main(targets, project_id, namespace, controller_name, start_time, end_time, format, zip_files,
+         archive_format, archive_level, parquet_compression, parquet_compression_level, no_parquet_dictionary, output_dir, max_processes, max_workers, no_cache, change_points, shard_duration, no_assets):
+    """Export GKE metrics for many clusters across projects into one combined dataset with a per-target summary."""
+
+    if not targets and not project_id:
+        raise click.UsageError("Use --targets and/or --project-id to select the clusters to export.")
+
+    from utils.batch import load_manifest
+    from utils.encoding import with_change_points
+    from utils.fetch_gke_metrics import METRICS_INFO
+    from utils.file import parquet_options, zip_output_dir
+    from utils.fleet import discover_clusters, run_fleet
+    from utils.scheduler import configure_scheduler, scheduler_options_from_config
+
+    # Load configuration; API calls go through the request scheduler
+    config = load_config()
+    configure_scheduler(**scheduler_options_from_config(config))
+
+    target_list = []
+    if targets:
+        try:
+            target_list = load_manifest(targets, required_fields=['project_id', 'location', 'cluster_name'])
+        except (OSError, ValueError) as e:
+            raise click.UsageError(f"Invalid targets file: {e}")
+    if project_id:
+        try:
+            target_list.extend(discover_clusters(list(project_id)))
+        except Exception as e:
+            click.echo(f"Error discovering clusters: {e}")
+            return
+
+    # Apply the workload filters to every target
+    for target in target_list:
+        if namespace:
+            target['namespace'] = namespace
+        if controller_name:
+            target['controller_name'] = controller_name
+
+    if not target_list:
+        click.echo("No clusters found to export.")
+        return
+
+    unique_prefix = f"{datetime.now().strftime('%Y%m%d')}_{uuid.uuid4().hex[:4]}"
+
+    # Set up storage directory
+    storage_dir = Path(output_dir) if output_dir else get_storage_directory()
+    run_dir = storage_dir / unique_prefix
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    click.echo(f"Exporting {len(target_list)} target(s) with {max_processes} process(es).")
+    summary = run_fleet(
+        target_list,
+        run_dir=run_dir,
+        prefix=unique_prefix,
+        start_time=start_time,
+        end_time=end_time,
+        format=format,
+        max_processes=max_processes,
+        max_workers=max_workers,
+        shard_duration=shard_duration,
+        use_cache=not no_cache,
+        cache_max_bytes=int(config.get("cache_max_bytes", DEFAULT_CACHE_MAX_BYTES)),
+        metrics_info=with_change_points(METRICS_INFO) if change_points else METRICS_INFO,
+        scheduler_options=scheduler_options_from_config(config),
+        parquet_options=parquet_options(parquet_compression, parquet_compression_level, not no_parquet_dictionary),
+        fetch_assets=not no_assets
+    )
+
+    failed = summary[summary['status'] == 'failed']
+    click.echo(f"Completed {len(summary) - len(failed)} of {len(summary)} target(s).")
+
+    if zip_files:
+        zip_output_dir(run_dir, unique_prefix, archive_format, archive_level)
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,7 @@ setup(
     entry_points={
         'console_scripts': [
             'gke-metrics=cli:main',  # This will create the `gke-metrics` command for the CLI
+            'gke-metrics-fleet=fleet:main',  # Fleet-wide export across projects and clusters
         ],
     },
 )
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules are imported as `utils.x`, relative to the gke_export_cli directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_api import FakeApiServer
+from utils.clients import set_transport_factory
+
+
+@pytest.fixture(scope="session")
+def fake_api():
+    """
+    A local stand-in for the Monitoring and Asset APIs (see benchmarks/fake_api.py), used
+    by the API clients for the whole test session.
+    """
+    with FakeApiServer(series=5, page_size=2, pods=5) as server:
+        set_transport_factory(server.transport)
+        yield server
+        set_transport_factory(None)
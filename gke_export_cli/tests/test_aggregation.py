@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from utils.aggregation import compute_statistics, plan_statistics
+from utils.fetch_gke_metrics import CONTAINER_GROUP_BY_FIELDS, METRICS_INFO
+from utils.options import ALIGNMENT_PERIOD
+
+PERIOD = timedelta(minutes=5)
+END_TIME = "2024-09-01T00:10:00Z"
+POD_COLUMN = "resource.labels.pod_name"
+CONTAINER_COLUMN = "resource.labels.container_name"
+
+
+def _points(pods=("pod-a", "pod-b", "pod-c")):
+    # One point per pod and minute over the 10 minutes before END_TIME, with distinct values
+    end = pd.Timestamp(END_TIME)
+    rows = []
+    for index, pod in enumerate(pods):
+        for minute in range(10):
+            point_end = end - timedelta(minutes=minute)
+            rows.append({
+                'interval.startTime': point_end - ALIGNMENT_PERIOD,
+                'interval.endTime': point_end,
+                'value.doubleValue': float(index * 100 + minute ** 2),
+                CONTAINER_COLUMN: 'server',
+                POD_COLUMN: pod
+            })
+    return pd.DataFrame(rows).astype({CONTAINER_COLUMN: 'category', POD_COLUMN: 'category'})
+
+
+def test_plan_uses_aligners_per_pod():
+    plan = plan_statistics({'memory_usage': METRICS_INFO['memory_usage']}, ['mean', 'max'], 'pod', PERIOD)
+
+    assert plan['outputs'] == {'memory_usage_mean': ('memory_usage_mean', None), 'memory_usage_max': ('memory_usage_max', None)}
+    assert plan['queries']['memory_usage_mean']['aligner'] == 'ALIGN_MEAN'
+    assert plan['queries']['memory_usage_max']['aligner'] == 'ALIGN_MAX'
+    assert all(query['alignment_period'] == PERIOD for query in plan['queries'].values())
+    assert all('group_by_fields' not in query for query in plan['queries'].values())
+
+
+def test_plan_uses_reducers_per_container():
+    plan = plan_statistics({'memory_usage': METRICS_INFO['memory_usage']}, ['mean', 'p95'], 'container', PERIOD)
+
+    assert plan['outputs'] == {'memory_usage_mean': ('memory_usage_mean', None), 'memory_usage_p95': ('memory_usage_p95', None)}
+    assert plan['queries']['memory_usage_p95']['reducer'] == 'REDUCE_PERCENTILE_95'
+    assert plan['queries']['memory_usage_p95']['group_by_fields'] == CONTAINER_GROUP_BY_FIELDS
+
+
+@pytest.mark.parametrize("granularity, local, period", [('pod', 'time', ALIGNMENT_PERIOD), ('container', 'pods', PERIOD)])
+def test_plan_computes_p90_locally(granularity, local, period):
+    # Cloud Monitoring has no ALIGN_PERCENTILE_90 or REDUCE_PERCENTILE_90
+    plan = plan_statistics({'memory_usage': METRICS_INFO['memory_usage']}, ['p90'], granularity, PERIOD)
+
+    assert plan['outputs'] == {'memory_usage_p90': ('memory_usage', local)}
+    assert plan['queries']['memory_usage']['alignment_period'] == period
+    assert plan['queries']['memory_usage']['aligner'] == METRICS_INFO['memory_usage']['aligner']
+
+
+def test_plan_aligns_cumulative_metrics_for_the_mean_only():
+    plan = plan_statistics({'cpu_usage': METRICS_INFO['cpu_usage']}, ['mean', 'max', 'p50'], 'pod', PERIOD)
+
+    assert plan['queries']['cpu_usage_mean']['aligner'] == 'ALIGN_RATE'
+    # The rates are fetched once at full resolution for the statistics computed locally
+    assert plan['outputs']['cpu_usage_max'] == ('cpu_usage', 'time')
+    assert plan['outputs']['cpu_usage_p50'] == ('cpu_usage', 'time')
+    assert set(plan['queries']) == {'cpu_usage_mean', 'cpu_usage'}
+    assert plan['queries']['cpu_usage']['alignment_period'] == ALIGNMENT_PERIOD
+
+
+def test_compute_statistics_per_pod_over_time():
+    plan = plan_statistics({'memory_usage': METRICS_INFO['memory_usage']}, ['p90'], 'pod', PERIOD)
+    points = _points()
+
+    result = compute_statistics(plan, {'memory_usage': points}, END_TIME, PERIOD)['memory_usage_p90']
+
+    end = pd.Timestamp(END_TIME)
+    assert len(result) == 6
+    assert list(result['interval.endTime'].unique()) == [end, end - PERIOD]
+    assert (result['interval.endTime'] - result['interval.startTime'] == PERIOD).all()
+    for (pod, period_end), row in result.set_index([POD_COLUMN, 'interval.endTime']).iterrows():
+        # A point ending at t belongs to the period (T - PERIOD, T]
+        in_period = points[(points[POD_COLUMN] == pod) & (points['interval.endTime'] > period_end - PERIOD) & (points['interval.endTime'] <= period_end)]
+        assert len(in_period) == 5
+        assert row['value.doubleValue'] == pytest.approx(np.quantile(in_period['value.doubleValue'], 0.9))
+
+
+def test_compute_statistics_across_pods():
+    plan = plan_statistics({'memory_usage': METRICS_INFO['memory_usage']}, ['p90', 'mean'], 'container', PERIOD)
+    points = _points()
+    fetched = {
+        'memory_usage': points,
+        # Reduced by Cloud Monitoring, passed through as fetched apart from the pod column
+        'memory_usage_mean': points.groupby('interval.endTime', as_index=False)['value.doubleValue'].mean().assign(**{POD_COLUMN: None}),
+        'pod_startup': pd.DataFrame({'pod_name': ['pod-a']})
+    }
+
+    results = compute_statistics(plan, fetched, END_TIME, PERIOD)
+
+    assert set(results) == {'memory_usage_p90', 'memory_usage_mean', 'pod_startup'}
+    assert POD_COLUMN not in results['memory_usage_mean'].columns
+    p90 = results['memory_usage_p90']
+    assert POD_COLUMN not in p90.columns
+    assert len(p90) == 10
+    assert list(p90['interval.endTime']) == sorted(p90['interval.endTime'], reverse=True)
+    for _, row in p90.iterrows():
+        values = points.loc[points['interval.endTime'] == row['interval.endTime'], 'value.doubleValue']
+        assert row['value.doubleValue'] == pytest.approx(np.quantile(values, 0.9))
+
+
+def test_compute_statistics_skips_empty_queries():
+    plan = plan_statistics({'memory_usage': METRICS_INFO['memory_usage']}, ['p90'], 'pod', PERIOD)
+
+    assert compute_statistics(plan, {'memory_usage': pd.DataFrame()}, END_TIME, PERIOD) == {}
@@ -0,0 +1,78 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+from utils import archive
+from utils.archive import ArchiveWriter
+
+FILES = {
+    "cpu_usage.parquet": b"cpu usage points " * 1000,
+    "memory_usage.csv": b"interval.startTime,interval.endTime\n" * 500,
+    "nested/pod_startup.csv": b"pod_name\npod-a\n",
+    "empty.csv": b""
+}
+
+
+def _write_archive(tmp_path, archive_format, files=FILES):
+    root = tmp_path / "export"
+    root.mkdir()
+    writer = ArchiveWriter(tmp_path / f"export{archive.ARCHIVE_FORMATS[archive_format]}", root, archive_format, max_workers=2)
+    for index, (name, data) in enumerate(files.items()):
+        # Both ways of adding entries
+        if index % 2:
+            writer.add_bytes(root / name, data)
+        else:
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / name).write_bytes(data)
+            writer.add_file(root / name, remove=True)
+    return writer.close()
+
+
+def _zip_contents(archive_path):
+    with zipfile.ZipFile(archive_path) as zip_file:
+        assert zip_file.testzip() is None
+        return {info.filename: zip_file.read(info) for info in zip_file.infolist()}
+
+
+def test_deflate_archive_reads_back_with_zipfile(tmp_path):
+    archive_path = _write_archive(tmp_path, "deflate")
+
+    assert _zip_contents(archive_path) == FILES
+    # Added files are removed once archived
+    assert not (tmp_path / "export" / "cpu_usage.parquet").exists()
+
+
+def test_tar_zst_archive_reads_back_with_tarfile(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    archive_path = _write_archive(tmp_path, "tar.zst")
+
+    # Each entry is its own zstd frame; the frames decompress as one stream
+    with open(archive_path, "rb") as file:
+        data = zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True).read()
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar_file:
+        contents = {member.name: tar_file.extractfile(member).read() for member in tar_file.getmembers()}
+
+    assert contents == FILES
+
+
+def test_zip64_records_read_back_with_zipfile(tmp_path, monkeypatch):
+    # Limits small enough that sizes, offsets and the entry count all need ZIP64 records
+    monkeypatch.setattr(archive, "ZIP64_LIMIT", 100)
+    monkeypatch.setattr(archive, "ZIP64_COUNT_LIMIT", 3)
+
+    archive_path = _write_archive(tmp_path, "deflate")
+
+    data = archive_path.read_bytes()
+    assert b"PK\x06\x06" in data and b"PK\x06\x07" in data
+    assert _zip_contents(archive_path) == FILES
+
+
+def test_duplicate_entry_is_rejected(tmp_path):
+    writer = ArchiveWriter(tmp_path / "export.zip", tmp_path)
+    writer.add_bytes(tmp_path / "cpu_usage.csv", b"a")
+
+    with pytest.raises(ValueError, match="Duplicate archive entry 'cpu_usage.csv'"):
+        writer.add_bytes(tmp_path / "cpu_usage.csv", b"b")
+    writer.close()
+    assert _zip_contents(tmp_path / "export.zip") == {"cpu_usage.csv": b"a"}
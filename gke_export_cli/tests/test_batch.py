@@ -0,0 +1,85 @@
+import json
+import threading
+
+import pandas as pd
+import pytest
+from utils import batch
+from utils.batch import fetch_batch_metrics, load_manifest, workload_id
+
+WORKLOAD = {
+    "project_id": "project-a",
+    "location": "us-central1",
+    "cluster_name": "cluster",
+    "namespace": "default",
+    "controller_name": "frontend",
+    "controller_type": "",
+    "container_name": ""
+}
+
+
+def _write_manifest(tmp_path, workloads):
+    manifest_path = tmp_path / "workloads.json"
+    manifest_path.write_text(json.dumps({"workloads": workloads}))
+    return manifest_path
+
+
+def test_workload_id_tells_apart_projects_locations_and_controller_types():
+    workloads = [
+        WORKLOAD,
+        {**WORKLOAD, "project_id": "project-b"},
+        {**WORKLOAD, "location": "europe-west1"},
+        {**WORKLOAD, "controller_type": "Deployment"},
+        {**WORKLOAD, "controller_type": "StatefulSet"},
+        {**WORKLOAD, "container_name": "app"}
+    ]
+
+    assert len({workload_id(workload) for workload in workloads}) == len(workloads)
+
+
+def test_load_manifest_rejects_duplicate_workloads(tmp_path):
+    manifest_path = _write_manifest(tmp_path, [
+        {"namespace": "default", "controller-name": "frontend"},
+        {"namespace": "default", "controller-name": "backend"},
+        {"namespace": "default", "controller_name": "frontend"}
+    ])
+
+    with pytest.raises(ValueError, match="Workload 3 .* duplicates workload 1"):
+        load_manifest(manifest_path, defaults=WORKLOAD)
+
+
+def test_load_manifest_keeps_workloads_differing_in_project(tmp_path):
+    manifest_path = _write_manifest(tmp_path, [
+        {"namespace": "default", "controller_name": "frontend"},
+        {"namespace": "default", "controller_name": "frontend", "project_id": "project-b"}
+    ])
+
+    workloads = load_manifest(manifest_path, defaults=WORKLOAD)
+
+    assert [workload["project_id"] for workload in workloads] == ["project-a", "project-b"]
+
+
+def test_fetch_batch_metrics_fetches_query_groups_concurrently(monkeypatch):
+    workloads = [
+        {**WORKLOAD, "cluster_name": "cluster-a"},
+        {**WORKLOAD, "cluster_name": "cluster-b"}
+    ]
+    # Both groups must be in flight at once to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def fetch_all_metrics(**kwargs):
+        calls.append(kwargs)
+        barrier.wait()
+        return {"cpu_usage": pd.DataFrame({
+            "resource.labels.cluster_name": [kwargs["cluster_name"]],
+            "metadata.systemLabels.top_level_controller_name": ["frontend"],
+            "value.doubleValue": [1.0]
+        })}
+
+    monkeypatch.setattr(batch, "fetch_all_metrics", fetch_all_metrics)
+    results = fetch_batch_metrics(workloads, "2024-08-31T00:00:00Z", "2024-09-01T00:00:00Z", {}, max_workers=4, fetch_assets=False)
+
+    # The groups share the worker budget
+    assert [call["max_workers"] for call in calls] == [2, 2]
+    for workload in workloads:
+        assert results[workload_id(workload)]["cpu_usage"]["resource.labels.cluster_name"].tolist() == [workload["cluster_name"]]
@@ -0,0 +1,43 @@
+import pandas as pd
+from utils.cache import WindowCache
+
+KEY = "query"
+
+
+def _points(end_times):
+    end_times = pd.to_datetime(end_times, utc=True)
+    return pd.DataFrame({
+        'interval.startTime': end_times - pd.Timedelta(minutes=1),
+        'interval.endTime': end_times,
+        'value.doubleValue': range(len(end_times)),
+        'resource.labels.pod_name': 'pod-0'
+    })
+
+
+def _read(cache, start_time, end_time):
+    frames = list(cache.read(KEY, start_time, end_time))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def test_read_excludes_points_ending_at_start_time(tmp_path):
+    cache = WindowCache(tmp_path)
+    cache.store(KEY, "2024-08-31T00:00:00Z", "2024-08-31T00:03:00Z",
+                _points(["2024-08-31T00:01:00Z", "2024-08-31T00:02:00Z", "2024-08-31T00:03:00Z"]))
+
+    df = _read(cache, "2024-08-31T00:01:00Z", "2024-08-31T00:03:00Z")
+
+    assert df['interval.endTime'].tolist() == list(pd.to_datetime(["2024-08-31T00:02:00Z", "2024-08-31T00:03:00Z"], utc=True))
+
+
+def test_read_yields_segment_boundary_points_once(tmp_path):
+    cache = WindowCache(tmp_path)
+    cache.store(KEY, "2024-08-31T00:00:00Z", "2024-08-31T00:02:00Z",
+                _points(["2024-08-31T00:01:00Z", "2024-08-31T00:02:00Z"]))
+    cache.store(KEY, "2024-08-31T00:02:00Z", "2024-08-31T00:04:00Z",
+                _points(["2024-08-31T00:02:00Z", "2024-08-31T00:03:00Z", "2024-08-31T00:04:00Z"]))
+
+    df = _read(cache, "2024-08-31T00:00:00Z", "2024-08-31T00:04:00Z")
+
+    assert len(df) == 4
+    assert df['interval.endTime'].is_unique
+    assert cache.missing_ranges(KEY, "2024-08-31T00:00:00Z", "2024-08-31T00:05:00Z") == [("2024-08-31T00:04:00Z", "2024-08-31T00:05:00Z")]
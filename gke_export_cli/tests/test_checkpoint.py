@@ -0,0 +1,141 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import cli
+from utils.checkpoint import Checkpoint, load_run, start_checkpoint
+from utils.fetch_gke_metrics import _pages
+
+KEY = "query"
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    checkpoint = start_checkpoint(tmp_path)
+    yield checkpoint
+    start_checkpoint(None)
+
+
+class FakeQuery:
+    """
+    A timeSeries.list query of `page_count` pages, where the token of page N is 'tN'.
+    The first use of a token listed in `expired` is rejected with HTTP 400, like the API
+    does for a token saved by an earlier run.
+    """
+
+    def __init__(self, page_count, expired=()):
+        self.page_count = page_count
+        self.expired = set(expired)
+        self.calls = []
+
+    def fetch_page(self, page_token):
+        self.calls.append(page_token)
+        if page_token in self.expired:
+            self.expired.discard(page_token)
+            raise HttpError(httplib2.Response({'status': 400}), b'{"error": {"message": "Invalid page token"}}')
+        page = int(page_token[1:]) if page_token else 0
+        response = {'timeSeries': [{'page': page}]}
+        if page + 1 < self.page_count:
+            response['nextPageToken'] = f"t{page + 1}"
+        return response
+
+
+def _page_numbers(responses):
+    return [response['timeSeries'][0]['page'] for response in responses]
+
+
+def _interrupt_after(query, pages):
+    # Consumes the first `pages` pages of the query, as a run killed after them would
+    responses = _pages(query.fetch_page, KEY)
+    for _ in range(pages):
+        next(responses)
+    responses.close()
+
+
+def test_checkpoint_saves_pages_and_progress(checkpoint):
+    checkpoint.start(KEY)
+    assert checkpoint.incomplete() == 1
+
+    checkpoint.save_page(KEY, 0, {'timeSeries': [{'page': 0}], 'nextPageToken': 't1'})
+    assert checkpoint.progress(KEY) == {'pages': 1, 'next_page_token': 't1', 'done': False}
+
+    checkpoint.save_page(KEY, 1, {'timeSeries': [{'page': 1}]})
+    assert checkpoint.progress(KEY) == {'pages': 2, 'next_page_token': None, 'done': True}
+    assert _page_numbers(checkpoint.saved_pages(KEY, 2)) == [0, 1]
+    assert checkpoint.incomplete() == 0
+
+    checkpoint.remove()
+    assert not checkpoint.dir.exists()
+
+
+def test_load_run_without_checkpoint_raises(tmp_path):
+    with pytest.raises(ValueError, match="no checkpoint found"):
+        load_run(tmp_path)
+
+
+def test_pages_without_checkpoint_fetches_every_page():
+    start_checkpoint(None)
+    query = FakeQuery(3)
+
+    assert _page_numbers(_pages(query.fetch_page, KEY)) == [0, 1, 2]
+    assert query.calls == [None, 't1', 't2']
+
+
+def test_pages_resume_from_saved_token(checkpoint):
+    _interrupt_after(FakeQuery(4), 2)
+    assert checkpoint.progress(KEY) == {'pages': 2, 'next_page_token': 't2', 'done': False}
+
+    query = FakeQuery(4)
+    assert _page_numbers(_pages(query.fetch_page, KEY)) == [0, 1, 2, 3]
+    # The saved pages are read from disk, only the missing ones are fetched
+    assert query.calls == ['t2', 't3']
+    assert checkpoint.progress(KEY)['done']
+
+
+def test_pages_of_completed_query_are_not_fetched_again(checkpoint):
+    list(_pages(FakeQuery(2).fetch_page, KEY))
+
+    query = FakeQuery(2)
+    assert _page_numbers(_pages(query.fetch_page, KEY)) == [0, 1]
+    assert query.calls == []
+
+
+def test_pages_restart_query_when_saved_token_expired(checkpoint):
+    _interrupt_after(FakeQuery(3), 1)
+
+    query = FakeQuery(3, expired={'t1'})
+    assert _page_numbers(_pages(query.fetch_page, KEY)) == [0, 1, 2]
+    # The saved page is dropped, and the query is fetched again from its first page
+    assert query.calls == ['t1', None, 't1', 't2']
+    assert checkpoint.progress(KEY) == {'pages': 3, 'next_page_token': None, 'done': True}
+
+
+def test_pages_raise_other_errors_of_saved_token(checkpoint):
+    _interrupt_after(FakeQuery(3), 1)
+
+    def fetch_page(page_token):
+        raise HttpError(httplib2.Response({'status': 500}), b'')
+
+    with pytest.raises(HttpError):
+        list(_pages(fetch_page, KEY))
+    assert checkpoint.progress(KEY) == {'pages': 1, 'next_page_token': 't1', 'done': False}
+
+
+def test_saved_run_resumes_from_another_directory(tmp_path, monkeypatch):
+    start_dir = tmp_path / "start"
+    start_dir.mkdir()
+    (start_dir / "workloads.yaml").write_text("workloads: []\n")
+    monkeypatch.chdir(start_dir)
+    args = ['--manifest', 'workloads.yaml', '--output-dir=exports', '--start-time', '2024-08-31T00:00:00Z', '--end-time', '2024-09-01T00:00:00Z']
+    ctx = cli.main.make_context('cli', list(args))
+
+    Checkpoint(tmp_path / "run").save_run('20240901_ab12', cli.resolved_args(ctx, args))
+    monkeypatch.chdir(tmp_path)
+    run = load_run(tmp_path / "run")
+
+    assert run['args'] == [
+        '--manifest', str(start_dir / 'workloads.yaml'), f"--output-dir={start_dir / 'exports'}",
+        '--start-time', '2024-08-31T00:00:00Z', '--end-time', '2024-09-01T00:00:00Z'
+    ]
+    resumed_ctx = cli.main.make_context('cli', list(run['args']))
+    assert resumed_ctx.params['manifest'] == start_dir / 'workloads.yaml'
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from utils.decode import LABEL_COLUMNS, decode_time_series
+
+
+def _series(pod_name, points, metric_type="kubernetes.io/container/cpu/core_usage_time", **labels):
+    return {
+        "metric": {"type": metric_type},
+        "resource": {"type": "k8s_container", "labels": {"namespace_name": "default", "pod_name": pod_name, **labels}},
+        "metadata": {"systemLabels": {"top_level_controller_name": "frontend"}},
+        "points": points
+    }
+
+
+def _point(end_time, value, start_time=None):
+    interval = {"endTime": end_time}
+    if start_time is not None:
+        interval["startTime"] = start_time
+    return {"interval": interval, "value": value}
+
+
+def test_int64_values_arriving_as_strings_are_integers():
+    df = decode_time_series([_series("pod-a", [
+        _point("2024-09-01T00:02:00Z", {"int64Value": "9007199254740993"}, "2024-09-01T00:01:00Z"),
+        _point("2024-09-01T00:01:00Z", {"int64Value": "1024"}, "2024-09-01T00:00:00Z")
+    ])])
+
+    assert df["value.int64Value"].dtype == np.int64
+    # Beyond the precision of a float64
+    assert df["value.int64Value"].tolist() == [9007199254740993, 1024]
+    assert "value.doubleValue" not in df.columns
+
+
+def test_mixed_value_types_use_nullable_columns():
+    df = decode_time_series([
+        _series("pod-a", [_point("2024-09-01T00:01:00Z", {"doubleValue": 0.5})]),
+        _series("pod-b", [_point("2024-09-01T00:01:00Z", {"int64Value": "7"})])
+    ])
+
+    assert df["value.doubleValue"].dtype == "Float64"
+    assert df["value.int64Value"].dtype == "Int64"
+    assert df["value.doubleValue"].isna().tolist() == [False, True]
+    assert df["value.int64Value"].isna().tolist() == [True, False]
+    assert df.loc[0, "value.doubleValue"] == 0.5
+    assert df.loc[1, "value.int64Value"] == 7
+
+
+def test_missing_start_time_falls_back_to_end_time():
+    df = decode_time_series([_series("pod-a", [
+        _point("2024-09-01T00:02:00Z", {"doubleValue": 1.0}, "2024-09-01T00:01:00Z"),
+        _point("2024-09-01T00:01:00Z", {"doubleValue": 2.0})
+    ])])
+
+    assert df["interval.startTime"].dtype == "datetime64[ns, UTC]"
+    assert df["interval.endTime"].dtype == "datetime64[ns, UTC]"
+    assert df["interval.startTime"].tolist() == [pd.Timestamp("2024-09-01T00:01:00Z")] * 2
+
+
+def test_labels_line_up_with_the_points_of_each_series():
+    df = decode_time_series([
+        _series("pod-a", [_point(f"2024-09-01T00:0{minute}:00Z", {"doubleValue": float(minute)}) for minute in range(3)]),
+        # Series without points add no rows
+        _series("pod-b", []),
+        _series("pod-c", [_point("2024-09-01T00:00:00Z", {"doubleValue": 10.0})], container_name="app"),
+        {**_series("pod-d", []), "points": None},
+        _series("pod-a", [_point("2024-09-01T00:00:00Z", {"doubleValue": 20.0})], metric_type="kubernetes.io/container/memory/used_bytes")
+    ])
+
+    assert list(df.columns) == ["interval.startTime", "interval.endTime", "value.doubleValue"] + LABEL_COLUMNS
+    assert df["value.doubleValue"].tolist() == [0.0, 1.0, 2.0, 10.0, 20.0]
+    assert df["resource.labels.pod_name"].tolist() == ["pod-a"] * 3 + ["pod-c", "pod-a"]
+    assert df["metric.type"].tolist()[-2:] == ["kubernetes.io/container/cpu/core_usage_time", "kubernetes.io/container/memory/used_bytes"]
+    assert df["resource.labels.container_name"].isna().tolist() == [True] * 3 + [False, True]
+    for column in LABEL_COLUMNS:
+        assert isinstance(df[column].dtype, pd.CategoricalDtype)
+    # Categories are the distinct labels of the series, not of the points
+    assert list(df["resource.labels.pod_name"].cat.categories) == ["pod-a", "pod-b", "pod-c", "pod-d"]
+
+
+def test_series_without_points_decode_to_an_empty_frame():
+    assert decode_time_series([_series("pod-a", [])]).empty
+    assert decode_time_series([]).empty
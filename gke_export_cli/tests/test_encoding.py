@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from utils.decode import LABEL_COLUMNS
+from utils.encoding import ChangePointWriter, encode_change_points, expand_change_points
+from utils.file import StreamingWriter
+from utils.rollup import load_points
+
+ALIGNMENT_PERIOD = timedelta(minutes=1)
+END_TIME = pd.Timestamp("2024-09-01T00:00:00Z")
+
+LABELS = {
+    "metric.type": "kubernetes.io/container/cpu/request_cores",
+    "resource.type": "k8s_container",
+    "resource.labels.namespace_name": "default",
+    "resource.labels.container_name": "app",
+    "metadata.systemLabels.top_level_controller_name": "frontend",
+    "metadata.systemLabels.top_level_controller_type": "Deployment"
+}
+
+
+def _series(pod_name, values, missing=(), value_column="value.doubleValue", **labels):
+    """
+    Points of one series, newest first, one per minute before END_TIME, without the
+    points whose index is in `missing`.
+    """
+    rows = [index for index in range(len(values)) if index not in missing]
+    end_times = pd.DatetimeIndex([END_TIME - index * ALIGNMENT_PERIOD for index in rows])
+    return pd.DataFrame({
+        "interval.startTime": end_times - ALIGNMENT_PERIOD,
+        "interval.endTime": end_times,
+        value_column: [values[index] for index in rows],
+        **{**LABELS, **labels, "resource.labels.pod_name": pod_name}
+    })
+
+
+def _points():
+    return pd.concat([
+        # Value changes and a one point gap
+        _series("pod-a", [0.5] * 5 + [0.25] * 5 + [0.5] * 5, missing={7}),
+        # Missing labels
+        _series("pod-b", [0.1] * 10, **{"metadata.systemLabels.top_level_controller_type": None}),
+        _series("pod-c", [0.1] * 4, **{"metadata.systemLabels.top_level_controller_name": None,
+                                       "metadata.systemLabels.top_level_controller_type": None}),
+        # Missing values are one run
+        _series("pod-d", [np.nan] * 3 + [1.0] * 3)
+    ], ignore_index=True)
+
+
+def _normalized(df):
+    labels = [column for column in LABEL_COLUMNS if column in df.columns]
+    columns = ["interval.startTime", "interval.endTime", "value.doubleValue"] + labels
+    df = df[columns].astype({column: object for column in labels})
+    df = df.astype({column: "datetime64[ns, UTC]" for column in ["interval.startTime", "interval.endTime"]})
+    return df.fillna({column: "" for column in labels}).sort_values(labels + ["interval.endTime"]).reset_index(drop=True)
+
+
+def test_encoding_round_trip_keeps_gaps_missing_labels_and_values():
+    points = _points()
+
+    intervals = encode_change_points(points, ALIGNMENT_PERIOD)
+
+    # pod-a: 5 newest, 2 around the gap, 5 middle, 5 oldest; pod-b, pod-c; pod-d: 2 runs
+    assert sorted(intervals.groupby("resource.labels.pod_name")["point_count"].apply(list).items()) == [
+        ("pod-a", [5, 2, 2, 5]), ("pod-b", [10]), ("pod-c", [4]), ("pod-d", [3, 3])
+    ]
+    pd.testing.assert_frame_equal(_normalized(expand_change_points(intervals)), _normalized(points))
+
+
+def test_encoding_round_trip_keeps_integer_values():
+    points = _series("pod-a", [100, 100, 200, 200], value_column="value.int64Value")
+    points["value.int64Value"] = points["value.int64Value"].astype("Int64")
+
+    expanded = expand_change_points(encode_change_points(points, ALIGNMENT_PERIOD))
+
+    assert expanded["value.int64Value"].tolist() == [100, 100, 200, 200]
+
+
+@pytest.mark.parametrize("format", ["parquet", "csv"])
+def test_change_point_writer_round_trip_across_pages(tmp_path, format):
+    points = _points()
+    writer = ChangePointWriter(StreamingWriter(tmp_path / f"cpu_request.{format}", format), ALIGNMENT_PERIOD)
+    # Pages split series, runs and gaps at arbitrary rows
+    shuffled = points.sample(frac=1, random_state=0)
+    for start in range(0, len(shuffled), 7):
+        writer.write(shuffled.iloc[start:start + 7])
+
+    file_path = writer.close()
+
+    assert len(pd.read_parquet(file_path) if format == "parquet" else pd.read_csv(file_path)) == len(encode_change_points(points, ALIGNMENT_PERIOD))
+    pd.testing.assert_frame_equal(_normalized(load_points(file_path)), _normalized(points))
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+import pandas as pd
+from utils.cache import WindowCache
+from utils.decode import LABEL_COLUMNS
+from utils.fetch_gke_metrics import METRICS_INFO, fetch_all_metrics
+from utils.file import StreamingWriter
+
+START_TIME = "2024-08-31T00:00:00Z"
+END_TIME = "2024-09-01T00:00:00Z"
+
+
+def _fetch(output_dir=None, shard_duration=None, cache=None, start_time=START_TIME):
+    writer_factory = None
+    if output_dir is not None:
+        output_dir.mkdir()
+        writer_factory = lambda key: StreamingWriter(output_dir / f"{key}.parquet", "parquet")
+    data = fetch_all_metrics(
+        project_id="synthetic-project",
+        location="us-central1",
+        cluster_name="synthetic-cluster",
+        namespace="default",
+        container_name=None,
+        controller_name="frontend",
+        controller_type=None,
+        start_time=start_time,
+        end_time=END_TIME,
+        metrics_info={"cpu_usage": METRICS_INFO["cpu_usage"]},
+        shard_duration=shard_duration,
+        writer_factory=writer_factory,
+        cache=cache,
+        fetch_assets=False
+    )
+    df = data["cpu_usage"]
+    if output_dir is not None:
+        df = pd.read_parquet(df)
+    # The synthetic values depend on the queried window, so only the points are compared
+    labels = [column for column in LABEL_COLUMNS if column in df.columns]
+    columns = labels + ["interval.startTime", "interval.endTime"]
+    return df[columns].astype({column: object for column in labels}).sort_values(columns).reset_index(drop=True)
+
+
+def test_sharded_stream_keeps_points_on_window_boundaries(fake_api, tmp_path):
+    whole = _fetch(tmp_path / "whole")
+    sharded = _fetch(tmp_path / "sharded", shard_duration=timedelta(hours=6))
+
+    assert len(whole) == 5 * 24 * 60
+    pd.testing.assert_frame_equal(sharded, whole)
+
+
+def test_cached_fetch_returns_the_points_of_an_uncached_fetch(fake_api, tmp_path):
+    cache = WindowCache(tmp_path / "cache")
+    # The cache then also holds the points ending exactly at START_TIME
+    _fetch(cache=cache, start_time="2024-08-30T12:00:00Z")
+
+    pd.testing.assert_frame_equal(_fetch(cache=cache), _fetch())
+
+
+def test_streamed_cached_fetch_streams_pages_into_the_cache(fake_api, tmp_path, monkeypatch):
+    cache = WindowCache(tmp_path / "cache")
+    _fetch(tmp_path / "partial", cache=cache, start_time="2024-08-31T12:00:00Z")
+
+    # Buffering a whole window before caching it would go through store
+    def store(*args):
+        raise AssertionError("a streamed fetch must not buffer its windows")
+    monkeypatch.setattr(WindowCache, "store", store)
+
+    streamed = _fetch(tmp_path / "streamed", shard_duration=timedelta(hours=6), cache=cache)
+    assert not any(cache.missing_ranges(path.name, START_TIME, END_TIME) for path in (tmp_path / "cache").iterdir())
+    cached = _fetch(tmp_path / "cached", cache=cache)
+
+    pd.testing.assert_frame_equal(streamed, _fetch(tmp_path / "uncached"))
+    pd.testing.assert_frame_equal(cached, streamed)
@@ -0,0 +1,60 @@
+from benchmarks.synthetic import SYNTHETIC_WORKLOAD
+from utils.fetch_startup_time import _expected_name, _search_query, extract_container_info, fetch_and_process_assets
+
+CLUSTER = ("project-a", "us-central1", "cluster")
+
+# A pod as returned under the field masks: only the fields extract_container_info reads
+MASKED_POD = {
+    "metadata": {"name": "frontend-6d4cf56db6-abcde", "namespace": "default"},
+    "spec": {"containers": [{"name": "server", "readinessProbe": {}}, {"name": "sidecar"}]},
+    "status": {"conditions": [
+        {"type": "PodScheduled", "lastTransitionTime": "2024-08-31T00:00:00Z"},
+        {"type": "Ready", "lastTransitionTime": "2024-08-31T00:00:30Z"}
+    ]}
+}
+
+
+def test_extract_container_info_reads_masked_pods():
+    rows = extract_container_info(MASKED_POD, "us-central1", "cluster", "default", "frontend", "project-a")
+
+    assert [(row["container_name"], row["readiness_probe_exists"]) for row in rows] == [("server", True), ("sidecar", False)]
+    assert rows[0]["pod_name"] == "frontend-6d4cf56db6-abcde"
+    assert rows[0]["PodScheduled_lastTransitionTime"] == "2024-08-31T00:00:00Z"
+    assert rows[0]["Ready_lastTransitionTime"] == "2024-08-31T00:00:30Z"
+
+
+def test_extract_container_info_without_conditions():
+    # Partial responses leave out the status of pods without conditions
+    pod = {key: value for key, value in MASKED_POD.items() if key != "status"}
+
+    rows = extract_container_info(pod, "us-central1", "cluster", "", "", "project-a")
+
+    assert len(rows) == 2
+    assert rows[0]["namespace"] == "default"
+    assert rows[0]["Ready_lastTransitionTime"] == "Unknown"
+
+
+def test_names_and_query_of_a_controller():
+    expected_name = _expected_name(*CLUSTER, "frontend", "default")
+
+    assert expected_name == "projects/project-a/locations/us-central1/clusters/cluster/k8s/namespaces/default/pods/frontend"
+    assert _search_query(expected_name, "frontend") == (
+        'name:"frontend" AND parentFullResourceName:"projects/project-a/locations/us-central1/clusters/cluster/k8s/namespaces/default"'
+    )
+
+
+def test_names_and_query_of_a_whole_cluster():
+    expected_name = _expected_name(*CLUSTER, "", "")
+
+    assert expected_name == "projects/project-a/locations/us-central1/clusters/cluster/k8s/namespaces/"
+    assert _search_query(expected_name, "") == 'parentFullResourceName:"projects/project-a/locations/us-central1/clusters/cluster"'
+
+
+def test_fetch_and_process_assets(fake_api):
+    workload = SYNTHETIC_WORKLOAD
+    df = fetch_and_process_assets(workload["project_id"], workload["location"], workload["cluster_name"], workload["controller_name"], workload["namespace"])
+
+    # 5 pods of 3 containers, the first container with a readiness probe
+    assert len(df) == 15
+    assert df["readiness_probe_exists"].sum() == 5
+    assert set(df["namespace"]) == {workload["namespace"]}
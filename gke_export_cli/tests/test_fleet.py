@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+from utils.file import read_batches
+from utils.fleet import combine_target_outputs
+
+
+def _write_part(run_dir, target, key, df, format):
+    target_dir = run_dir / "targets" / target
+    target_dir.mkdir(parents=True, exist_ok=True)
+    file_path = target_dir / f"{target}_{key}.{format}"
+    if format == "csv":
+        df.to_csv(file_path, index=False)
+    else:
+        df.to_parquet(file_path, index=False)
+
+
+@pytest.mark.parametrize("format", ["parquet", "csv"])
+def test_combine_target_outputs_appends_every_part(tmp_path, format):
+    parts = {
+        target: pd.DataFrame({
+            "value.doubleValue": [float(index) for index in range(10)],
+            "resource.labels.cluster_name": pd.Categorical([target] * 10)
+        })
+        for target in ["p_l_cluster-a", "p_l_cluster-b", "p_l_cluster-c"]
+    }
+    for target, df in parts.items():
+        _write_part(tmp_path, target, "cpu_usage", df, format)
+    _write_part(tmp_path, "p_l_cluster-a", "pod_startup", pd.DataFrame({"pod_name": ["pod-a"]}), format)
+
+    combined = combine_target_outputs(tmp_path, format, "run", ["cpu_usage", "memory_usage", "pod_startup"])
+
+    assert set(combined) == {"cpu_usage", "pod_startup"}
+    df = pd.read_csv(combined["cpu_usage"]) if format == "csv" else pd.read_parquet(combined["cpu_usage"])
+    assert df["resource.labels.cluster_name"].astype(str).tolist() == [target for target in parts for _ in range(10)]
+    assert df["value.doubleValue"].tolist() == [float(index) for index in range(10)] * 3
+
+
+@pytest.mark.parametrize("format", ["parquet", "csv"])
+def test_read_batches_bounds_the_rows_per_batch(tmp_path, format):
+    df = pd.DataFrame({"value.doubleValue": [float(index) for index in range(10)]})
+    _write_part(tmp_path, "target", "cpu_usage", df, format)
+
+    batches = list(read_batches(tmp_path / "targets" / "target" / f"target_cpu_usage.{format}", format, batch_rows=4))
+
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), df)
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from utils.decode import LABEL_COLUMNS
+from utils.encoding import encode_change_points, expand_change_points
+from utils.file import StreamingWriter, save_dataframes
+from utils.layout import (POINTS_SUFFIX, SERIES_ID_COLUMN, SERIES_TABLE, NormalizingWriter, SeriesRegistry,
+                          load_wide, normalize_metrics)
+
+ALIGNMENT_PERIOD = timedelta(minutes=1)
+END_TIME = pd.Timestamp("2024-09-01T00:00:00Z")
+PREFIX = "20240901_ab12"
+
+LABELS = {
+    "resource.type": "k8s_container",
+    "resource.labels.project_id": "project-a",
+    "resource.labels.namespace_name": "default",
+    "resource.labels.container_name": "app",
+    "metadata.systemLabels.top_level_controller_name": "frontend",
+    "metadata.systemLabels.top_level_controller_type": "Deployment"
+}
+
+
+def _series(metric_type, pod_name, values, **labels):
+    # Points of one series, newest first, one per minute before END_TIME
+    end_times = pd.DatetimeIndex([END_TIME - index * ALIGNMENT_PERIOD for index in range(len(values))])
+    return pd.DataFrame({
+        "interval.startTime": end_times - ALIGNMENT_PERIOD,
+        "interval.endTime": end_times,
+        "value.doubleValue": values,
+        **{"metric.type": metric_type, **LABELS, **labels, "resource.labels.pod_name": pod_name}
+    })
+
+
+def _metric(metric_type):
+    return pd.concat([
+        _series(metric_type, "pod-a", [0.5, 0.5, 0.25, 0.25, 0.5]),
+        _series(metric_type, "pod-b", [0.1, np.nan, 0.1]),
+        # Missing labels
+        _series(metric_type, "pod-c", [1.0, 2.0], **{"metadata.systemLabels.top_level_controller_type": None})
+    ], ignore_index=True).astype({column: "category" for column in ["metric.type", *LABELS, "resource.labels.pod_name"]})
+
+
+def _metrics():
+    return {
+        "cpu_usage": _metric("kubernetes.io/container/cpu/core_usage_time"),
+        "memory_usage": _metric("kubernetes.io/container/memory/used_bytes"),
+        "pod_startup": pd.DataFrame({"pod_name": ["pod-a"], "readiness_probe_exists": [True]})
+    }
+
+
+def _comparable(df):
+    df = df.reindex(columns=["interval.startTime", "interval.endTime", "value.doubleValue"] + LABEL_COLUMNS)
+    df = df.astype({column: object for column in LABEL_COLUMNS}).astype({"value.doubleValue": "float64"})
+    df = df.astype({column: "datetime64[ns, UTC]" for column in ["interval.startTime", "interval.endTime"]})
+    df = df.fillna({column: "" for column in LABEL_COLUMNS})
+    return df.sort_values(LABEL_COLUMNS + ["interval.endTime"]).reset_index(drop=True)
+
+
+def test_registry_assigns_one_id_per_label_set():
+    registry = SeriesRegistry()
+    cpu_usage = _metric("kubernetes.io/container/cpu/core_usage_time")
+
+    ids = registry.assign(cpu_usage)
+    # The same label sets get the same ids again, new ones the next ids
+    assert registry.assign(cpu_usage.iloc[::-1]).tolist() == ids[::-1].tolist()
+    memory_ids = registry.assign(_metric("kubernetes.io/container/memory/used_bytes"))
+
+    assert ids.tolist() == [0] * 5 + [1] * 3 + [2] * 2
+    assert memory_ids.tolist() == [3] * 5 + [4] * 3 + [5] * 2
+    series = registry.to_frame()
+    assert series[SERIES_ID_COLUMN].tolist() == list(range(6))
+    assert series["resource.labels.pod_name"].tolist() == ["pod-a", "pod-b", "pod-c"] * 2
+    assert series["metadata.systemLabels.top_level_controller_type"].isna().tolist() == [False, False, True] * 2
+    assert series["resource.labels.cluster_name"].isna().all()
+
+
+def test_normalize_metrics_shares_the_series_table():
+    metrics_data = _metrics()
+
+    normalized = normalize_metrics(metrics_data)
+
+    assert set(normalized) == {f"cpu_usage{POINTS_SUFFIX}", f"memory_usage{POINTS_SUFFIX}", "pod_startup", SERIES_TABLE}
+    assert normalized["pod_startup"] is metrics_data["pod_startup"]
+    assert len(normalized[SERIES_TABLE]) == 6
+    points = normalized[f"cpu_usage{POINTS_SUFFIX}"]
+    assert list(points.columns) == [SERIES_ID_COLUMN, "interval.startTime", "interval.endTime", "value.doubleValue"]
+
+
+@pytest.mark.parametrize("format", ["parquet", "csv"])
+def test_normalized_layout_round_trip(tmp_path, format):
+    metrics_data = _metrics()
+
+    save_dataframes(tmp_path, format, normalize_metrics(metrics_data), PREFIX, False)
+
+    for metric_name in ["cpu_usage", "memory_usage"]:
+        wide = load_wide(tmp_path, PREFIX, metric_name, format)
+        assert all(isinstance(wide[column].dtype, pd.CategoricalDtype) for column in LABEL_COLUMNS)
+        pd.testing.assert_frame_equal(_comparable(wide), _comparable(metrics_data[metric_name]))
+
+
+@pytest.mark.parametrize("format", ["parquet", "csv"])
+def test_normalizing_writer_round_trip_across_pages(tmp_path, format):
+    metrics_data = _metrics()
+    registry = SeriesRegistry()
+    for metric_name in ["cpu_usage", "memory_usage"]:
+        writer = NormalizingWriter(StreamingWriter(tmp_path / f"{PREFIX}_{metric_name}{POINTS_SUFFIX}.{format}", format), registry)
+        # Pages split series at arbitrary rows
+        shuffled = metrics_data[metric_name].sample(frac=1, random_state=0)
+        for start in range(0, len(shuffled), 3):
+            writer.write(shuffled.iloc[start:start + 3])
+        writer.close()
+
+    save_dataframes(tmp_path, format, normalize_metrics({}, registry), PREFIX, False)
+
+    for metric_name in ["cpu_usage", "memory_usage"]:
+        pd.testing.assert_frame_equal(_comparable(load_wide(tmp_path, PREFIX, metric_name, format)), _comparable(metrics_data[metric_name]))
+
+
+@pytest.mark.parametrize("format", ["parquet", "csv"])
+def test_normalized_change_points_round_trip(tmp_path, format):
+    points = _metric("kubernetes.io/container/cpu/request_cores")
+
+    save_dataframes(tmp_path, format, normalize_metrics({"cpu_request": encode_change_points(points, ALIGNMENT_PERIOD)}), PREFIX, False)
+
+    expanded = expand_change_points(load_wide(tmp_path, PREFIX, "cpu_request", format))
+    pd.testing.assert_frame_equal(_comparable(expanded), _comparable(points))
+
+
+def test_load_wide_rejects_points_of_unknown_series(tmp_path):
+    normalized = normalize_metrics(_metrics())
+    normalized[SERIES_TABLE] = normalized[SERIES_TABLE].iloc[:2]
+
+    save_dataframes(tmp_path, "parquet", normalized, PREFIX, False)
+
+    with pytest.raises(ValueError, match="missing from the series table"):
+        load_wide(tmp_path, PREFIX, "cpu_usage")
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from utils.rollup import SUMMARY_NAME, add_summary, rollup_metric, rollup_metrics
+
+ALIGNMENT_PERIOD = timedelta(minutes=1)
+START_TIME = "2024-08-31T23:00:00Z"
+
+LABELS = {
+    "resource.type": "k8s_container",
+    "resource.labels.namespace_name": "default",
+    "resource.labels.container_name": "app"
+}
+
+
+def _points(metric_type, pod_name, end_times, values):
+    end_times = pd.DatetimeIndex(end_times)
+    return pd.DataFrame({
+        "interval.startTime": end_times - ALIGNMENT_PERIOD,
+        "interval.endTime": end_times,
+        "value.doubleValue": values,
+        "metric.type": metric_type,
+        **LABELS,
+        "resource.labels.pod_name": pod_name
+    })
+
+
+def _minutes(start, count):
+    # End times of `count` points, the first one ending a minute after `start`
+    return [pd.Timestamp(start) + (index + 1) * ALIGNMENT_PERIOD for index in range(count)]
+
+
+def _bucket(rollup, bucket):
+    return rollup[rollup["bucket"] == bucket]
+
+
+def test_points_ending_on_a_boundary_belong_to_the_bucket_before():
+    # The hour from 23:00 to midnight, whose last point ends at midnight, and one point after it
+    end_times = _minutes("2024-08-31T23:00:00Z", 61)
+    df = _points("kubernetes.io/container/cpu/core_usage_time", "pod-a", end_times, [1.0] * 60 + [5.0])
+
+    rollup = rollup_metric(df, START_TIME)
+
+    hours = _bucket(rollup, "hour")
+    assert hours["bucket_start"].tolist() == [pd.Timestamp("2024-08-31T23:00:00Z"), pd.Timestamp("2024-09-01T00:00:00Z")]
+    assert hours["points"].tolist() == [60, 1]
+    assert hours["max"].tolist() == [1.0, 5.0]
+    days = _bucket(rollup, "day")
+    assert days["bucket_start"].tolist() == [pd.Timestamp("2024-08-31T00:00:00Z"), pd.Timestamp("2024-09-01T00:00:00Z")]
+    assert days["points"].tolist() == [60, 1]
+    window = _bucket(rollup, "window")
+    assert window["bucket_start"].tolist() == [pd.Timestamp(START_TIME)]
+    assert window["points"].tolist() == [61]
+
+
+def test_rollup_statistics_per_series():
+    end_times = _minutes("2024-09-01T00:00:00Z", 60)
+    values = np.arange(1.0, 61.0)
+    df = pd.concat([
+        _points("kubernetes.io/container/cpu/core_usage_time", "pod-a", end_times, values),
+        _points("kubernetes.io/container/cpu/core_usage_time", "pod-b", end_times, values * 2)
+    ], ignore_index=True)
+
+    rollup = _bucket(rollup_metric(df), "hour")
+
+    assert rollup["resource.labels.pod_name"].tolist() == ["pod-a", "pod-b"]
+    pod_a = rollup.iloc[0]
+    assert pod_a["points"] == 60
+    assert pod_a["mean"] == pytest.approx(30.5)
+    for column, quantile in [("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99)]:
+        assert pod_a[column] == pytest.approx(np.quantile(values, quantile))
+        assert rollup.iloc[1][column] == pytest.approx(np.quantile(values * 2, quantile))
+    assert pod_a["max"] == 60.0
+
+
+def test_usage_rollup_joins_the_largest_request_of_the_same_series():
+    end_times = _minutes("2024-09-01T00:00:00Z", 4)
+    metrics_data = {
+        "cpu_usage": pd.concat([
+            _points("kubernetes.io/container/cpu/core_usage_time", "pod-a", end_times, [0.1, 0.2, 0.3, 0.4]),
+            _points("kubernetes.io/container/cpu/core_usage_time", "pod-b", end_times, [0.1] * 4)
+        ], ignore_index=True),
+        "cpu_request": _points("kubernetes.io/container/cpu/request_cores", "pod-a", end_times, [0.5, 0.5, 1.0, 1.0]),
+        "pod_startup": pd.DataFrame({"pod_name": ["pod-a"]})
+    }
+
+    summary = rollup_metrics(metrics_data, "2024-09-01T00:00:00Z")
+
+    assert set(summary["metric"]) == {"cpu_usage", "cpu_request"}
+    usage = _bucket(summary[summary["metric"] == "cpu_usage"], "hour")
+    requests = usage.set_index("resource.labels.pod_name")["request"]
+    assert requests["pod-a"] == 1.0
+    assert np.isnan(requests["pod-b"])
+    # Requests are not compared with themselves
+    assert summary.loc[summary["metric"] == "cpu_request", "request"].isna().all()
+
+
+def test_add_summary_only_keeps_the_other_entries():
+    pod_startup = pd.DataFrame({"pod_name": ["pod-a"]})
+    metrics_data = {
+        "cpu_usage": _points("kubernetes.io/container/cpu/core_usage_time", "pod-a", _minutes("2024-09-01T00:00:00Z", 2), [0.1, 0.2]),
+        "pod_startup": pod_startup
+    }
+
+    assert set(add_summary(metrics_data)) == {"cpu_usage", "pod_startup", SUMMARY_NAME}
+    summary_only = add_summary(metrics_data, summary_only=True)
+    assert set(summary_only) == {"pod_startup", SUMMARY_NAME}
+    assert len(summary_only[SUMMARY_NAME]) == 3
@@ -0,0 +1,26 @@
+import builtins
+import subprocess
+import sys
+from pathlib import Path
+
+from utils import run_report
+
+
+def test_cli_imports_without_the_posix_resource_module():
+    # A None entry in sys.modules makes the import fail, as on Windows
+    check = "import sys; sys.modules['resource'] = None; import cli"
+    subprocess.run([sys.executable, '-c', check], cwd=Path(__file__).resolve().parent.parent, check=True)
+
+
+def test_current_rss_is_zero_without_proc_and_resource(monkeypatch):
+    real_open = builtins.open
+
+    def open_without_proc(path, *args, **kwargs):
+        if str(path).startswith('/proc/'):
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', open_without_proc)
+    monkeypatch.setitem(sys.modules, 'resource', None)
+
+    assert run_report.current_rss() == 0
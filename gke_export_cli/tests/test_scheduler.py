@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from utils import scheduler
+from utils.scheduler import AdaptiveLimiter, RequestScheduler, TokenBucket
+
+
+def _http_error(status, retry_after=None):
+    info = {'status': str(status)}
+    if retry_after is not None:
+        info['retry-after'] = str(retry_after)
+    return HttpError(httplib2.Response(info), b'')
+
+
+class FakeRequest:
+    """
+    A googleapiclient request raising the given errors before returning a response.
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def execute(self, num_retries=0):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'ok': True}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(scheduler.time, 'sleep', delays.append)
+    return delays
+
+
+def test_token_bucket_allows_bursts_up_to_capacity():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    assert 0.0 < bucket.try_acquire() <= 0.1
+
+
+def test_limiter_grows_additively_up_to_maximum():
+    limiter = AdaptiveLimiter(initial=2, maximum=3)
+
+    limiter.on_success()
+    assert limiter.limit == pytest.approx(2.5)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.limit == 3
+
+
+def test_limiter_halves_once_per_congestion_event():
+    limiter = AdaptiveLimiter(initial=32)
+    started = time.perf_counter()
+
+    # A burst of requests in flight together, all throttled
+    decreased = [limiter.on_throttle(started) for _ in range(5)]
+
+    assert decreased == [True, False, False, False, False]
+    assert limiter.limit == 16
+    # A request sent after the decrease is throttled again
+    assert limiter.on_throttle(time.perf_counter())
+    assert limiter.limit == 8
+
+
+def test_limiter_blocks_when_the_limit_is_reached():
+    limiter = AdaptiveLimiter(initial=1)
+
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+
+
+def test_execute_retries_throttling_and_honours_retry_after(sleeps):
+    request = FakeRequest(_http_error(429, retry_after=7), _http_error(503))
+    request_scheduler = RequestScheduler(base_delay=1.0)
+
+    assert request_scheduler.execute('monitoring', request) == {'ok': True}
+
+    stats = request_scheduler.stats()['monitoring']
+    assert request.calls == 3
+    assert sleeps[0] == 7.0
+    assert 0.0 <= sleeps[1] <= 2.0
+    assert (stats['retries'], stats['throttled'], stats['wasted_calls'], stats['failed']) == (2, 2, 2, 0)
+
+
+def test_execute_raises_non_retryable_errors_at_once(sleeps):
+    request = FakeRequest(_http_error(404))
+    request_scheduler = RequestScheduler()
+
+    with pytest.raises(HttpError):
+        request_scheduler.execute('monitoring', request)
+
+    assert request.calls == 1
+    assert sleeps == []
+    assert request_scheduler.stats()['monitoring']['failed'] == 1
+
+
+def test_execute_gives_up_after_max_retries(sleeps):
+    request = FakeRequest(*[_http_error(500) for _ in range(5)])
+    request_scheduler = RequestScheduler(max_retries=2)
+
+    with pytest.raises(HttpError):
+        request_scheduler.execute('monitoring', request)
+
+    assert request.calls == 3
+    assert request_scheduler.stats()['monitoring']['retries'] == 2
+
+
+def test_async_waiters_are_woken_by_release_without_polling(monkeypatch):
+    limiter = AdaptiveLimiter(initial=1)
+
+    async def no_sleep(delay):
+        raise AssertionError("acquire_async must not poll")
+
+    async def main():
+        await limiter.acquire_async()
+        waiters = [asyncio.create_task(limiter.acquire_async()) for _ in range(3)]
+        await asyncio.sleep(0)
+        monkeypatch.setattr(asyncio, 'sleep', no_sleep)
+        assert not any(waiter.done() for waiter in waiters)
+
+        # Released from another thread, as the synchronous calls do
+        for waiter in waiters:
+            threading.Thread(target=limiter.release).start()
+            await asyncio.wait_for(waiter, timeout=5)
+
+    asyncio.run(main())
+
+
+def test_cancelled_async_waiter_passes_its_slot_on():
+    limiter = AdaptiveLimiter(initial=1)
+
+    async def main():
+        await limiter.acquire_async()
+        cancelled = asyncio.create_task(limiter.acquire_async())
+        waiting = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        limiter.release()
+        await asyncio.wait_for(waiting, timeout=5)
+
+    asyncio.run(main())
+
+
+def test_execute_async_has_its_own_concurrency_ceiling():
+    request_scheduler = RequestScheduler(
+        rate_limits={'monitoring': 1e9}, max_concurrency=8,
+        initial_async_concurrency=300, max_async_concurrency=300
+    )
+    in_flight = 0
+    peak = 0
+
+    async def send():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {}
+
+    async def main():
+        await asyncio.gather(*[request_scheduler.execute_async('monitoring', send) for _ in range(400)])
+
+    asyncio.run(main())
+
+    assert peak == 300
+    assert request_scheduler.stats()['monitoring']['concurrency_limit'] == 8
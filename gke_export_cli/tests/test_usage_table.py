@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from utils.usage_table import build_usage_table
+
+ALIGNMENT_PERIOD = timedelta(minutes=1)
+START_TIME = pd.Timestamp("2024-09-01T00:00:00Z")
+
+LABELS = {
+    "resource.type": "k8s_container",
+    "resource.labels.project_id": "project-a",
+    "resource.labels.location": "us-central1",
+    "resource.labels.cluster_name": "cluster",
+    "resource.labels.namespace_name": "default",
+    "resource.labels.container_name": "app",
+    "metadata.systemLabels.top_level_controller_name": "frontend",
+    "metadata.systemLabels.top_level_controller_type": "Deployment"
+}
+
+
+def _points(metric_type, pod_name, minutes, values, value_column="value.doubleValue"):
+    # One point per entry of `minutes`, ending that many minutes after START_TIME
+    end_times = pd.DatetimeIndex([START_TIME + minute * ALIGNMENT_PERIOD for minute in minutes])
+    return pd.DataFrame({
+        "interval.startTime": end_times - ALIGNMENT_PERIOD,
+        "interval.endTime": end_times,
+        value_column: values,
+        "metric.type": metric_type,
+        **LABELS,
+        "resource.labels.pod_name": pod_name
+    })
+
+
+def _cpu_usage(pod_name, minutes):
+    return _points("kubernetes.io/container/cpu/core_usage_time", pod_name, minutes, [0.5] * len(minutes))
+
+
+def _cpu_request(pod_name, minutes, values):
+    return _points("kubernetes.io/container/cpu/request_cores", pod_name, minutes, values)
+
+
+def _rows(table, pod_name):
+    return table[table["resource.labels.pod_name"] == pod_name]
+
+
+def test_request_before_the_first_usage_point_applies():
+    table = build_usage_table({
+        "cpu_usage": _cpu_usage("pod-a", range(4)),
+        "cpu_request": _cpu_request("pod-a", [-5], [1.0])
+    })
+
+    assert len(table) == 4
+    assert table["cpu_request"].tolist() == [1.0] * 4
+    assert table["cpu_utilization"].tolist() == [0.5] * 4
+    assert table["interval.endTime"].tolist() == [START_TIME + minute * ALIGNMENT_PERIOD for minute in range(4)]
+
+
+def test_request_change_applies_from_its_end_time():
+    table = build_usage_table({
+        "cpu_usage": _cpu_usage("pod-a", range(4)),
+        "cpu_request": _cpu_request("pod-a", [0, 2], [1.0, 2.0])
+    })
+
+    assert table["cpu_request"].tolist() == [1.0, 1.0, 2.0, 2.0]
+    assert table["cpu_utilization"].tolist() == [0.5, 0.5, 0.25, 0.25]
+
+
+def test_request_of_another_pod_does_not_apply():
+    table = build_usage_table({
+        "cpu_usage": pd.concat([_cpu_usage("pod-a", range(3)), _cpu_usage("pod-b", range(3))], ignore_index=True),
+        # pod-b orders after pod-a, so its rows search past pod-a's last request
+        "cpu_request": pd.concat([_cpu_request("pod-a", [0], [1.0]), _cpu_request("pod-c", [0], [4.0])], ignore_index=True)
+    })
+
+    assert len(table) == 6
+    assert _rows(table, "pod-a")["cpu_request"].tolist() == [1.0] * 3
+    assert _rows(table, "pod-b")["cpu_request"].isna().all()
+    assert _rows(table, "pod-b")["cpu_utilization"].isna().all()
+    assert "pod-c" not in set(table["resource.labels.pod_name"])
+
+
+def test_missing_or_zero_request_gives_no_utilization():
+    table = build_usage_table({
+        "cpu_usage": _cpu_usage("pod-a", range(4)),
+        # No request before minute 1, then a zero request
+        "cpu_request": _cpu_request("pod-a", [1, 2], [1.0, 0.0])
+    })
+
+    assert table["cpu_request"].tolist()[1:] == [1.0, 0.0, 0.0]
+    assert np.isnan(table["cpu_request"].iloc[0])
+    assert table["cpu_utilization"].isna().tolist() == [True, False, True, True]
+    # Without memory metrics the memory columns are missing
+    assert table["memory_usage"].isna().all()
+
+
+def test_pod_startup_joins_on_namespace_pod_and_container():
+    pod_startup = pd.DataFrame({
+        "namespace": ["default", "default", "other"],
+        "pod_name": ["pod-a", "pod-b", "pod-a"],
+        "container_name": ["app", "app", "app"],
+        "readiness_probe_exists": [True, False, False],
+        "PodScheduled_lastTransitionTime": ["2024-08-31T00:00:00Z", "2024-08-31T00:00:00Z", "2024-08-31T00:00:00Z"],
+        "Ready_lastTransitionTime": ["2024-08-31T00:00:30Z", "Unknown", "2024-08-31T00:05:00Z"]
+    })
+    table = build_usage_table({
+        "cpu_usage": pd.concat([_cpu_usage("pod-a", range(2)), _cpu_usage("pod-b", range(2)), _cpu_usage("pod-c", range(2))], ignore_index=True),
+        "pod_startup": pod_startup
+    })
+
+    pod_a, pod_b, pod_c = _rows(table, "pod-a"), _rows(table, "pod-b"), _rows(table, "pod-c")
+    assert pod_a["readiness_probe_exists"].tolist() == [True, True]
+    assert pod_a["startup_seconds"].tolist() == [30.0, 30.0]
+    assert (pod_a["pod_ready_time"] == pd.Timestamp("2024-08-31T00:00:30Z")).all()
+    # A condition the pod did not report is missing
+    assert pod_b["readiness_probe_exists"].tolist() == [False, False]
+    assert pod_b["pod_ready_time"].isna().all()
+    assert pod_b["startup_seconds"].isna().all()
+    # No pod_startup row for pod-c
+    assert pod_c["readiness_probe_exists"].isna().all()
+    assert pod_c["pod_scheduled_time"].isna().all()
+
+
+def test_memory_columns_are_integers():
+    memory_usage = _points("kubernetes.io/container/memory/used_bytes", "pod-a", range(3), [100, 200, 300], "value.int64Value")
+    memory_request = _points("kubernetes.io/container/memory/request_bytes", "pod-a", [0], [400], "value.int64Value")
+    table = build_usage_table({
+        "memory_usage": memory_usage.astype({"value.int64Value": "Int64"}),
+        "memory_request": memory_request.astype({"value.int64Value": "Int64"})
+    })
+
+    assert table["memory_usage"].dtype == "Int64"
+    assert table["memory_request"].dtype == "Int64"
+    assert table["memory_usage"].tolist() == [100, 200, 300]
+    assert table["memory_request"].tolist() == [400] * 3
+    assert table["memory_utilization"].tolist() == pytest.approx([0.25, 0.5, 0.75])
+    # Without cpu usage the cpu columns are missing, as floats
+    assert table["cpu_usage"].dtype == "float64"
+    assert table["cpu_usage"].isna().all()
+
+
+def test_no_usage_metrics_give_an_empty_table():
+    assert build_usage_table({"cpu_request": _cpu_request("pod-a", [0], [1.0])}).empty
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+from utils.decode import LABEL_COLUMNS
+from utils.encoding import VALUE_COLUMNS
+from utils.fetch_gke_metrics import CONTAINER_GROUP_BY_FIELDS
+from utils.options import ALIGNMENT_PERIOD, STATISTICS
+from utils.time_windows import parse_rfc3339
+
+# Per-series aligners computing a statistic over each alignment period, per metric kind.
+# Percentile aligners only apply to distribution-valued metrics.
+TIME_ALIGNERS = {
+    "GAUGE": {"mean": "ALIGN_MEAN", "max": "ALIGN_MAX"},
+    "DELTA": {"mean": "ALIGN_MEAN", "max": "ALIGN_MAX"},
+    "CUMULATIVE": {"mean": "ALIGN_RATE"},
+    "DISTRIBUTION": {
+        "mean": "ALIGN_MEAN",
+        "p50": "ALIGN_PERCENTILE_50",
+        "p95": "ALIGN_PERCENTILE_95",
+        "p99": "ALIGN_PERCENTILE_99"
+    }
+}
+
+# Reducers combining the series of a group into one statistic at each alignment point
+CROSS_SERIES_REDUCERS = {
+    "mean": "REDUCE_MEAN",
+    "max": "REDUCE_MAX",
+    "p50": "REDUCE_PERCENTILE_50",
+    "p95": "REDUCE_PERCENTILE_95",
+    "p99": "REDUCE_PERCENTILE_99"
+}
+
+# Labels dropped from the output when statistics are computed across the pods of a container
+POD_COLUMNS = ["resource.labels.pod_name"]
+
+
+def plan_statistics(metrics_info: dict, statistics: list, granularity: str, alignment_period) -> dict:
+    """
+    Chooses the cheapest query answering each requested statistic of each metric.
+
+    With 'pod' granularity a statistic is computed per series over each alignment period.
+    If Cloud Monitoring has a per-series aligner for it (see TIME_ALIGNERS), the query
+    returns one point per series and period. Otherwise the points are fetched at the
+    default alignment period and the statistic is computed locally.
+
+    With 'container' granularity a statistic is computed across the pods of each
+    container at each alignment point. If a cross-series reducer exists for it (see
+    CROSS_SERIES_REDUCERS), the query groups by container instead of by pod and returns
+    one series per container. Otherwise the pod series are fetched and reduced locally.
+
+    Parameters:
+    - metrics_info (dict): The metrics, as for fetch_all_metrics. Entries set their metric
+      "kind" (GAUGE, DELTA, CUMULATIVE or DISTRIBUTION).
+    - statistics (list): Statistics from STATISTICS.
+    - granularity (str): 'pod' or 'container'.
+    - alignment_period (timedelta): The period over which each statistic is computed.
+
+    Returns:
+    - dict: 'queries', a metrics_info dictionary of the queries to run, 'outputs',
+      mapping each '<metric>_<statistic>' output to the query key it is computed from and
+      the local computation still needed ('time', 'pods' or None), and the 'granularity'.
+    """
+    queries = {}
+    outputs = {}
+    for key, info in metrics_info.items():
+        base = {name: value for name, value in info.items() if name != 'encoding'}
+        aligners = TIME_ALIGNERS.get(info.get("kind", "GAUGE"), {})
+
+        for statistic in statistics:
+            output_key = f"{key}_{statistic}"
+            if granularity == 'pod' and statistic in aligners:
+                queries[output_key] = {
+                    **base,
+                    "aligner": aligners[statistic],
+                    "reducer": CROSS_SERIES_REDUCERS.get(statistic, "REDUCE_MEAN"),
+                    "alignment_period": alignment_period
+                }
+                outputs[output_key] = (output_key, None)
+            elif granularity == 'pod':
+                # Fetched once at full resolution for all statistics computed locally
+                queries[key] = {**base, "alignment_period": min(ALIGNMENT_PERIOD, alignment_period)}
+                outputs[output_key] = (key, 'time')
+            elif statistic in CROSS_SERIES_REDUCERS:
+                queries[output_key] = {
+                    **base,
+                    "reducer": CROSS_SERIES_REDUCERS[statistic],
+                    "alignment_period": alignment_period,
+                    "group_by_fields": CONTAINER_GROUP_BY_FIELDS
+                }
+                outputs[output_key] = (output_key, None)
+            else:
+                queries[key] = {**base, "alignment_period": alignment_period}
+                outputs[output_key] = (key, 'pods')
+
+    return {'queries': queries, 'outputs': outputs, 'granularity': granularity}
+
+
+def _values(df: pd.DataFrame) -> pd.Series:
+    values = pd.Series(np.nan, index=df.index)
+    for column in VALUE_COLUMNS:
+        if column in df.columns:
+            values = values.fillna(df[column].astype('float64'))
+    return values
+
+
+def _reduce(df: pd.DataFrame, group_columns: list, statistic: str) -> pd.DataFrame:
+    grouped = _values(df).groupby([df[column] for column in group_columns], observed=True, dropna=False, sort=False)
+    quantile = STATISTICS[statistic]
+    if quantile is None:
+        result = grouped.mean()
+    elif quantile == 1.0:
+        result = grouped.max()
+    else:
+        result = grouped.quantile(quantile)
+    return result.rename('value.doubleValue').reset_index()
+
+
+def aggregate_over_time(df: pd.DataFrame, statistic: str, alignment_period, end_time: str) -> pd.DataFrame:
+    """
+    Computes a statistic per series over alignment periods ending at `end_time`, like an
+    aligner of Cloud Monitoring: a point ending at t belongs to the period (T - period, T].
+
+    Returns:
+    - pd.DataFrame: One point per series and period, with the columns of decode_time_series.
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    end = pd.Timestamp(parse_rfc3339(end_time))
+    periods = ((end - df['interval.endTime']) // alignment_period).astype('int64')
+    df = df.assign(**{'interval.endTime': end - periods * alignment_period})
+
+    label_columns = [column for column in LABEL_COLUMNS if column in df.columns]
+    result = _reduce(df, label_columns + ['interval.endTime'], statistic)
+    result.insert(0, 'interval.startTime', result['interval.endTime'] - alignment_period)
+    return _order(result, label_columns)
+
+
+def aggregate_across_pods(df: pd.DataFrame, statistic: str) -> pd.DataFrame:
+    """
+    Computes a statistic across the pods of each container at each point in time.
+
+    Returns:
+    - pd.DataFrame: One point per container and time, without the pod column.
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    label_columns = [column for column in LABEL_COLUMNS if column in df.columns and column not in POD_COLUMNS]
+    result = _reduce(df, label_columns + ['interval.startTime', 'interval.endTime'], statistic)
+    return _order(result, label_columns)
+
+
+def _order(result: pd.DataFrame, label_columns: list) -> pd.DataFrame:
+    columns = ['interval.startTime', 'interval.endTime', 'value.doubleValue'] + label_columns
+    result = result[columns].sort_values(
+        label_columns + ['interval.endTime'],
+        ascending=[True] * len(label_columns) + [False],
+        na_position='last',
+        kind='stable'
+    )
+    return result.astype({column: 'category' for column in label_columns}).reset_index(drop=True)
+
+
+def compute_statistics(plan: dict, fetched: dict, end_time: str, alignment_period) -> dict:
+    """
+    Builds the statistic outputs of a plan (see plan_statistics) from the fetched queries.
+
+    Parameters:
+    - plan (dict): The plan returned by plan_statistics.
+    - fetched (dict): The DataFrames returned by fetch_all_metrics for plan['queries'].
+    - end_time (str): End of the time range in RFC3339 format.
+    - alignment_period (timedelta): The period over which each statistic is computed.
+
+    Returns:
+    - dict: One DataFrame per '<metric>_<statistic>' output, plus the entries of `fetched`
+      that are not metric queries (e.g., pod_startup).
+    """
+    results = {key: df for key, df in fetched.items() if key not in plan['queries']}
+    for output_key, (query_key, local) in plan['outputs'].items():
+        df = fetched.get(query_key)
+        if df is None or df.empty:
+            continue
+        statistic = output_key.rsplit('_', 1)[1]
+        if local == 'time':
+            df = aggregate_over_time(df, statistic, alignment_period, end_time)
+        elif local == 'pods':
+            df = aggregate_across_pods(df, statistic)
+        if plan['granularity'] == 'container':
+            df = df.drop(columns=[column for column in POD_COLUMNS if column in df.columns])
+        results[output_key] = df
+    return results
@@ -0,0 +1,286 @@
+import os
+import struct
+import tarfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utils.run_report import record
+
+# Archive formats offered by --archive-format, with the file extension of the archive
+ARCHIVE_FORMATS = {
+    "deflate": ".zip",
+    "zstd": ".zip",
+    "tar.zst": ".tar.zst"
+}
+
+DEFAULT_ARCHIVE_FORMAT = "deflate"
+
+# Compression level used when none is given, per archive format
+DEFAULT_ARCHIVE_LEVELS = {
+    "deflate": 6,
+    "zstd": 3,
+    "tar.zst": 3
+}
+
+# Size of the chunks read from files added to an archive
+ARCHIVE_CHUNK_SIZE = 1 << 20
+
+# Zip compression method numbers (APPNOTE 4.4.5)
+ZIP_METHODS = {
+    "deflate": 8,
+    "zstd": 93
+}
+
+# Sizes, offsets and entry counts from which ZIP64 records are written (APPNOTE 4.3.9, 4.5.3)
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+# Value of a zip header field whose actual value is in the ZIP64 records
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP64_COUNT_MARKER = 0xFFFF
+
+
+def _zstd_compressor(level: int):
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd archives require the 'zstandard' package (pip install zstandard)")
+    return zstandard.ZstdCompressor(level=level)
+
+
+def _dos_time(timestamp: float) -> tuple:
+    local = time.localtime(max(timestamp, 315532800))
+    return (
+        (local.tm_hour << 11) | (local.tm_min << 5) | (local.tm_sec // 2),
+        ((local.tm_year - 1980) << 9) | (local.tm_mon << 5) | local.tm_mday
+    )
+
+
+class _Entry:
+    """
+    One compressed archive entry, ready to be appended to the archive file.
+    """
+
+    def __init__(self, name: str, data: bytes, size: int, crc: int, mtime: float):
+        self.name = name
+        self.data = data
+        self.size = size
+        self.compressed_size = len(data)
+        self.crc = crc
+        self.mtime = mtime
+        self.offset = 0
+
+
+class ArchiveWriter:
+    """
+    Writes output files straight into one compressed archive as they are produced.
+
+    Entries are compressed independently on a thread pool (zlib and zstd release the
+    GIL), then appended to the archive in the order they were added, so at most about
+    `max_workers` compressed entries are held in memory.
+
+    Archive formats:
+    - 'deflate': a zip file with deflate compressed entries, readable everywhere.
+    - 'zstd': a zip file with zstd compressed entries (method 93).
+    - 'tar.zst': a tar file compressed with zstd. Each entry is its own zstd frame, so
+      entries are compressed in parallel; zstd decompresses the frames as one stream.
+
+    zstd needs the optional 'zstandard' package.
+    """
+
+    def __init__(self, archive_path: Path, root: Path, archive_format: str = DEFAULT_ARCHIVE_FORMAT,
+                 level: int = None, max_workers: int = None):
+        """
+        Parameters:
+        - archive_path (Path): The archive file to write.
+        - root (Path): Entry names are the paths of the added files relative to this directory.
+        - archive_format (str): One of ARCHIVE_FORMATS.
+        - level (int): Compression level. Defaults to DEFAULT_ARCHIVE_LEVELS.
+        - max_workers (int): Number of entries compressed in parallel. Defaults to the CPU count.
+        """
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format '{archive_format}'. Use: {', '.join(ARCHIVE_FORMATS)}")
+        self.archive_path = Path(archive_path)
+        self.root = Path(root)
+        self.archive_format = archive_format
+        self.level = DEFAULT_ARCHIVE_LEVELS[archive_format] if level is None else level
+        self.max_workers = max_workers or os.cpu_count() or 1
+        if archive_format != "deflate":
+            # Fail before any output is produced if zstandard is missing
+            _zstd_compressor(self.level)
+
+        self._file = open(self.archive_path, 'wb')
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._pending = deque()
+        self._entries = []
+        self._names = set()
+        self._lock = threading.Lock()
+
+    def _name(self, file_path: Path) -> str:
+        name = Path(os.path.relpath(file_path, self.root)).as_posix()
+        if name in self._names:
+            raise ValueError(f"Duplicate archive entry '{name}'")
+        self._names.add(name)
+        return name
+
+    def add_bytes(self, file_path: Path, data: bytes):
+        """
+        Adds `data` as the contents of `file_path`, which is not written to disk.
+        """
+        with self._lock:
+            name = self._name(file_path)
+            self._submit(name, lambda: [data], len(data), time.time())
+
+    def add_file(self, file_path: Path, remove: bool = False):
+        """
+        Adds the file at `file_path`, read in chunks, and optionally removes it once archived.
+        """
+        file_path = Path(file_path)
+
+        def chunks():
+            with open(file_path, 'rb') as file:
+                while chunk := file.read(ARCHIVE_CHUNK_SIZE):
+                    yield chunk
+            if remove:
+                file_path.unlink()
+
+        with self._lock:
+            name = self._name(file_path)
+            stat = file_path.stat()
+            self._submit(name, chunks, stat.st_size, stat.st_mtime)
+
+    def _submit(self, name: str, chunks, size: int, mtime: float):
+        self._pending.append(self._executor.submit(self._compress, name, chunks, size, mtime))
+        # Bound the compressed entries waiting to be written
+        while self._pending and (self._pending[0].done() or len(self._pending) > self.max_workers):
+            self._append(self._pending.popleft().result())
+
+    def _compress(self, name: str, chunks, size: int, mtime: float) -> _Entry:
+        started = time.perf_counter()
+        if self.archive_format == "deflate":
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        else:
+            compressor = _zstd_compressor(self.level).compressobj()
+
+        parts = []
+        if self.archive_format == "tar.zst":
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mtime = int(mtime)
+            info.mode = 0o644
+            parts.append(compressor.compress(info.tobuf(format=tarfile.PAX_FORMAT)))
+
+        read = 0
+        crc = 0
+        for chunk in chunks():
+            read += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+            parts.append(compressor.compress(chunk))
+        if read != size:
+            raise OSError(f"{name} changed size while being archived")
+
+        if self.archive_format == "tar.zst":
+            parts.append(compressor.compress(tarfile.NUL * (-size % tarfile.BLOCKSIZE)))
+        parts.append(compressor.flush())
+        entry = _Entry(name, b''.join(parts), size, crc, mtime)
+        record('compress', time.perf_counter() - started, bytes=size, compressed_bytes=entry.compressed_size)
+        return entry
+
+    def _append(self, entry: _Entry):
+        entry.offset = self._file.tell()
+        if self.archive_format != "tar.zst":
+            self._file.write(self._local_header(entry))
+        self._file.write(entry.data)
+        entry.data = None
+        self._entries.append(entry)
+
+    def _zip_fields(self, entry: _Entry) -> tuple:
+        method = ZIP_METHODS[self.archive_format]
+        version = 63 if method == 93 else 20
+        zip64 = entry.size >= ZIP64_LIMIT or entry.compressed_size >= ZIP64_LIMIT
+        return method, (max(version, 45) if zip64 else version), zip64
+
+    def _local_header(self, entry: _Entry) -> bytes:
+        method, version, zip64 = self._zip_fields(entry)
+        name = entry.name.encode('utf-8')
+        extra = b''
+        sizes = (entry.compressed_size, entry.size)
+        if zip64:
+            extra = struct.pack('<HHQQ', 1, 16, entry.size, entry.compressed_size)
+            sizes = (ZIP64_MARKER, ZIP64_MARKER)
+        dos_time, dos_date = _dos_time(entry.mtime)
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, version, 0x800, method, dos_time, dos_date,
+            entry.crc, sizes[0], sizes[1], len(name), len(extra)
+        ) + name + extra
+
+    def _central_directory(self) -> bytes:
+        records = []
+        for entry in self._entries:
+            method, version, _ = self._zip_fields(entry)
+            name = entry.name.encode('utf-8')
+            values = [entry.size, entry.compressed_size, entry.offset]
+            large = [value for value in values if value >= ZIP64_LIMIT]
+            extra = b''
+            if large:
+                version = max(version, 45)
+                extra = struct.pack('<HH', 1, 8 * len(large)) + struct.pack(f'<{len(large)}Q', *large)
+                values = [ZIP64_MARKER if value >= ZIP64_LIMIT else value for value in values]
+            dos_time, dos_date = _dos_time(entry.mtime)
+            records.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | version, version, 0x800, method,
+                dos_time, dos_date, entry.crc, values[1], values[0], len(name), len(extra), 0, 0, 0,
+                0o100644 << 16, values[2]
+            ) + name + extra)
+        return b''.join(records)
+
+    def _end_records(self, directory_offset: int, directory_size: int) -> bytes:
+        count = len(self._entries)
+        records = b''
+        if count >= ZIP64_COUNT_LIMIT or directory_offset >= ZIP64_LIMIT or directory_size >= ZIP64_LIMIT:
+            zip64_offset = directory_offset + directory_size
+            records += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, directory_size, directory_offset)
+            records += struct.pack('<IIQI', 0x07064b50, 0, zip64_offset, 1)
+            count = ZIP64_COUNT_MARKER if count >= ZIP64_COUNT_LIMIT else count
+            directory_size = ZIP64_MARKER if directory_size >= ZIP64_LIMIT else directory_size
+            directory_offset = ZIP64_MARKER if directory_offset >= ZIP64_LIMIT else directory_offset
+        return records + struct.pack(
+            '<IHHHHIIH', 0x06054b50, 0, 0, count, count, directory_size, directory_offset, 0
+        )
+
+    def close(self) -> Path:
+        """
+        Writes the remaining entries and finishes the archive.
+
+        Returns:
+        - Path: The archive file.
+        """
+        with self._lock:
+            try:
+                while self._pending:
+                    self._append(self._pending.popleft().result())
+                if self.archive_format == "tar.zst":
+                    # End of archive marker, as its own frame
+                    self._file.write(_zstd_compressor(self.level).compress(tarfile.NUL * (2 * tarfile.BLOCKSIZE)))
+                else:
+                    directory_offset = self._file.tell()
+                    directory = self._central_directory()
+                    self._file.write(directory)
+                    self._file.write(self._end_records(directory_offset, len(directory)))
+            finally:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._file.close()
+        print(f"Archived {len(self._entries)} file(s) into {self.archive_path}")
+        return self.archive_path
+
+
+def archive_path_for(output_dir: Path, prefix: str, archive_format: str = DEFAULT_ARCHIVE_FORMAT) -> Path:
+    """
+    Returns the path of the archive of an export: '<prefix>_metrics_and_assets' plus the
+    extension of the archive format, next to `output_dir`.
+    """
+    return Path(output_dir).parent / f"{prefix}_metrics_and_assets{ARCHIVE_FORMATS[archive_format]}"
@@ -0,0 +1,196 @@
+import asyncio
+import importlib.util
+import threading
+import time
+
+import httplib2
+from google.auth.transport.requests import Request
+from googleapiclient.errors import HttpError
+from utils.clients import get_credentials
+from utils.run_report import record
+from utils.scheduler import execute_async
+
+# REST endpoints of the APIs called through the async transport, as (base URL, version)
+API_ENDPOINTS = {
+    "monitoring": ("https://monitoring.googleapis.com", "v3"),
+    "cloudasset": ("https://cloudasset.googleapis.com", "v1")
+}
+
+# Connections kept open per API host. With HTTP/2 many requests share each connection.
+DEFAULT_MAX_CONNECTIONS = 100
+
+# Seconds before a request without response is abandoned (and retried by the scheduler)
+DEFAULT_REQUEST_TIMEOUT = 120.0
+
+# Optional base URL replacing API_ENDPOINTS, see set_endpoint_override
+_endpoint_override = None
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def _import_httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise ValueError("the async HTTP transport requires the 'httpx' package (pip install 'httpx[http2]')")
+    return httpx
+
+
+def check_async_transport():
+    """
+    Raises ValueError if the dependencies of the async transport are not installed.
+    """
+    _import_httpx()
+
+
+def set_endpoint_override(base_url: str):
+    """
+    Sends the requests of the async transport to `base_url` instead of the Google APIs,
+    without credentials, e.g. to a local stand-in (see benchmarks/fake_api.py).
+
+    Must be called before the transport is first used. None restores the Google APIs.
+    """
+    global _endpoint_override
+    _endpoint_override = base_url
+
+
+class AsyncTransport:
+    """
+    Runs the API calls of the async fetch functions on one event loop, on a background thread.
+
+    All calls share one httpx client: connections are kept alive and pooled per host, use
+    HTTP/2 when the 'h2' package is installed, and responses are gzip encoded. One page
+    request in flight costs a coroutine instead of a blocked thread, so every pagination
+    chain can wait on the loop at once. The requests actually in flight are bounded by
+    the rate limit and the async concurrency limit of each API in the request scheduler
+    (adaptive, up to DEFAULT_MAX_ASYNC_CONCURRENCY), and by `max_connections` unless
+    HTTP/2 multiplexes them.
+
+    Coroutine functions are submitted from any thread with `submit`, which returns a
+    concurrent.futures.Future like ThreadPoolExecutor.submit.
+    """
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS, timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        self._httpx = _import_httpx()
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.http2 = importlib.util.find_spec('h2') is not None
+        self._client = None
+        self._credentials = None
+        self._auth_lock = asyncio.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-transport', daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args):
+        """
+        Schedules `function(*args)`, a coroutine function, on the event loop.
+
+        Returns:
+        - concurrent.futures.Future: The future of its result.
+        """
+        return asyncio.run_coroutine_threadsafe(function(*args), self._loop)
+
+    async def run_blocking(self, function, *args):
+        """
+        Runs a blocking function (e.g., decoding a page) on a worker thread so the event loop
+        keeps serving other requests.
+        """
+        return await self._loop.run_in_executor(None, function, *args)
+
+    def _get_client(self):
+        # Created on the event loop, which owns its connections
+        if self._client is None:
+            httpx = self._httpx
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                timeout=self.timeout,
+                headers={'Accept-Encoding': 'gzip'}
+            )
+        return self._client
+
+    async def _auth_headers(self) -> dict:
+        headers = {}
+        if _endpoint_override is not None:
+            return headers
+        async with self._auth_lock:
+            if self._credentials is None:
+                self._credentials = await self.run_blocking(get_credentials)
+            if not self._credentials.valid:
+                # The credentials are shared with the threads of the synchronous clients
+                await self.run_blocking(self._credentials.refresh, Request())
+        self._credentials.apply(headers)
+        return headers
+
+    def _url(self, api: str, path: str) -> str:
+        base_url, version = API_ENDPOINTS[api]
+        return f"{(_endpoint_override or base_url).rstrip('/')}/{version}/{path}"
+
+    async def get_json(self, api: str, path: str, params: list) -> dict:
+        """
+        Sends a GET request through the request scheduler and returns the decoded JSON response.
+
+        Parameters:
+        - api (str): 'monitoring' or 'cloudasset'.
+        - path (str): The resource path after the API version (e.g., 'projects/p/timeSeries').
+        - params (list): Query parameters as (name, value) pairs; repeated names are allowed
+          and None values are left out.
+
+        Raises:
+        - HttpError: If the API answers with an error status after the scheduler's retries.
+        - ConnectionError: If the request fails without a response after the scheduler's retries.
+        """
+        url = self._url(api, path)
+        params = [(name, value) for name, value in params if value is not None]
+
+        async def send():
+            headers = await self._auth_headers()
+            started = time.perf_counter()
+            try:
+                response = await self._get_client().get(url, params=params, headers=headers)
+            except self._httpx.TransportError as e:
+                # Retried by the request scheduler like the connection errors of httplib2
+                raise ConnectionError(f"{type(e).__name__}: {e}") from e
+            record(f"http.{api}", time.perf_counter() - started, bytes_received=len(response.content))
+            if response.status_code >= 400:
+                info = {name.lower(): value for name, value in response.headers.items()}
+                info['status'] = str(response.status_code)
+                raise HttpError(httplib2.Response(info), response.content, uri=str(response.url))
+            return response.json()
+
+        return await execute_async(api, send)
+
+    def close(self):
+        """
+        Closes the pooled connections and stops the event loop.
+        """
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def get_async_transport() -> AsyncTransport:
+    """
+    Returns the async transport of the process, started on first use.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = AsyncTransport()
+        return _transport
+
+
+def close_async_transport():
+    """
+    Closes the async transport of the process if it was started.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+            _transport = None
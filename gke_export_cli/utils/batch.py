@@ -0,0 +1,266 @@
+import csv
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import click
+import pandas as pd
+from utils.fetch_gke_metrics import ALIGNMENT_PERIOD, DEFAULT_MAX_WORKERS, fetch_all_metrics
+from utils.async_http import get_async_transport
+from utils.fetch_startup_time import fetch_and_process_assets, fetch_and_process_assets_async
+
+# Fields of a workload entry in a manifest
+WORKLOAD_FIELDS = [
+    "project_id",
+    "location",
+    "cluster_name",
+    "namespace",
+    "controller_name",
+    "controller_type",
+    "container_name"
+]
+
+REQUIRED_WORKLOAD_FIELDS = ["project_id", "location", "cluster_name", "namespace", "controller_name"]
+
+# Maximum number of values in a single one_of() filter condition, to keep request URLs short
+MAX_VALUES_PER_QUERY = 50
+
+# Output columns identifying the workload of each point
+WORKLOAD_COLUMNS = {
+    "project_id": "resource.labels.project_id",
+    "location": "resource.labels.location",
+    "cluster_name": "resource.labels.cluster_name",
+    "namespace": "resource.labels.namespace_name",
+    "controller_name": "metadata.systemLabels.top_level_controller_name",
+    "controller_type": "metadata.systemLabels.top_level_controller_type",
+    "container_name": "resource.labels.container_name"
+}
+
+
+def load_manifest(manifest_path: Path, defaults: dict = None, required_fields: list = REQUIRED_WORKLOAD_FIELDS) -> list:
+    """
+    Loads the workloads listed in a YAML, JSON or CSV manifest.
+
+    YAML and JSON manifests hold a list of workloads, or a mapping with a 'workloads' list.
+    CSV manifests have one workload per row and a header naming the fields. Field names
+    may use dashes or underscores (e.g., 'controller-name').
+
+    Parameters:
+    - manifest_path (Path): Path to the manifest file.
+    - defaults (dict): Values used for fields that a workload does not set.
+    - required_fields (list): Fields every workload must set.
+
+    Returns:
+    - list: One dictionary per workload with all WORKLOAD_FIELDS.
+
+    Raises:
+    - ValueError: If the manifest cannot be read, a workload misses a required field, or
+      two workloads have the same workload_id.
+    """
+    suffix = manifest_path.suffix.lower()
+    with open(manifest_path, "r", newline='') as file:
+        if suffix in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("Reading YAML manifests requires PyYAML (pip install pyyaml)")
+            entries = yaml.safe_load(file)
+        elif suffix == '.json':
+            entries = json.load(file)
+        elif suffix == '.csv':
+            entries = list(csv.DictReader(file))
+        else:
+            raise ValueError(f"Unsupported manifest format '{suffix}'. Use .yaml, .json or .csv")
+
+    if isinstance(entries, dict):
+        entries = entries.get('workloads')
+    if not isinstance(entries, list):
+        raise ValueError("The manifest must contain a list of workloads")
+
+    workloads = []
+    numbers = {}
+    for number, entry in enumerate(entries, start=1):
+        entry = {str(key).strip().replace('-', '_'): value for key, value in (entry or {}).items()}
+        workload = {}
+        for field in WORKLOAD_FIELDS:
+            value = entry.get(field)
+            if value is None or str(value).strip() == '':
+                value = (defaults or {}).get(field)
+            workload[field] = str(value).strip() if value else ''
+        missing = [field for field in required_fields if not workload[field]]
+        if missing:
+            raise ValueError(f"Workload {number} in {manifest_path} is missing: {', '.join(missing)}")
+        # Workloads with the same id would overwrite each other's results and output folder
+        identifier = workload_id(workload)
+        if identifier in numbers:
+            raise ValueError(f"Workload {number} in {manifest_path} duplicates workload {numbers[identifier]} ({identifier})")
+        numbers[identifier] = number
+        workloads.append(workload)
+
+    return workloads
+
+
+def workload_id(workload: dict) -> str:
+    """
+    Returns a file name friendly identifier of a workload, unique across projects,
+    locations and controller types.
+    """
+    parts = [workload['project_id'], workload['location'], workload['cluster_name'], workload['namespace'], workload['controller_name']]
+    for field in ('controller_type', 'container_name'):
+        if workload.get(field):
+            parts.append(workload[field])
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', '_'.join(parts))
+
+
+def plan_queries(workloads: list) -> list:
+    """
+    Coalesces workloads into as few metric queries as possible.
+
+    Workloads of the same cluster share one query per metric, filtered on the union of their
+    namespaces, controllers and containers. Large unions are split in chunks of
+    MAX_VALUES_PER_QUERY controllers. The results are split per workload with `select_workload`.
+
+    Parameters:
+    - workloads (list): Workloads as returned by `load_manifest`.
+
+    Returns:
+    - list: One dictionary per query with the filter values and the 'workloads' it serves.
+    """
+    clusters = {}
+    for workload in workloads:
+        clusters.setdefault((workload['project_id'], workload['location'], workload['cluster_name']), []).append(workload)
+
+    plans = []
+    for (project_id, location, cluster_name), cluster_workloads in clusters.items():
+        controller_names = sorted({workload['controller_name'] for workload in cluster_workloads})
+        for index in range(0, len(controller_names), MAX_VALUES_PER_QUERY):
+            chunk = set(controller_names[index:index + MAX_VALUES_PER_QUERY])
+            chunk_workloads = [workload for workload in cluster_workloads if workload['controller_name'] in chunk]
+
+            # A workload without a container or controller type needs all of them
+            container_names = [workload['container_name'] for workload in chunk_workloads]
+            controller_types = [workload['controller_type'] for workload in chunk_workloads]
+
+            plans.append({
+                'project_id': project_id,
+                'location': location,
+                'cluster_name': cluster_name,
+                'namespace': sorted({workload['namespace'] for workload in chunk_workloads}),
+                'controller_name': sorted(chunk),
+                'controller_type': sorted(set(controller_types)) if all(controller_types) else '',
+                'container_name': sorted(set(container_names)) if all(container_names) else '',
+                'workloads': chunk_workloads
+            })
+
+    return plans
+
+
+def select_workload(df: pd.DataFrame, workload: dict) -> pd.DataFrame:
+    """
+    Returns the rows of a coalesced query result that belong to `workload`.
+    """
+    if df.empty:
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    for field, column in WORKLOAD_COLUMNS.items():
+        if workload.get(field) and column in df.columns:
+            mask &= (df[column] == workload[field]).to_numpy()
+
+    selected = df[mask].reset_index(drop=True)
+    for column in selected.columns:
+        if isinstance(selected[column].dtype, pd.CategoricalDtype):
+            selected[column] = selected[column].cat.remove_unused_categories()
+    return selected
+
+
+def fetch_batch_metrics(workloads, start_time, end_time, metrics_info,
+                        max_workers=DEFAULT_MAX_WORKERS, shard_duration=None, cache=None,
+                        fetch_assets=True, alignment_period=ALIGNMENT_PERIOD, http_transport='sync'):
+    """
+    Fetch all metrics for a list of workloads with coalesced queries.
+
+    Parameters:
+    - workloads (list): Workloads as returned by `load_manifest`.
+    - start_time (str): Start time in RFC3339 format.
+    - end_time (str): End time in RFC3339 format.
+    - metrics_info (dict): The metrics to fetch, as for fetch_all_metrics.
+    - max_workers (int): Number of fetches run in parallel, shared by the query groups.
+    - shard_duration (timedelta): Optional time-window sharding, as for fetch_all_metrics.
+    - cache (WindowCache): Optional window cache, as for fetch_all_metrics.
+    - fetch_assets (bool): Whether to fetch the pod startup data of each workload.
+    - alignment_period (timedelta): The alignment period of the queries.
+    - http_transport (str): 'sync' or 'async', as for fetch_all_metrics.
+
+    Returns:
+    - dict: Per workload id, a dictionary of metric DataFrames like fetch_all_metrics returns.
+    """
+    plans = plan_queries(workloads)
+    click.echo(f"Planned {len(plans)} query group(s) for {len(workloads)} workload(s).")
+
+    # Query groups are fetched concurrently and share the max_workers budget, so a manifest
+    # spanning several clusters takes about one fetch latency instead of one per group
+    concurrent_plans = max(1, min(len(plans), max_workers))
+    plan_workers = max(1, max_workers // concurrent_plans)
+
+    results = {workload_id(workload): {} for workload in workloads}
+    with ThreadPoolExecutor(max_workers=concurrent_plans) as executor:
+        futures = {
+            executor.submit(
+                fetch_all_metrics,
+                project_id=plan['project_id'],
+                location=plan['location'],
+                cluster_name=plan['cluster_name'],
+                namespace=plan['namespace'],
+                container_name=plan['container_name'],
+                controller_name=plan['controller_name'],
+                controller_type=plan['controller_type'],
+                start_time=start_time,
+                end_time=end_time,
+                metrics_info=metrics_info,
+                max_workers=plan_workers,
+                shard_duration=shard_duration,
+                cache=cache,
+                fetch_assets=False,
+                alignment_period=alignment_period,
+                http_transport=http_transport
+            ): plan
+            for plan in plans
+        }
+        # Each group is split into its workloads as soon as it completes
+        for future in as_completed(futures):
+            plan_data = future.result()
+            for workload in futures[future]['workloads']:
+                for key, df in plan_data.items():
+                    selected = select_workload(df, workload)
+                    if not selected.empty:
+                        results[workload_id(workload)][key] = selected
+
+    if not fetch_assets:
+        return results
+
+    # Asset lookups are already scoped to one controller, so they run per workload
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        if http_transport == 'async':
+            submit = lambda *args: get_async_transport().submit(fetch_and_process_assets_async, *args)
+        else:
+            submit = lambda *args: executor.submit(fetch_and_process_assets, *args)
+        futures = {
+            workload_id(workload): submit(
+                workload['project_id'],
+                workload['location'],
+                workload['cluster_name'],
+                workload['controller_name'],
+                workload['namespace']
+            )
+            for workload in workloads
+        }
+        for key, future in futures.items():
+            try:
+                results[key]['pod_startup'] = future.result()
+            except Exception as e:
+                click.echo(f"Error fetching asset inventory for {key}: {e}")
+                results[key]['pod_startup'] = pd.DataFrame()
+
+    return results
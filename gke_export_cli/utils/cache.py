@@ -0,0 +1,292 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+from utils.config import CACHE_DIR
+from utils.options import DEFAULT_CACHE_MAX_BYTES
+from utils.time_windows import format_rfc3339, parse_rfc3339
+
+# Points newer than this are not cached, since Cloud Monitoring may still be ingesting them
+CACHE_SETTLE_PERIOD = timedelta(minutes=10)
+
+INDEX_FILE = "index.json"
+
+
+class SegmentWriter:
+    """
+    Writes the data of one fetched time window into a new cache segment page by page, so a
+    streamed export caches what it fetches without holding the window in memory.
+
+    Each page is appended to the segment file as a Parquet row group. The segment is only
+    recorded in the cache index by `close`; `abort` discards it, so a window that failed
+    half way is never recorded as fetched.
+    """
+
+    def __init__(self, cache, key: str, start_time: str, end_time: str):
+        self.cache = cache
+        self.key = key
+        self.start_time = start_time
+        self.end_time = end_time
+        # Only points older than the settle period are cached
+        self.settled_end = min(parse_rfc3339(end_time), datetime.now(timezone.utc) - CACHE_SETTLE_PERIOD)
+        self.cacheable = self.settled_end > parse_rfc3339(start_time)
+        self.file_path = None
+        self._schema = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def write(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Appends the settled points of `df` to the segment.
+
+        Returns:
+        - pd.DataFrame: The points that were too recent to be cached.
+        """
+        if not self.cacheable or df.empty:
+            return df
+
+        end_times = pd.to_datetime(df['interval.endTime'], utc=True)
+        unsettled = df[end_times > self.settled_end]
+        df = df[end_times <= self.settled_end]
+        if df.empty:
+            return unsettled
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Category sets differ between pages, so categorical columns are written as plain strings
+        df = df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+        with self._lock:
+            if self._writer is None:
+                key_dir = self.cache.cache_dir / self.key
+                key_dir.mkdir(parents=True, exist_ok=True)
+                self.file_path = key_dir / f"{uuid.uuid4().hex}.parquet"
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                # Columns that are entirely empty in the first page are stored as strings
+                self._schema = pa.schema([
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                    for field in table.schema
+                ])
+                self._writer = pq.ParquetWriter(self.file_path, self._schema)
+            df = df.reindex(columns=self._schema.names)
+            self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+        return unsettled
+
+    def close(self):
+        """
+        Finishes the segment file and records the segment in the cache index.
+        """
+        if not self.cacheable:
+            return
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        self.cache._add_segment(self.key, {
+            'start': self.start_time,
+            'end': self.end_time if self.settled_end == parse_rfc3339(self.end_time) else format_rfc3339(self.settled_end),
+            'file': self.file_path.name if self.file_path else None,
+            'bytes': self.file_path.stat().st_size if self.file_path else 0,
+            'last_used': time.time()
+        })
+
+    def abort(self):
+        """
+        Discards the segment without recording it.
+        """
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self.file_path is not None:
+                self.file_path.unlink(missing_ok=True)
+
+
+def _read_row_groups(file_path: Path):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    for row_group in range(parquet_file.num_row_groups):
+        yield parquet_file.read_row_group(row_group).to_pandas()
+
+
+class WindowCache:
+    """
+    Local cache of fetched metric data, keyed by query and organised in time segments.
+
+    Each query (see `make_key`) has a directory holding one Parquet file per fetched time
+    window and an index recording the covered range of every segment. Segments are evicted
+    least recently used first once the cache grows beyond `max_bytes`. With
+    `auto_evict` False, eviction only happens when `evict` is called, which lets several
+    processes share the cache directory.
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES, auto_evict: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.auto_evict = auto_evict
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(project_id, filter_, aligner, reducer, alignment_period, group_by_fields) -> str:
+        """
+        Returns the cache key of a timeSeries.list query.
+        """
+        fields = {
+            'project_id': project_id,
+            'filter': filter_,
+            'aligner': aligner,
+            'reducer': reducer,
+            'alignment_period': int(alignment_period.total_seconds()),
+            'group_by_fields': list(group_by_fields)
+        }
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:32]
+
+    def _load_index(self, key: str) -> dict:
+        try:
+            with open(self.cache_dir / key / INDEX_FILE, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"segments": []}
+
+    def _save_index(self, key: str, index: dict):
+        path = self.cache_dir / key / INDEX_FILE
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(index, file, indent=4)
+        tmp_path.replace(path)
+
+    def missing_ranges(self, key: str, start_time: str, end_time: str) -> list:
+        """
+        Returns the parts of [start_time, end_time] that are not cached for `key`.
+
+        Returns:
+        - list: (start_time, end_time) RFC3339 string pairs, oldest first.
+        """
+        start = parse_rfc3339(start_time)
+        end = parse_rfc3339(end_time)
+        with self._lock:
+            segments = self._load_index(key)["segments"]
+
+        covered = sorted((parse_rfc3339(segment['start']), parse_rfc3339(segment['end'])) for segment in segments)
+
+        missing = []
+        cursor = start
+        for segment_start, segment_end in covered:
+            if segment_end <= cursor:
+                continue
+            if segment_start >= end:
+                break
+            if segment_start > cursor:
+                missing.append((cursor, segment_start))
+            cursor = max(cursor, segment_end)
+        if cursor < end:
+            missing.append((cursor, end))
+
+        return [
+            (start_time if gap_start == start else format_rfc3339(gap_start),
+             end_time if gap_end == end else format_rfc3339(gap_end))
+            for gap_start, gap_end in missing
+        ]
+
+    def open_segment(self, key: str, start_time: str, end_time: str) -> SegmentWriter:
+        """
+        Returns a writer storing the data fetched for [start_time, end_time] page by page
+        as a new segment of `key` (see SegmentWriter).
+        """
+        return SegmentWriter(self, key, start_time, end_time)
+
+    def store(self, key: str, start_time: str, end_time: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Stores the data fetched for [start_time, end_time] as a new segment of `key`.
+
+        Only points older than the settle period are cached.
+
+        Returns:
+        - pd.DataFrame: The points that were too recent to be cached.
+        """
+        segment = self.open_segment(key, start_time, end_time)
+        try:
+            unsettled = segment.write(df)
+        except Exception:
+            segment.abort()
+            raise
+        segment.close()
+        return unsettled
+
+    def _add_segment(self, key: str, segment: dict):
+        with self._lock:
+            (self.cache_dir / key).mkdir(parents=True, exist_ok=True)
+            index = self._load_index(key)
+            index['segments'].append(segment)
+            self._save_index(key, index)
+            if self.auto_evict:
+                self.evict()
+
+    def read(self, key: str, start_time: str, end_time: str):
+        """
+        Yields the cached points of `key` ending within (start_time, end_time], oldest segment
+        first, one Parquet row group at a time. As with the API, points ending exactly at
+        `start_time` are left out.
+
+        A point on the boundary between two segments is only yielded once.
+        """
+        start = pd.Timestamp(parse_rfc3339(start_time))
+        end = pd.Timestamp(parse_rfc3339(end_time))
+
+        with self._lock:
+            index = self._load_index(key)
+            segments = sorted(
+                (segment for segment in index['segments']
+                 if parse_rfc3339(segment['end']) > start and parse_rfc3339(segment['start']) <= end),
+                key=lambda segment: parse_rfc3339(segment['start'])
+            )
+            for segment in segments:
+                segment['last_used'] = time.time()
+            if segments:
+                self._save_index(key, index)
+
+        previous_end = None
+        for segment in segments:
+            if segment['file']:
+                for df in _read_row_groups(self.cache_dir / key / segment['file']):
+                    end_times = pd.to_datetime(df['interval.endTime'], utc=True)
+                    mask = (end_times > start) & (end_times <= end)
+                    if previous_end is not None:
+                        mask &= end_times > previous_end
+                    df = df[mask]
+                    if not df.empty:
+                        yield df.reset_index(drop=True)
+            previous_end = pd.Timestamp(parse_rfc3339(segment['end']))
+
+    def evict(self):
+        """
+        Removes least recently used segments until the cache fits in `max_bytes`.
+        """
+        with self._lock:
+            if not self.cache_dir.exists():
+                return
+            indexes = {path.parent.name: self._load_index(path.parent.name) for path in self.cache_dir.glob(f"*/{INDEX_FILE}")}
+            segments = sorted(
+                ((segment['last_used'], key, segment) for key, index in indexes.items() for segment in index['segments']),
+                key=lambda item: item[0]
+            )
+            total = sum(segment['bytes'] for _, _, segment in segments)
+
+            changed = set()
+            for _, key, segment in segments:
+                if total <= self.max_bytes:
+                    break
+                if segment['file']:
+                    (self.cache_dir / key / segment['file']).unlink(missing_ok=True)
+                total -= segment['bytes']
+                indexes[key]['segments'].remove(segment)
+                changed.add(key)
+
+            for key in changed:
+                self._save_index(key, indexes[key])
@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+# Folder of the checkpoint inside the output folder of a run
+CHECKPOINT_DIR = ".checkpoint"
+
+# Command line and prefix of the run, used by --resume
+RUN_FILE = "run.json"
+
+PROGRESS_FILE = "progress.json"
+
+# Compression level of the saved pages; pages are written once and read at most once
+PAGE_COMPRESSION_LEVEL = 1
+
+
+def _write_atomic(path: Path, data: bytes):
+    # Readers never see a partial file, even if the process is killed while writing
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+
+
+class Checkpoint:
+    """
+    Progress of an export saved in its output folder, so that an interrupted run can be
+    resumed (see --resume) instead of fetched again.
+
+    Each timeSeries.list query, i.e. one metric, time window and alignment period, has a
+    folder holding every page received so far as gzip compressed JSON, and a progress file
+    with the number of pages, the nextPageToken of the next page and whether the query is
+    complete. A resumed run replays the saved pages without API calls and continues each
+    incomplete query from its page token.
+
+    Queries are fetched by one thread or coroutine at a time, so their folders need no locking.
+    """
+
+    def __init__(self, run_dir: Path):
+        self.run_dir = Path(run_dir)
+        self.dir = self.run_dir / CHECKPOINT_DIR
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(project_id, filter_, start_time, end_time, aligner, reducer, alignment_period, group_by_fields) -> str:
+        """
+        Returns the checkpoint key of one timeSeries.list query.
+        """
+        fields = {
+            'project_id': project_id,
+            'filter': filter_,
+            'start_time': start_time,
+            'end_time': end_time,
+            'aligner': aligner,
+            'reducer': reducer,
+            'alignment_period': int(alignment_period.total_seconds()),
+            'group_by_fields': list(group_by_fields)
+        }
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:32]
+
+    def save_run(self, prefix: str, args: list):
+        """
+        Records the prefix and command line arguments of the run.
+        """
+        _write_atomic(self.dir / RUN_FILE, json.dumps({'prefix': prefix, 'args': list(args)}, indent=4).encode())
+
+    def progress(self, key: str) -> dict:
+        """
+        Returns the progress of a query: the number of saved 'pages', the 'next_page_token'
+        and whether the query is 'done'.
+        """
+        try:
+            with open(self.dir / key / PROGRESS_FILE, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {'pages': 0, 'next_page_token': None, 'done': False}
+
+    def _save_progress(self, key: str, progress: dict):
+        _write_atomic(self.dir / key / PROGRESS_FILE, json.dumps(progress).encode())
+
+    def start(self, key: str):
+        """
+        Marks a query as started, without pages, so that it counts as incomplete until done.
+        """
+        (self.dir / key).mkdir(exist_ok=True)
+        self._save_progress(key, {'pages': 0, 'next_page_token': None, 'done': False})
+
+    def saved_pages(self, key: str, count: int):
+        """
+        Yields the first `count` saved pages of a query, oldest first.
+        """
+        for page in range(count):
+            with gzip.open(self.dir / key / f"{page:06d}.json.gz", "rb") as file:
+                yield json.load(file)
+
+    def save_page(self, key: str, page: int, response: dict):
+        """
+        Saves the `page`-th response of a query and records the query's progress. The page
+        is written before the progress, so the progress never refers to a missing page.
+        """
+        next_page_token = response.get('nextPageToken')
+        data = gzip.compress(json.dumps(response, separators=(',', ':')).encode(), compresslevel=PAGE_COMPRESSION_LEVEL)
+        _write_atomic(self.dir / key / f"{page:06d}.json.gz", data)
+        self._save_progress(key, {'pages': page + 1, 'next_page_token': next_page_token, 'done': not next_page_token})
+
+    def clear_outputs(self):
+        """
+        Deletes the output files of the run, which a resumed run writes again, keeping the checkpoint.
+        """
+        for path in self.run_dir.iterdir():
+            if path == self.dir:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+
+    def incomplete(self) -> int:
+        """
+        Returns the number of queries that were started and are not complete.
+        """
+        return sum(
+            1 for path in self.dir.glob(f"*/{PROGRESS_FILE}")
+            if not self.progress(path.parent.name)['done']
+        )
+
+    def remove(self):
+        """
+        Deletes the checkpoint once the run no longer needs to be resumed.
+        """
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def load_run(run_dir: Path) -> dict:
+    """
+    Returns the prefix and command line arguments recorded by the run in `run_dir`.
+
+    Raises:
+    - ValueError: If `run_dir` holds no checkpoint, e.g. because the run completed.
+    """
+    try:
+        with open(Path(run_dir) / CHECKPOINT_DIR / RUN_FILE, "r") as file:
+            run = json.load(file)
+    except (OSError, ValueError):
+        raise ValueError(f"no checkpoint found in {run_dir}; only interrupted or incomplete runs can be resumed")
+    return {'prefix': run['prefix'], 'args': run['args'], 'run_dir': Path(run_dir)}
+
+
+_checkpoint = None
+
+
+def get_checkpoint() -> Checkpoint:
+    """
+    Returns the checkpoint of the export running in this process, or None.
+    """
+    return _checkpoint
+
+
+def start_checkpoint(run_dir: Path) -> Checkpoint:
+    """
+    Saves the progress of the queries fetched from now on into `run_dir` (see Checkpoint).
+    None stops checkpointing.
+    """
+    global _checkpoint
+    _checkpoint = Checkpoint(run_dir) if run_dir is not None else None
+    return _checkpoint
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import google_auth_httplib2
+import httplib2
+from google.auth import default
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import DISCOVERY_URI, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.discovery_cache.base import Cache
+from googleapiclient.errors import HttpError
+from utils.config import CONFIG_DIR
+from utils.run_report import operation, record
+
+# Discovery documents are cached on disk next to the config file
+DISCOVERY_CACHE_DIR = CONFIG_DIR / "discovery_cache"
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+# Services and their HTTP transports are kept per thread since httplib2 is not thread-safe
+_local = threading.local()
+
+# Optional factory replacing the authorized transport, see set_transport_factory
+_transport_factory = None
+
+
+class DiscoveryFileCache(Cache):
+    """
+    Discovery document cache backed by files in `cache_dir`, with an in-memory layer on top.
+    """
+
+    def __init__(self, cache_dir: Path = DISCOVERY_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.json"
+
+    def get(self, url):
+        with self._lock:
+            if url in self._memory:
+                return self._memory[url]
+        try:
+            content = self._path(url).read_text()
+        except OSError:
+            return None
+        with self._lock:
+            self._memory[url] = content
+        return content
+
+    def set(self, url, content):
+        with self._lock:
+            self._memory[url] = content
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see a partial document
+            path = self._path(url)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(content)
+            tmp_path.replace(path)
+        except OSError:
+            pass
+
+
+_discovery_cache = DiscoveryFileCache()
+
+
+def get_credentials():
+    """
+    Returns the application default credentials, refreshed once per process.
+
+    Returns:
+    - google.auth.credentials.Credentials: The shared credentials.
+    """
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            with operation('auth'):
+                credentials, _ = default()
+                credentials.refresh(Request())
+            _credentials = credentials
+    return _credentials
+
+
+def set_credentials(credentials):
+    """
+    Shares the given credentials with all clients of the process, e.g. credentials
+    refreshed once by a parent process.
+
+    Parameters:
+    - credentials (google.auth.credentials.Credentials): The credentials to share.
+    """
+    global _credentials
+    with _credentials_lock:
+        _credentials = credentials
+
+
+class MeteredHttp:
+    """
+    Wraps an HTTP transport to record the time and the bytes received of each request in
+    the run report, as an 'http.<api>' operation (e.g., 'http.monitoring').
+
+    Bytes are counted after gzip decoding, as the JSON the client parses.
+    """
+
+    def __init__(self, http):
+        self.http = http
+
+    def request(self, uri, *args, **kwargs):
+        started = time.perf_counter()
+        response, content = self.http.request(uri, *args, **kwargs)
+        api = (urlparse(uri).hostname or 'unknown').split('.')[0]
+        record(f"http.{api}", time.perf_counter() - started, bytes_received=len(content or b''))
+        return response, content
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+def set_transport_factory(factory):
+    """
+    Replaces the authorized HTTP transport of the API clients, e.g. with a transport talking
+    to a local stand-in for the Google APIs (see benchmarks/fake_api.py).
+
+    Must be called before the first client of a thread is created.
+
+    Parameters:
+    - factory (callable): Called once per thread without arguments; returns an object with
+      the request() method of httplib2.Http. None restores the authorized transport.
+    """
+    global _transport_factory
+    _transport_factory = factory
+
+
+def _get_http():
+    """
+    Returns the keep-alive authorized HTTP transport owned by the calling thread.
+    """
+    http = getattr(_local, 'http', None)
+    if http is None:
+        if _transport_factory is not None:
+            http = _transport_factory()
+        else:
+            http = google_auth_httplib2.AuthorizedHttp(get_credentials(), http=httplib2.Http())
+        http = _local.http = MeteredHttp(http)
+    return http
+
+
+def get_discovery_document(api: str, version: str) -> str:
+    """
+    Returns the discovery document for an API, fetching it at most once per machine.
+
+    Documents are looked up in the on-disk cache first, then in the documents bundled with
+    googleapiclient, and only then fetched from the discovery service.
+
+    Parameters:
+    - api (str): The API name (e.g., 'monitoring').
+    - version (str): The API version (e.g., 'v3').
+
+    Returns:
+    - str: The discovery document as JSON.
+    """
+    url = DISCOVERY_URI.format(api=api, apiVersion=version)
+    content = _discovery_cache.get(url)
+    if content is None:
+        content = get_static_doc(api, version)
+        if content is None:
+            response, body = _get_http().request(url)
+            if response.status >= 400:
+                raise HttpError(response, body, uri=url)
+            content = body.decode('utf-8')
+        _discovery_cache.set(url, content)
+    return content
+
+
+def get_service(api: str, version: str):
+    """
+    Returns a discovery-based API client for the calling thread.
+
+    The client is built once per thread and API. It reuses the shared credentials, a
+    keep-alive HTTP transport owned by the thread and the cached discovery document.
+
+    Parameters:
+    - api (str): The API name (e.g., 'monitoring').
+    - version (str): The API version (e.g., 'v3').
+
+    Returns:
+    - googleapiclient.discovery.Resource: The API client.
+    """
+    services = getattr(_local, 'services', None)
+    if services is None:
+        services = _local.services = {}
+
+    if (api, version) not in services:
+        with operation('discovery'):
+            services[(api, version)] = build_from_document(get_discovery_document(api, version), http=_get_http())
+    return services[(api, version)]
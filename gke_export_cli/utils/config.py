@@ -6,6 +6,9 @@ from typing import Any
 CONFIG_DIR = Path.home()    / ".config" / "gke_metrics_fetcher"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
+# Define the cache directory for previously fetched metric data
+CACHE_DIR = Path.home() / ".cache" / "gke_metrics_fetcher"
+
 # Use the current working directory (cwd) as the default storage directory
 DEFAULT_STORAGE_DIR = Path.cwd()
 
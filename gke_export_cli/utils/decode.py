@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Series label fields decoded into categorical columns, as (output column, path in the TimeSeries object)
+LABEL_FIELDS = [
+    ('metric.type', ('metric', 'type')),
+    ('resource.type', ('resource', 'type')),
+    ('resource.labels.project_id', ('resource', 'labels', 'project_id')),
+    ('resource.labels.location', ('resource', 'labels', 'location')),
+    ('resource.labels.cluster_name', ('resource', 'labels', 'cluster_name')),
+    ('resource.labels.namespace_name', ('resource', 'labels', 'namespace_name')),
+    ('resource.labels.container_name', ('resource', 'labels', 'container_name')),
+    ('resource.labels.pod_name', ('resource', 'labels', 'pod_name')),
+    ('metadata.systemLabels.top_level_controller_name', ('metadata', 'systemLabels', 'top_level_controller_name')),
+    ('metadata.systemLabels.top_level_controller_type', ('metadata', 'systemLabels', 'top_level_controller_type'))
+]
+
+LABEL_COLUMNS = [column for column, _ in LABEL_FIELDS]
+
+
+def _get_path(obj, path):
+    for key in path:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def _parse_timestamps(values):
+    return pd.to_datetime(pd.Series(values, dtype=object), utc=True, format='ISO8601').astype('datetime64[ns, UTC]').array
+
+
+def decode_time_series(time_series) -> pd.DataFrame:
+    """
+    Decodes Monitoring API TimeSeries objects into a typed DataFrame with one row per point.
+
+    The columns match the names produced by `pd.json_normalize` on the same input, but with
+    typed values: interval timestamps are datetime64[ns, UTC], `value.doubleValue` is float64,
+    `value.int64Value` is int64 and the series labels are categorical. Value columns are only
+    present if at least one point carries that value type; if a column is only partially
+    filled it uses the nullable Float64/Int64 dtype. Other value types are ignored.
+
+    Parameters:
+    - time_series (list): TimeSeries objects as returned by timeSeries.list.
+
+    Returns:
+    - pd.DataFrame: One row per point.
+    """
+    counts = []
+    start_times = []
+    end_times = []
+    doubles = []
+    ints = []
+    has_double = False
+    has_int = False
+
+    for series in time_series:
+        points = series.get('points') or []
+        counts.append(len(points))
+        for point in points:
+            interval = point.get('interval', {})
+            end_time = interval.get('endTime')
+            end_times.append(end_time)
+            start_times.append(interval.get('startTime', end_time))
+
+            value = point.get('value', {})
+            double_value = value.get('doubleValue')
+            int_value = value.get('int64Value')
+            if double_value is not None:
+                has_double = True
+            if int_value is not None:
+                has_int = True
+                int_value = int(int_value)
+            doubles.append(double_value)
+            ints.append(int_value)
+
+    rows = len(end_times)
+    if not rows:
+        return pd.DataFrame()
+
+    columns = {
+        'interval.startTime': _parse_timestamps(start_times),
+        'interval.endTime': _parse_timestamps(end_times)
+    }
+    if has_double:
+        filled = all(value is not None for value in doubles)
+        columns['value.doubleValue'] = np.array(doubles, dtype=np.float64) if filled else pd.array(doubles, dtype='Float64')
+    if has_int:
+        filled = all(value is not None for value in ints)
+        columns['value.int64Value'] = np.array(ints, dtype=np.int64) if filled else pd.array(ints, dtype='Int64')
+
+    # Labels are decoded once per series and expanded to the points through category codes
+    counts = np.array(counts, dtype=np.int64)
+    for column, path in LABEL_FIELDS:
+        series_values = [_get_path(series, path) for series in time_series]
+        codes, categories = pd.factorize(pd.Series(series_values, dtype=object), use_na_sentinel=True)
+        columns[column] = pd.Categorical.from_codes(np.repeat(codes, counts), categories=categories)
+
+    return pd.DataFrame(columns)
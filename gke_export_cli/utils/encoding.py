@@ -0,0 +1,202 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from utils.decode import LABEL_COLUMNS
+
+# Encoding name for metrics stored as change-point intervals (see the 'encoding' key of METRICS_INFO entries)
+CHANGE_POINTS = "change_points"
+
+# Metrics encoded as change points by --change-points, since their values rarely change
+CHANGE_POINT_METRICS = ["cpu_request", "memory_request"]
+
+# Value columns that can be encoded, as produced by decode_time_series
+VALUE_COLUMNS = ["value.doubleValue", "value.int64Value"]
+
+
+def _series_codes(df: pd.DataFrame) -> np.ndarray:
+    labels = df.reindex(columns=LABEL_COLUMNS)
+    return labels.groupby(LABEL_COLUMNS, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+
+
+def _changed(values) -> np.ndarray:
+    """
+    Returns whether each value differs from the previous one, treating missing values as equal.
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    missing = values.isna().to_numpy()
+    previous = values.shift(1)
+    differs = (values != previous).to_numpy(dtype=bool, na_value=True)
+    return differs & ~(missing & previous.isna().to_numpy())
+
+
+def encode_change_points(df: pd.DataFrame, alignment_period: timedelta) -> pd.DataFrame:
+    """
+    Encodes metric points as intervals of constant value.
+
+    An interval covers consecutive points of one series, `alignment_period` apart, with the
+    same value and the same interval length. It is stored as the end time of its first
+    (`valid_from`) and last (`valid_to`) point, the number of points and the length of
+    each point's interval in seconds. A missing point starts a new interval, so
+    `expand_change_points` restores the input exactly.
+
+    Parameters:
+    - df (pd.DataFrame): Points as returned by decode_time_series.
+    - alignment_period (timedelta): The alignment period of the query.
+
+    Returns:
+    - pd.DataFrame: The label, interval and value columns of each interval, one row per interval.
+    """
+    if df.empty:
+        return df
+
+    codes = _series_codes(df)
+    end_times = df['interval.endTime'].to_numpy(dtype='datetime64[ns]')
+    order = np.lexsort((end_times, codes))
+    points = df.iloc[order].reset_index(drop=True)
+    codes = codes[order]
+    end_times = end_times[order]
+    point_seconds = (points['interval.endTime'] - points['interval.startTime']).dt.total_seconds().to_numpy()
+    value_columns = [column for column in VALUE_COLUMNS if column in points.columns]
+
+    starts = np.ones(len(points), dtype=bool)
+    starts[1:] = (
+        (codes[1:] != codes[:-1])
+        | (end_times[1:] - end_times[:-1] != np.timedelta64(int(alignment_period.total_seconds()), 's'))
+        | (point_seconds[1:] != point_seconds[:-1])
+    )
+    for column in value_columns:
+        starts |= _changed(points[column])
+
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(points)) - 1
+
+    intervals = pd.DataFrame({
+        'valid_from': points['interval.endTime'].iloc[first].reset_index(drop=True),
+        'valid_to': points['interval.endTime'].iloc[last].reset_index(drop=True),
+        'point_count': (last - first + 1).astype(np.int64),
+        'point_seconds': point_seconds[first]
+    })
+    for column in value_columns + [column for column in LABEL_COLUMNS if column in points.columns]:
+        intervals[column] = points[column].iloc[first].reset_index(drop=True)
+    return intervals
+
+
+def merge_change_points(intervals: pd.DataFrame, alignment_period: timedelta) -> pd.DataFrame:
+    """
+    Joins intervals encoded from separate pages or time windows of the same query.
+
+    Neighbouring intervals of a series are joined when they hold the same value and the
+    second one starts one alignment period after the first one ends.
+    """
+    if intervals.empty:
+        return intervals
+
+    codes = _series_codes(intervals)
+    valid_from = intervals['valid_from'].to_numpy(dtype='datetime64[ns]')
+    order = np.lexsort((valid_from, codes))
+    intervals = intervals.iloc[order].reset_index(drop=True)
+    codes = codes[order]
+    valid_from = valid_from[order]
+    valid_to = intervals['valid_to'].to_numpy(dtype='datetime64[ns]')
+    point_seconds = intervals['point_seconds'].to_numpy()
+
+    starts = np.ones(len(intervals), dtype=bool)
+    starts[1:] = (
+        (codes[1:] != codes[:-1])
+        | (valid_from[1:] - valid_to[:-1] != np.timedelta64(int(alignment_period.total_seconds()), 's'))
+        | (point_seconds[1:] != point_seconds[:-1])
+    )
+    for column in VALUE_COLUMNS:
+        if column in intervals.columns:
+            starts |= _changed(intervals[column])
+
+    groups = np.cumsum(starts) - 1
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(intervals)) - 1
+
+    merged = intervals.iloc[first].reset_index(drop=True)
+    merged['valid_to'] = intervals['valid_to'].iloc[last].reset_index(drop=True)
+    merged['point_count'] = np.bincount(groups, weights=intervals['point_count'].to_numpy()).astype(np.int64)
+    return merged
+
+
+def expand_change_points(intervals: pd.DataFrame) -> pd.DataFrame:
+    """
+    Restores the points encoded by `encode_change_points`.
+
+    Returns:
+    - pd.DataFrame: One row per point with the columns of decode_time_series, each series
+      newest point first.
+    """
+    if intervals.empty:
+        return pd.DataFrame()
+
+    counts = intervals['point_count'].to_numpy(dtype=np.int64)
+    valid_from = intervals['valid_from'].to_numpy(dtype='datetime64[ns]')
+    valid_to = intervals['valid_to'].to_numpy(dtype='datetime64[ns]')
+    steps = np.where(counts > 1, (valid_to - valid_from) // np.maximum(counts - 1, 1), np.timedelta64(0, 'ns'))
+
+    rows = np.repeat(np.arange(len(intervals)), counts)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    end_times = valid_from[rows] + offsets * steps[rows]
+    start_times = end_times - (intervals['point_seconds'].to_numpy()[rows] * 1e9).astype('timedelta64[ns]')
+
+    columns = {
+        'interval.startTime': pd.DatetimeIndex(start_times).tz_localize('UTC'),
+        'interval.endTime': pd.DatetimeIndex(end_times).tz_localize('UTC')
+    }
+    for column in VALUE_COLUMNS + LABEL_COLUMNS:
+        if column in intervals.columns:
+            columns[column] = intervals[column].take(rows).to_numpy()
+    points = pd.DataFrame(columns)
+
+    label_columns = [column for column in LABEL_COLUMNS if column in points.columns]
+    points = points.sort_values(
+        label_columns + ['interval.endTime'],
+        ascending=[True] * len(label_columns) + [False],
+        na_position='last',
+        kind='stable'
+    )
+    return points.astype({column: 'category' for column in label_columns}).reset_index(drop=True)
+
+
+class ChangePointWriter:
+    """
+    Wraps a StreamingWriter so a streamed metric is written as change-point intervals.
+
+    Each page is encoded as it arrives, so only the intervals are kept in memory; they are
+    merged and written when the writer is closed.
+    """
+
+    def __init__(self, writer, alignment_period: timedelta):
+        self.writer = writer
+        self.alignment_period = alignment_period
+        self._intervals = []
+        self._lock = threading.Lock()
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        intervals = encode_change_points(df, self.alignment_period)
+        with self._lock:
+            self._intervals.append(intervals)
+
+    def close(self):
+        with self._lock:
+            frames = self._intervals
+            self._intervals = []
+        if frames:
+            # Category sets differ between pages, so labels are joined as plain strings
+            intervals = pd.concat([frame.astype({column: object for column in LABEL_COLUMNS if column in frame.columns}) for frame in frames], ignore_index=True)
+            self.writer.write(merge_change_points(intervals, self.alignment_period))
+        return self.writer.close()
+
+
+def with_change_points(metrics_info: dict, keys: list = CHANGE_POINT_METRICS) -> dict:
+    """
+    Returns a copy of `metrics_info` with the metrics in `keys` exported as change-point
+    intervals (see encode_change_points) instead of plain points.
+    """
+    return {key: {**info, 'encoding': CHANGE_POINTS} if key in keys else dict(info) for key, info in metrics_info.items()}
@@ -1,8 +1,16 @@
 import logging
-from google.auth import default
-from google.auth.transport.requests import Request
-from utils.fetch_startup_time import fetch_and_process_assets
-from googleapiclient.discovery import build
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+from utils.async_http import get_async_transport
+from utils.checkpoint import Checkpoint, get_checkpoint
+from utils.clients import get_service
+from utils.decode import LABEL_COLUMNS, decode_time_series
+from utils.encoding import CHANGE_POINTS, ChangePointWriter, encode_change_points
+from utils.fetch_startup_time import fetch_and_process_assets, fetch_and_process_assets_async
+from utils.options import ALIGNMENT_PERIOD, DEFAULT_MAX_WORKERS
+from utils.run_report import operation
+from utils.scheduler import execute
+from utils.time_windows import parse_rfc3339, split_time_range
 import pandas as pd
 import click
 # Exclude namespaces that should not be included in the metrics gathering
@@ -11,6 +19,35 @@ EXCLUDED_NAMESPACES = [
     "gmp-system", "gke-gmp-system", "gke-managed-filestorecsi", "gke-mcs"
 ]
 
+
+# Metric Info Configuration for Fetching Multiple Metrics
+METRICS_INFO = {
+    "cpu_usage": {
+        "metric_type": "kubernetes.io/container/cpu/core_usage_time",
+        "kind": "CUMULATIVE",
+        "aligner": "ALIGN_RATE",
+        "reducer": "REDUCE_MEAN",
+    },
+    "memory_usage": {
+        "metric_type": "kubernetes.io/container/memory/used_bytes",
+        "kind": "GAUGE",
+        "aligner": "ALIGN_MAX",
+        "reducer": "REDUCE_MAX",
+    },
+    "cpu_request": {
+        "metric_type": "kubernetes.io/container/cpu/request_cores",
+        "kind": "GAUGE",
+        "aligner": "ALIGN_MEAN",
+        "reducer": "REDUCE_MEAN",
+    },
+    "memory_request": {
+        "metric_type": "kubernetes.io/container/memory/request_bytes",
+        "kind": "GAUGE",
+        "aligner": "ALIGN_MEAN",
+        "reducer": "REDUCE_MEAN",
+    }
+}
+
 # Fields to be used in the groupBy in the API query
 GROUP_BY_FIELDS = [
     "resource.labels.project_id", 
@@ -24,6 +61,25 @@ GROUP_BY_FIELDS = [
     
 ]
 
+# Group-by fields aggregating the pods of each container, for statistics across pods
+CONTAINER_GROUP_BY_FIELDS = [field for field in GROUP_BY_FIELDS if field != "resource.labels.pod_name"]
+
+# Columns identifying a single point in the flattened output
+POINT_KEY_COLUMNS = LABEL_COLUMNS + ['interval.startTime', 'interval.endTime']
+
+def _match_condition(field, value):
+    """
+    Returns a filter condition matching `field` against a value or a list of values.
+    """
+    if isinstance(value, (list, tuple, set)):
+        values = sorted(set(value))
+        if len(values) > 1:
+            quoted = ', '.join(f'"{item}"' for item in values)
+            return f'{field} = one_of({quoted})'
+        value = values[0]
+    return f'{field} = "{value}"'
+
+
 def build_filter_string(
     metric: str,
     project_id: str = '',
@@ -37,15 +93,17 @@ def build_filter_string(
     """
     Constructs a filter string for querying based on provided parameters.
 
+    Label parameters also accept a list of values, matched with `one_of`.
+
     Parameters:
     - metric (str): The metric type to be used in the filter.
     - project_id (str): The project ID for the filter.
-    - location (str): The location for the filter.
-    - cluster_name (str): The cluster name for the filter.
-    - namespace (str): The namespace for the filter.
-    - container_name (str): The container name for the filter.
-    - controller_name (str): The controller name for the filter.
-    - controller_type (str): The controller type for the filter.
+    - location (str or list): The location for the filter.
+    - cluster_name (str or list): The cluster name for the filter.
+    - namespace (str or list): The namespace for the filter.
+    - container_name (str or list): The container name for the filter.
+    - controller_name (str or list): The controller name for the filter.
+    - controller_type (str or list): The controller type for the filter.
 
     Returns:
     - str: A constructed filter string.
@@ -59,23 +117,23 @@ def build_filter_string(
         filter_conditions.append('metric.label.memory_type = "non-evictable"')
 
     if project_id:
-        filter_conditions.append(f'resource.labels.project_id = "{project_id}"')
+        filter_conditions.append(_match_condition('resource.labels.project_id', project_id))
     
     if location:
-        filter_conditions.append(f'resource.labels.location = "{location}"')
+        filter_conditions.append(_match_condition('resource.labels.location', location))
     
     if cluster_name:
-        filter_conditions.append(f'resource.labels.cluster_name = "{cluster_name}"')
+        filter_conditions.append(_match_condition('resource.labels.cluster_name', cluster_name))
 
     if namespace:
-        filter_conditions.append(f'resource.labels.namespace_name = "{namespace}"')
+        filter_conditions.append(_match_condition('resource.labels.namespace_name', namespace))
     
     if container_name:
-        filter_conditions.append(f'resource.labels.container_name = "{container_name}"')
+        filter_conditions.append(_match_condition('resource.labels.container_name', container_name))
     if controller_name:
-        filter_conditions.append(f'metadata.system_labels.top_level_controller_name = "{controller_name}"')
+        filter_conditions.append(_match_condition('metadata.system_labels.top_level_controller_name', controller_name))
     if controller_type:
-        filter_conditions.append(f'metadata.system_labels.top_level_controller_type = "{controller_type}"')
+        filter_conditions.append(_match_condition('metadata.system_labels.top_level_controller_type', controller_type))
 
     # Exclude unwanted namespaces
     excluded_filter = ' AND '.join(
@@ -85,22 +143,195 @@ def build_filter_string(
     
     return ' AND '.join(filter_conditions)
 
+def drop_points_ending_at(df, end_time):
+    """
+    Drops the points whose interval ends exactly at `end_time` (RFC3339).
+    """
+    if df.empty or 'interval.endTime' not in df.columns:
+        return df
+    end_times = pd.to_datetime(df['interval.endTime'], utc=True)
+    return df[end_times != pd.Timestamp(end_time)]
+
+
+def _build_list_request(
+    service, project_id, filter_, start_time, end_time, 
+    per_series_aligner, cross_series_reducer, page_token=None, alignment_period=ALIGNMENT_PERIOD,
+    group_by_fields=GROUP_BY_FIELDS):
+    """
+    Builds a timeSeries.list request for one page of results.
+    """
+    return service.projects().timeSeries().list(
+        name=f"projects/{project_id}",
+        aggregation_alignmentPeriod=f"{int(alignment_period.total_seconds())}s",
+        aggregation_crossSeriesReducer=cross_series_reducer,
+        aggregation_groupByFields=group_by_fields,
+        aggregation_perSeriesAligner=per_series_aligner,
+        filter=filter_,
+        interval_endTime=end_time,
+        interval_startTime=start_time,
+        pageToken=page_token
+    )
+
+
+def _list_params(filter_, start_time, end_time, per_series_aligner, cross_series_reducer, alignment_period, group_by_fields):
+    """
+    Returns the query parameters of a timeSeries.list REST request, as for _build_list_request.
+    """
+    return [
+        ('aggregation.alignmentPeriod', f"{int(alignment_period.total_seconds())}s"),
+        ('aggregation.crossSeriesReducer', cross_series_reducer),
+        *[('aggregation.groupByFields', field) for field in group_by_fields],
+        ('aggregation.perSeriesAligner', per_series_aligner),
+        ('filter', filter_),
+        ('interval.endTime', end_time),
+        ('interval.startTime', start_time)
+    ]
+
+
+def _decode(time_series):
+    with operation('decode') as counters:
+        df = decode_time_series(time_series)
+        counters['rows'] = len(df)
+    return df
+
+
+def _sink_page(response, page_sink):
+    """
+    Decodes one timeSeries.list page and passes it to `page_sink`.
+
+    Returns:
+    - int: The number of rows of the page.
+    """
+    page_df = _decode(response.get('timeSeries', []))
+    if not page_df.empty:
+        page_sink(page_df)
+    return len(page_df)
+
+
+def _resume_progress(checkpoint, key):
+    """
+    Returns the saved progress of a query, or a fresh one without checkpoint.
+    """
+    if checkpoint is None:
+        return {'pages': 0, 'next_page_token': None, 'done': False}
+    return checkpoint.progress(key)
+
+
+def _check_saved_token(checkpoint, key, error):
+    """
+    Raises `error` again unless it is the API rejecting an expired saved page token, in
+    which case the query starts over. Returns the fresh progress.
+    """
+    if not isinstance(error, HttpError) or error.resp.status != 400:
+        raise error
+    click.echo("The saved page token is no longer valid, fetching the query from its first page.")
+    checkpoint.start(key)
+    return _resume_progress(None, key)
+
+
+def _pages(fetch_page, key):
+    """
+    Yields the responses of a timeSeries.list query page by page. `fetch_page` is called
+    with the page token of each page to fetch (None for the first page).
+
+    If a checkpoint is active (see utils.checkpoint), each fetched page is saved before it
+    is yielded. Pages saved by an interrupted run are yielded first, without API calls,
+    and fetching continues from the saved page token.
+    """
+    checkpoint = get_checkpoint()
+    progress = _resume_progress(checkpoint, key)
+    response = None
+    if progress['pages'] and not progress['done']:
+        # Page tokens expire, so the saved token is tried before the saved pages are used
+        try:
+            response = fetch_page(progress['next_page_token'])
+        except Exception as e:
+            progress = _check_saved_token(checkpoint, key, e)
+    elif checkpoint is not None and not progress['pages']:
+        checkpoint.start(key)
+
+    if progress['pages']:
+        yield from checkpoint.saved_pages(key, progress['pages'])
+    if progress['done']:
+        return
+
+    page = progress['pages']
+    page_token = progress['next_page_token']
+    while True:
+        if response is None:
+            response = fetch_page(page_token)
+        if checkpoint is not None:
+            checkpoint.save_page(key, page, response)
+        yield response
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return
+        response = None
+        page += 1
+
+
+async def _pages_async(transport, fetch_page, key):
+    """
+    Like _pages, for a coroutine function `fetch_page`. Checkpoint files are read and
+    written on a worker thread.
+    """
+    checkpoint = get_checkpoint()
+    progress = _resume_progress(checkpoint, key)
+    response = None
+    if progress['pages'] and not progress['done']:
+        try:
+            response = await fetch_page(progress['next_page_token'])
+        except Exception as e:
+            progress = await transport.run_blocking(_check_saved_token, checkpoint, key, e)
+    elif checkpoint is not None and not progress['pages']:
+        await transport.run_blocking(checkpoint.start, key)
+
+    if progress['pages']:
+        saved_pages = checkpoint.saved_pages(key, progress['pages'])
+        while (saved := await transport.run_blocking(next, saved_pages, None)) is not None:
+            yield saved
+    if progress['done']:
+        return
+
+    page = progress['pages']
+    page_token = progress['next_page_token']
+    while True:
+        if response is None:
+            response = await fetch_page(page_token)
+        if checkpoint is not None:
+            await transport.run_blocking(checkpoint.save_page, key, page, response)
+        yield response
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return
+        response = None
+        page += 1
+
+
+def _report_result(metric, result, page_sink):
+    found = result > 0 if page_sink else not result.empty
+    if not found:
+        click.echo(f"No data found for metric: {metric}")
+    else:
+        click.echo(f"Successfully fetched.")
+
+
 def fetch_metrics_from_api(
     project_id, location, cluster_name, namespace, container_name, 
     controller_name, controller_type, metric, start_time, end_time, 
-    per_series_aligner, cross_series_reducer):
+    per_series_aligner, cross_series_reducer, page_sink=None, alignment_period=ALIGNMENT_PERIOD,
+    group_by_fields=GROUP_BY_FIELDS):
     """
     Fetches metrics from Google Cloud Monitoring API based on the provided parameters.
+
+    If `page_sink` is given, each page is flattened and passed to it as soon as it
+    arrives instead of being buffered; the number of rows produced is returned in that case.
+
+    API errors that remain after the request scheduler's retries are raised to the caller.
     """
-    # Initialize the API client
-    try:
-        credentials, project_id = default()
-        credentials.refresh(Request())
-        service = build('monitoring', 'v3', credentials=credentials)
-    except Exception as e:
-        click.echo(f"Failed to authenticate and initialize the Google Cloud Asset API: {e}")
-        return
-    
+    # Get the shared API client
+    service = get_service('monitoring', 'v3')
+
     filter_ = build_filter_string(
         metric=metric,
         project_id=project_id,
@@ -114,61 +345,285 @@ def fetch_metrics_from_api(
 
     click.echo(f"Fetching data for metric: {metric} ...")
   
+    result = query_time_series(
+        service, project_id, filter_, start_time, end_time,
+        per_series_aligner, cross_series_reducer, page_sink, alignment_period, group_by_fields
+    )
+    _report_result(metric, result, page_sink)
+    return result
+
+
+async def fetch_metrics_from_api_async(
+    project_id, location, cluster_name, namespace, container_name,
+    controller_name, controller_type, metric, start_time, end_time,
+    per_series_aligner, cross_series_reducer, page_sink=None, alignment_period=ALIGNMENT_PERIOD,
+    group_by_fields=GROUP_BY_FIELDS):
+    """
+    Like fetch_metrics_from_api, with the pages requested through the async transport
+    (see utils.async_http).
+    """
+    filter_ = build_filter_string(
+        metric=metric,
+        project_id=project_id,
+        location=location,
+        cluster_name=cluster_name,
+        namespace=namespace,
+        container_name=container_name,
+        controller_name=controller_name,
+        controller_type=controller_type
+    )
+
+    click.echo(f"Fetching data for metric: {metric} ...")
+
+    result = await query_time_series_async(
+        get_async_transport(), project_id, filter_, start_time, end_time,
+        per_series_aligner, cross_series_reducer, page_sink, alignment_period, group_by_fields
+    )
+    _report_result(metric, result, page_sink)
+    return result
+
+
+def query_time_series(
+    service, project_id, filter_, start_time, end_time, 
+    per_series_aligner, cross_series_reducer, page_sink=None, alignment_period=ALIGNMENT_PERIOD,
+    group_by_fields=GROUP_BY_FIELDS):
+    """
+    Runs a timeSeries.list query through all of its pages. Errors are raised to the caller.
+    With an active checkpoint the pages are saved as they arrive (see _pages).
+
+    Returns:
+    - pd.DataFrame: The decoded points, or the number of rows passed to `page_sink` if given.
+    """
+    all_time_series_data = []
+    rows = 0
+
+    # list_next cannot rebuild requests with repeated query parameters (groupByFields)
+    fetch_page = lambda page_token: execute('monitoring', _build_list_request(
+        service, project_id, filter_, start_time, end_time,
+        per_series_aligner, cross_series_reducer, page_token, alignment_period, group_by_fields
+    ))
+    key = Checkpoint.make_key(project_id, filter_, start_time, end_time, per_series_aligner, cross_series_reducer, alignment_period, group_by_fields)
+
+    for response in _pages(fetch_page, key):
+        if page_sink:
+            rows += _sink_page(response, page_sink)
+        else:
+            all_time_series_data.extend(response.get('timeSeries', []))
+
+    if page_sink:
+        return rows
+    return _decode(all_time_series_data)
+
+
+async def query_time_series_async(
+    transport, project_id, filter_, start_time, end_time,
+    per_series_aligner, cross_series_reducer, page_sink=None, alignment_period=ALIGNMENT_PERIOD,
+    group_by_fields=GROUP_BY_FIELDS):
+    """
+    Like query_time_series, with the pages requested through `transport` (see
+    utils.async_http.AsyncTransport). Pages are decoded and passed to `page_sink` on a
+    worker thread, so the event loop keeps serving the other queries.
+    """
+    params = _list_params(filter_, start_time, end_time, per_series_aligner, cross_series_reducer, alignment_period, group_by_fields)
+    all_time_series_data = []
+    rows = 0
+
+    fetch_page = lambda page_token: transport.get_json('monitoring', f"projects/{project_id}/timeSeries", params + [('pageToken', page_token)])
+    key = Checkpoint.make_key(project_id, filter_, start_time, end_time, per_series_aligner, cross_series_reducer, alignment_period, group_by_fields)
+
+    async for response in _pages_async(transport, fetch_page, key):
+        if page_sink:
+            rows += await transport.run_blocking(_sink_page, response, page_sink)
+        else:
+            all_time_series_data.extend(response.get('timeSeries', []))
+
+    if page_sink:
+        return rows
+    return await transport.run_blocking(_decode, all_time_series_data)
+
+
+def _cache_page_sink(segment, page_sink):
+    # Every page goes to the output; the settled points also go to the cache segment
+    def sink(page_df):
+        segment.write(page_df)
+        page_sink(page_df)
+    return sink
+
+
+def fetch_metrics_into_cache(
+    cache, cache_key, project_id, filter_, metric, start_time, end_time, 
+    per_series_aligner, cross_series_reducer, alignment_period=ALIGNMENT_PERIOD, group_by_fields=GROUP_BY_FIELDS,
+    page_sink=None):
+    """
+    Fetches one time window of a query and stores it in the window cache. Errors are
+    raised so that a failed window is never recorded as fetched.
+
+    With `page_sink`, each page is passed to it as well as appended to the cache segment,
+    so the window is never held in memory.
+
+    Returns:
+    - pd.DataFrame: The fetched points that were too recent to be cached, or the number of
+      rows passed to `page_sink`.
+    """
+    service = get_service('monitoring', 'v3')
+    click.echo(f"Fetching data for metric: {metric} from {start_time} to {end_time} ...")
+    if page_sink is None:
+        df = query_time_series(
+            service, project_id, filter_, start_time, end_time,
+            per_series_aligner, cross_series_reducer,
+            alignment_period=alignment_period, group_by_fields=group_by_fields
+        )
+        return cache.store(cache_key, start_time, end_time, df)
+
+    segment = cache.open_segment(cache_key, start_time, end_time)
     try:
-        all_time_series_data = []
-        request = service.projects().timeSeries().list(
-            name=f"projects/{project_id}",
-            aggregation_alignmentPeriod="60s",
-            aggregation_crossSeriesReducer=cross_series_reducer,
-            aggregation_groupByFields=GROUP_BY_FIELDS,
-            aggregation_perSeriesAligner=per_series_aligner,
-            filter=filter_,
-            interval_endTime=end_time,
-            interval_startTime=start_time
+        rows = query_time_series(
+            service, project_id, filter_, start_time, end_time,
+            per_series_aligner, cross_series_reducer, _cache_page_sink(segment, page_sink),
+            alignment_period=alignment_period, group_by_fields=group_by_fields
         )
-        
-        while request is not None:
-            response = request.execute()
-            all_time_series_data.extend(response.get('timeSeries', []))
-            nextPageToken = response.get('nextPageToken')
-            
-            request = service.projects().timeSeries().list_next(previous_request=request, previous_response=response) if nextPageToken else None
-
-        df = pd.json_normalize(
-            all_time_series_data,
-            record_path='points',
-            meta=[
-                ['metric', 'type'],
-                ['resource', 'type'],
-                ['resource', 'labels', 'project_id'],
-                ['resource', 'labels', 'location'],
-                ['resource', 'labels', 'cluster_name'],
-                ['resource', 'labels', 'namespace_name'],
-                ['resource', 'labels', 'container_name'],
-                ['resource', 'labels', 'pod_name'],
-                ['metadata', 'systemLabels', 'top_level_controller_name'],
-                ['metadata', 'systemLabels', 'top_level_controller_type']
-            ],
-            errors='ignore'
+    except Exception:
+        segment.abort()
+        raise
+    segment.close()
+    return rows
+
+
+async def fetch_metrics_into_cache_async(
+    cache, cache_key, project_id, filter_, metric, start_time, end_time,
+    per_series_aligner, cross_series_reducer, alignment_period=ALIGNMENT_PERIOD, group_by_fields=GROUP_BY_FIELDS,
+    page_sink=None):
+    """
+    Like fetch_metrics_into_cache, with the pages requested through the async transport.
+    """
+    transport = get_async_transport()
+    click.echo(f"Fetching data for metric: {metric} from {start_time} to {end_time} ...")
+    if page_sink is None:
+        df = await query_time_series_async(
+            transport, project_id, filter_, start_time, end_time,
+            per_series_aligner, cross_series_reducer,
+            alignment_period=alignment_period, group_by_fields=group_by_fields
         )
+        return await transport.run_blocking(cache.store, cache_key, start_time, end_time, df)
 
-        if df.empty:
-            click.echo(f"No data found for metric: {metric}")
-        else:
-            click.echo(f"Successfully fetched.")
+    segment = cache.open_segment(cache_key, start_time, end_time)
+    try:
+        rows = await query_time_series_async(
+            transport, project_id, filter_, start_time, end_time,
+            per_series_aligner, cross_series_reducer, _cache_page_sink(segment, page_sink),
+            alignment_period=alignment_period, group_by_fields=group_by_fields
+        )
+    except Exception:
+        await transport.run_blocking(segment.abort)
+        raise
+    await transport.run_blocking(segment.close)
+    return rows
 
-        return df if not df.empty else pd.DataFrame()
 
-    except Exception as e:
-        click.echo(f"Error fetching metrics: {e}")
+def merge_shards(frames):
+    """
+    Merges the results of time-window shards of the same query.
+
+    Points on a shared window boundary can be returned by both neighbouring shards; only
+    the first copy is kept. Points of a series stay newest first, as the API returns them.
+
+    Parameters:
+    - frames (list): DataFrames of each shard, oldest window first.
+
+    Returns:
+    - pd.DataFrame: The merged DataFrame.
+    """
+    frames = [frame for frame in reversed(frames) if frame is not None and not frame.empty]
+    if not frames:
         return pd.DataFrame()
 
+    df = pd.concat(frames, ignore_index=True)
+    key_columns = [column for column in POINT_KEY_COLUMNS if column in df.columns]
+    df = df.drop_duplicates(subset=key_columns, keep='first')
+
+    label_columns = [column for column in key_columns if not column.startswith('interval.')]
+    if label_columns:
+        df = df.sort_values(label_columns, kind='stable', na_position='last')
+        # Concatenating categoricals with different categories falls back to object dtype
+        df = df.astype({column: 'category' for column in label_columns})
+    return df.reset_index(drop=True)
+
+
+def _make_page_sink(writer, window_start_time=None):
+    """
+    Returns a page sink writing to `writer`. Points ending exactly at `window_start_time`
+    are dropped: they belong to the previous window, whose end time is inclusive, and
+    would otherwise be written twice if the API returned them for both windows.
+    """
+    def page_sink(page_df):
+        if window_start_time:
+            page_df = drop_points_ending_at(page_df, window_start_time)
+        writer.write(page_df)
+    return page_sink
+
+
+def _stitch_cached(cache, cache_key, start_time, end_time, unsettled_frames, writer=None, gaps=()):
+    """
+    Assembles the output of a cached query from the cache and the points too recent to be cached.
+
+    With `writer`, the fetched `gaps` have already been written page by page, so only the
+    parts of the time range that were cached before are read, one row group at a time.
+    """
+    if writer is None:
+        frames = cache.read(cache_key, start_time, end_time)
+        unsettled_frames = [frame for frame in unsettled_frames if not frame.empty]
+        return merge_shards(list(frames) + unsettled_frames)
+
+    cached_ranges = []
+    cursor = start_time
+    for gap_start, gap_end in gaps:
+        if parse_rfc3339(gap_start) > parse_rfc3339(cursor):
+            cached_ranges.append((cursor, gap_start))
+        cursor = gap_end
+    if parse_rfc3339(end_time) > parse_rfc3339(cursor):
+        cached_ranges.append((cursor, end_time))
+
+    for range_start, range_end in cached_ranges:
+        for frame in cache.read(cache_key, range_start, range_end):
+            writer.write(frame)
+    return writer.close()
+
 
 def fetch_all_metrics(
     project_id, location, cluster_name, namespace, container_name, 
-    controller_name, controller_type, start_time, end_time, metrics_info):
+    controller_name, controller_type, start_time, end_time, metrics_info,
+    max_workers=DEFAULT_MAX_WORKERS, shard_duration=None, writer_factory=None, cache=None,
+    fetch_assets=True, alignment_period=ALIGNMENT_PERIOD, http_transport='sync'):
     """
     Fetch all required metrics as per the metrics info configuration.
+
+    Each metric's timeSeries.list pagination chain and the Cloud Asset listing run
+    concurrently on a thread pool of `max_workers` threads. A failure in one fetch
+    is reported and does not affect the others.
+
+    If `shard_duration` (timedelta) is set, the time range is split into aligned
+    sub-windows that are fetched in parallel and merged per metric.
+
+    If `writer_factory` is set, it is called with each metric key and must return a
+    writer (see utils.file.StreamingWriter). Pages are then written as they arrive and
+    the returned dictionary holds the written file path instead of a DataFrame.
+
+    Metrics whose metrics_info entry sets "encoding" to CHANGE_POINTS are returned as
+    intervals of constant value (see utils.encoding.encode_change_points) instead of
+    one row per point.
+
+    If `cache` (utils.cache.WindowCache) is set, only the parts of the time range that
+    are not cached yet are fetched; the output is stitched from the cache.
+
+    Label parameters accept lists of values (see build_filter_string). The asset
+    inventory is skipped if `fetch_assets` is False. Queries use `alignment_period`
+    (timedelta) and GROUP_BY_FIELDS unless the metrics_info entry sets its own
+    "alignment_period" or "group_by_fields" (see utils.aggregation).
+
+    With `http_transport` 'async' the pagination chains run as coroutines on the async
+    transport (see utils.async_http) instead of the thread pool. They are not limited by
+    `max_workers`; the requests in flight are bounded by the async concurrency limit of
+    the request scheduler instead.
     """
     click.echo(f"Starting to fetch metrics for the following configuration: "
                f"Project ID: {project_id}, Location: {location}, "
@@ -177,31 +632,122 @@ def fetch_all_metrics(
 
     all_metrics_data = {}
 
-    for key, info in metrics_info.items():
+    if shard_duration:
+        click.echo(f"Splitting the time range into windows of up to {shard_duration}.")
 
-        metric_type = info["metric_type"]
-        aligner = info.get("aligner", "ALIGN_MEAN")
-        reducer = info.get("reducer", "REDUCE_MEAN")
+    async_transport = get_async_transport() if http_transport == 'async' else None
 
-        metric_data = fetch_metrics_from_api(
-            project_id, location, cluster_name, namespace, container_name, 
-            controller_name, controller_type, metric_type, start_time, end_time, 
-            aligner, reducer
-        )
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        def submit(function, async_function, *args):
+            if async_transport is not None:
+                return async_transport.submit(async_function, *args)
+            return executor.submit(function, *args)
 
-        if not metric_data.empty:
-            all_metrics_data[key] = metric_data
-        else:
-            click.echo(f"No data found for {metric_type}.")
-    
-    # Fetch pod startup time from Asset Inventory
-    all_metrics_data['pod_startup']  = fetch_and_process_assets(
-        project_id, 
-        location, 
-        cluster_name, 
-        controller_name, 
-        namespace
-        )
+        futures = {}
+        writers = {}
+        cache_keys = {}
+        cache_gaps = {}
+        for key, info in metrics_info.items():
+
+            metric_type = info["metric_type"]
+            aligner = info.get("aligner", "ALIGN_MEAN")
+            reducer = info.get("reducer", "REDUCE_MEAN")
+            period = info.get("alignment_period", alignment_period)
+            group_by_fields = info.get("group_by_fields", GROUP_BY_FIELDS)
+
+            if writer_factory:
+                writers[key] = writer_factory(key)
+                if info.get("encoding") == CHANGE_POINTS:
+                    writers[key] = ChangePointWriter(writers[key], period)
+
+            if cache is not None:
+                filter_ = build_filter_string(
+                    metric=metric_type,
+                    project_id=project_id,
+                    location=location,
+                    cluster_name=cluster_name,
+                    namespace=namespace,
+                    container_name=container_name,
+                    controller_name=controller_name,
+                    controller_type=controller_type
+                )
+                cache_keys[key] = cache.make_key(project_id, filter_, aligner, reducer, period, group_by_fields)
+                gaps = cache_gaps[key] = cache.missing_ranges(cache_keys[key], start_time, end_time)
+                click.echo(f"{len(gaps)} uncached time range(s) to fetch for metric: {metric_type}")
+                gap_windows = [
+                    window
+                    for gap_start, gap_end in gaps
+                    for window in (split_time_range(gap_start, gap_end, shard_duration, period) if shard_duration else [(gap_start, gap_end)])
+                ]
+                # When streaming, fetched pages are written to the output and the cache at once
+                futures[key] = [
+                    submit(
+                        fetch_metrics_into_cache, fetch_metrics_into_cache_async,
+                        cache, cache_keys[key], project_id, filter_, metric_type,
+                        window_start, window_end, aligner, reducer, period, group_by_fields,
+                        _make_page_sink(writers[key], window_start) if writer_factory else None
+                    )
+                    for window_start, window_end in gap_windows
+                ]
+                continue
+
+            windows = split_time_range(start_time, end_time, shard_duration, period) if shard_duration else [(start_time, end_time)]
+            futures[key] = []
+            for index, (window_start, window_end) in enumerate(windows):
+                page_sink = None
+                if writer_factory:
+                    page_sink = _make_page_sink(writers[key], window_start if index > 0 else None)
+                futures[key].append(submit(
+                    fetch_metrics_from_api, fetch_metrics_from_api_async,
+                    project_id, location, cluster_name, namespace, container_name, 
+                    controller_name, controller_type, metric_type, window_start, window_end, 
+                    aligner, reducer, page_sink, period, group_by_fields
+                ))
+
+        # Fetch pod startup time from Asset Inventory alongside the metrics
+        assets_future = None
+        if fetch_assets:
+            assets_future = submit(
+                fetch_and_process_assets, fetch_and_process_assets_async,
+                project_id, 
+                location, 
+                cluster_name, 
+                controller_name, 
+                namespace
+                )
+
+        # Collect results in metrics_info order so the output is deterministic
+        for key, shard_futures in futures.items():
+            metric_type = metrics_info[key]["metric_type"]
+            try:
+                shards = [future.result() for future in shard_futures]
+                if key in cache_keys:
+                    metric_data = _stitch_cached(cache, cache_keys[key], start_time, end_time, shards, writers.get(key), cache_gaps[key])
+                elif key in writers:
+                    metric_data = writers[key].close()
+                else:
+                    metric_data = shards[0] if len(shards) == 1 else merge_shards(shards)
+                if key not in writers and metrics_info[key].get("encoding") == CHANGE_POINTS:
+                    with operation('encode_change_points') as counters:
+                        metric_data = encode_change_points(metric_data, metrics_info[key].get("alignment_period", alignment_period))
+                        counters['rows'] = len(metric_data)
+            except Exception as e:
+                click.echo(f"Error fetching metrics for {metric_type}: {e}")
+                if key in writers:
+                    writers[key].close()
+                continue
+
+            if metric_data is not None and (key in writers or not metric_data.empty):
+                all_metrics_data[key] = metric_data
+            else:
+                click.echo(f"No data found for {metric_type}.")
+
+        if assets_future is not None:
+            try:
+                all_metrics_data['pod_startup'] = assets_future.result()
+            except Exception as e:
+                click.echo(f"Error fetching asset inventory: {e}")
+                all_metrics_data['pod_startup'] = pd.DataFrame()
     
     click.echo("Completed fetching all metrics.")
     return all_metrics_data
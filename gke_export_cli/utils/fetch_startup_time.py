@@ -1,68 +1,239 @@
-from google.auth import default
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from utils.async_http import get_async_transport
+from utils.clients import get_service
+from utils.run_report import operation
+from utils.scheduler import execute
+from googleapiclient.errors import HttpError
 import pandas as pd
 import click
 import json
 
+# Only the fields read by extract_container_info are requested from the API
+POD_FIELDS = "metadata(name,namespace),spec/containers(name,readinessProbe),status/conditions(type,lastTransitionTime)"
+SEARCH_READ_MASK = "name,versionedResources"
+SEARCH_FIELDS = f"nextPageToken,results(name,versionedResources/resource({POD_FIELDS}))"
+LIST_FIELDS = f"nextPageToken,assets(name,resource/data({POD_FIELDS}))"
+
+# Search errors after which the pods are listed instead
+SEARCH_FALLBACK_STATUSES = {400, 403, 404, 501}
+
+
 def fetch_and_process_assets(project_id, location, cluster_name, controller_name, namespace):
     """
     Fetches Kubernetes asset inventory data from Google Cloud API and returns it as a DataFrame.
+
+    The pods are looked up with a name-scoped resource search. If the search is not
+    available, all pods of the project are listed and filtered locally instead. API errors
+    that remain after the request scheduler's retries are raised to the caller.
+    """
+
+    # Get the shared API client
+    service = get_service('cloudasset', 'v1')
+
+    expected_name = _expected_name(project_id, location, cluster_name, controller_name, namespace)
+
+    try:
+        pods = search_pod_resources(service, project_id, expected_name, controller_name)
+    except (HttpError, ValueError) as e:
+        _check_search_fallback(e)
+        pods = list_pod_resources(service, project_id, expected_name)
+
+    return _assets_dataframe(pods, project_id, location, cluster_name, controller_name, namespace)
+
+
+async def fetch_and_process_assets_async(project_id, location, cluster_name, controller_name, namespace):
+    """
+    Like fetch_and_process_assets, with the API calls sent through the async transport
+    (see utils.async_http).
     """
+    transport = get_async_transport()
+    expected_name = _expected_name(project_id, location, cluster_name, controller_name, namespace)
 
-    # Initialize the API client
     try:
-        credentials, project_id = default()
-        credentials.refresh(Request())
-        service = build('cloudasset', 'v1', credentials=credentials)
-    except Exception as e:
-        click.echo(f"Failed to authenticate and initialize the Google Cloud Asset API: {e}")
-        return pd.DataFrame()
-
-    asset_data = []
+        pods = await search_pod_resources_async(transport, project_id, expected_name, controller_name)
+    except (HttpError, ValueError) as e:
+        _check_search_fallback(e)
+        pods = await list_pod_resources_async(transport, project_id, expected_name)
+
+    return await transport.run_blocking(_assets_dataframe, pods, project_id, location, cluster_name, controller_name, namespace)
+
+
+def _expected_name(project_id, location, cluster_name, controller_name, namespace):
+    # The asset name of the controller's pods, up to the pod name suffix. Without a namespace,
+    # all pods of the cluster (e.g., for a fleet target)
+    namespaces = f'projects/{project_id}/locations/{location}/clusters/{cluster_name}/k8s/namespaces/'
+    if not namespace:
+        return namespaces
+    return f'{namespaces}{namespace}/pods/{controller_name or ""}'
+
+
+def _check_search_fallback(error):
+    """
+    Raises `error` again unless the pods should be listed instead of searched.
+    """
+    if isinstance(error, HttpError) and error.resp.status not in SEARCH_FALLBACK_STATUSES:
+        raise error
+    click.echo(f"Asset search unavailable ({error}), listing all pods instead.")
+
+
+def _assets_dataframe(pods, project_id, location, cluster_name, controller_name, namespace):
+    """
+    Returns one row per container of the pods, with the readiness probe and status conditions.
+    """
+    with operation('extract_assets') as counters:
+        asset_data = []
+        for resource in pods:
+            # Extract container information and check for readinessProbe
+            containers_info = extract_container_info(resource, location, cluster_name, namespace, controller_name, project_id)
+
+            # Add the containers info to the asset data
+            if containers_info:
+                asset_data.extend(containers_info)
+        counters['rows'] = len(asset_data)
+
+    # Convert the list of asset data into a DataFrame
+    return pd.DataFrame(asset_data)
+
+
+def search_pod_resources(service, project_id, expected_name, controller_name):
+    """
+    Searches the pods whose asset name contains `expected_name`, narrowing the search on the
+    server to pods named after the controller in the expected namespace.
+
+    Parameters:
+    - service: The Cloud Asset API client.
+    - project_id (str): The project to search in.
+    - expected_name (str): The name prefix of the pods, up to the controller name.
+    - controller_name (str): The controller name.
+
+    Returns:
+    - list: The resource data of each matching pod.
+
+    Raises:
+    - ValueError: If the search results do not carry the pod resource data.
+    """
+    resources = []
+    next_page_token = None
+    while True:
+        response = execute('cloudasset', service.v1().searchAllResources(
+            scope=f"projects/{project_id}",
+            assetTypes=["k8s.io/Pod"],
+            query=_search_query(expected_name, controller_name),
+            readMask=SEARCH_READ_MASK,
+            fields=SEARCH_FIELDS,
+            pageToken=next_page_token
+        ))
+        resources.extend(_searched_resources(response, expected_name))
+
+        next_page_token = response.get('nextPageToken', None)
+        if not next_page_token:
+            break
+
+    return resources
+
+
+async def search_pod_resources_async(transport, project_id, expected_name, controller_name):
+    """
+    Like search_pod_resources, with the pages requested through the async transport.
+    """
+    resources = []
+    next_page_token = None
+    while True:
+        response = await transport.get_json('cloudasset', f"projects/{project_id}:searchAllResources", [
+            ('assetTypes', "k8s.io/Pod"),
+            ('query', _search_query(expected_name, controller_name)),
+            ('readMask', SEARCH_READ_MASK),
+            ('fields', SEARCH_FIELDS),
+            ('pageToken', next_page_token)
+        ])
+        resources.extend(_searched_resources(response, expected_name))
+
+        next_page_token = response.get('nextPageToken', None)
+        if not next_page_token:
+            break
+
+    return resources
+
+
+def _search_query(expected_name, controller_name):
+    # The parent of a pod is its namespace, or with all namespaces, any namespace of the cluster
+    parent_name = expected_name.rsplit('/pods/', 1)[0].removesuffix('/k8s/namespaces/')
+    if not controller_name:
+        return f'parentFullResourceName:"{parent_name}"'
+    return f'name:"{controller_name}" AND parentFullResourceName:"{parent_name}"'
+
+
+def _searched_resources(response, expected_name):
+    """
+    Returns the resource data of the pods of a search page whose name contains `expected_name`.
+    """
+    resources = []
+    for result in response.get('results', []):
+        # The search is word based, so the exact match is still checked here
+        if expected_name not in result.get('name', ''):
+            continue
+        versions = [version.get('resource') for version in result.get('versionedResources', []) if version.get('resource')]
+        if not versions:
+            raise ValueError("search results do not include the pod resource data")
+        resources.append(versions[0])
+    return resources
+
+
+def list_pod_resources(service, project_id, expected_name):
+    """
+    Lists all pods of the project and returns the resource data of those whose asset
+    name contains `expected_name`.
+    """
+    resources = []
     next_page_token = None
 
     # Paginate through all pages of results
     while True:
-        # Make the request for asset inventory with pagination handling
-        try:
-            request = service.assets().list(
-                parent=f"projects/{project_id}",
-                assetTypes=["k8s.io/Pod"],
-                contentType="RESOURCE",
-                pageToken=next_page_token
-            )
-            response = request.execute()
-        except Exception as e:
-            click.echo(f"Error fetching asset inventory: {e}")
-            return pd.DataFrame()
-
-        # Process the current page's response and extract relevant data
-        if 'assets' in response:
-            for asset in response['assets']:
-                name = asset.get('name', '')
-
-                # Construct the expected name format
-                expected_name = f'projects/{project_id}/locations/{location}/clusters/{cluster_name}/k8s/namespaces/{namespace}/pods/{controller_name}'
-                
-                # Check if the name exactly matches the constructed expected name
-                if expected_name in name:  # Use `startswith` to handle pod suffix like '-68f5d8498d-67bzg'
-                    resource = asset.get('resource', {}).get('data', {})
-
-                    # Extract container information and check for readinessProbe
-                    containers_info = extract_container_info(resource, location, cluster_name, namespace, controller_name, project_id)
-                    
-                    # Add the containers info to the asset data
-                    if containers_info:
-                        asset_data.extend(containers_info)
+        response = execute('cloudasset', service.assets().list(
+            parent=f"projects/{project_id}",
+            assetTypes=["k8s.io/Pod"],
+            contentType="RESOURCE",
+            fields=LIST_FIELDS,
+            pageToken=next_page_token
+        ))
+        resources.extend(_listed_resources(response, expected_name))
 
         # Check if there is a next page token
         next_page_token = response.get('nextPageToken', None)
         if not next_page_token:
             break
 
-    # Convert the list of asset data into a DataFrame
-    return pd.DataFrame(asset_data)
+    return resources
+
+
+async def list_pod_resources_async(transport, project_id, expected_name):
+    """
+    Like list_pod_resources, with the pages requested through the async transport.
+    """
+    resources = []
+    next_page_token = None
+    while True:
+        response = await transport.get_json('cloudasset', f"projects/{project_id}/assets", [
+            ('assetTypes', "k8s.io/Pod"),
+            ('contentType', "RESOURCE"),
+            ('fields', LIST_FIELDS),
+            ('pageToken', next_page_token)
+        ])
+        resources.extend(_listed_resources(response, expected_name))
+
+        next_page_token = response.get('nextPageToken', None)
+        if not next_page_token:
+            break
+
+    return resources
+
+
+def _listed_resources(response, expected_name):
+    # Use a substring match to handle pod suffixes like '-68f5d8498d-67bzg'
+    return [
+        asset.get('resource', {}).get('data', {})
+        for asset in response.get('assets', [])
+        if expected_name in asset.get('name', '')
+    ]
 
 
 def extract_container_info(resource, location, cluster_name, namespace, controller_name, project_id):
@@ -74,7 +245,7 @@ def extract_container_info(resource, location, cluster_name, namespace, controll
     - resource (dict): The resource data from the asset API response.
     - location (str): The location to filter by.
     - cluster_name (str): The cluster name to filter by.
-    - namespace (str): The namespace to filter by.
+    - namespace (str): The namespace to filter by, or empty to take it from the pod.
     - controller_name (str): The controller name to filter by.
 
     Returns:
@@ -82,8 +253,9 @@ def extract_container_info(resource, location, cluster_name, namespace, controll
     """
     container_list = []
 
-    # Ensure that all relevant fields are present before proceeding
-    if 'spec' not in resource or 'status' not in resource:
+    # Ensure that all relevant fields are present before proceeding. Only the status
+    # conditions are requested, so pods without conditions have no status at all
+    if 'spec' not in resource:
         return []
 
     # Extract container information
@@ -94,8 +266,9 @@ def extract_container_info(resource, location, cluster_name, namespace, controll
         container_info['project_id'] = project_id
         container_info['location'] = location
         container_info['cluster_name'] = cluster_name
-        container_info['namespace'] = namespace
+        container_info['namespace'] = namespace or resource.get('metadata', {}).get('namespace', 'Unknown')
         container_info['controller_name'] = controller_name
+        container_info['pod_name'] = resource.get('metadata', {}).get('name', 'Unknown')
         container_info['container_name'] = container.get('name', 'Unknown')
         container_info['readiness_probe_exists'] = 'readinessProbe' in container
 
@@ -1,42 +1,234 @@
+import io
 import pandas as pd
 from pathlib import Path
-import zipfile
+import threading
 import os
+from utils.archive import DEFAULT_ARCHIVE_FORMAT, ArchiveWriter, archive_path_for
+from utils.options import DEFAULT_PARQUET_CODEC
+from utils.run_report import operation
 
-def save_dataframes(output_dir: Path, format: str, metrics_data: dict, prefix: str, zip_files: bool):
+# Timestamps are written to CSV files in RFC3339 format, as returned by the API
+CSV_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Number of rows buffered before a Parquet row group is flushed by StreamingWriter
+STREAM_ROW_GROUP_SIZE = 65536
+
+
+def parquet_options(compression: str = DEFAULT_PARQUET_CODEC, compression_level: int = None, use_dictionary: bool = True) -> dict:
+    """
+    Returns the Parquet writer options used for every Parquet file of an export.
+
+    Parameters:
+    - compression (str): One of utils.options.PARQUET_CODECS.
+    - compression_level (int): Codec specific level (e.g., 1-22 for zstd). Defaults to the codec default.
+    - use_dictionary (bool): If True, columns are dictionary encoded, which keeps repeated
+      labels small.
+
+    Returns:
+    - dict: Keyword arguments for pyarrow.parquet.ParquetWriter and DataFrame.to_parquet.
+    """
+    options = {'compression': compression, 'use_dictionary': use_dictionary}
+    if compression_level is not None:
+        options['compression_level'] = compression_level
+    return options
+
+
+class StreamingWriter:
+    """
+    Appends DataFrames to a single CSV or Parquet file as they are produced.
+
+    Parquet output is written in row groups of about `row_group_size` rows, so memory use
+    is bounded by the row group size instead of the size of the export. Writes from
+    several threads are serialized. The schema is fixed by the first written DataFrame;
+    later DataFrames are conformed to it.
+    """
+
+    def __init__(self, file_path: Path, format: str, row_group_size: int = STREAM_ROW_GROUP_SIZE, parquet_options: dict = None):
+        self.file_path = file_path
+        self.format = format
+        self.row_group_size = row_group_size
+        self.parquet_options = parquet_options or {}
+        self.rows = 0
+        self._columns = None
+        self._schema = None
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+
+    def write(self, df: pd.DataFrame):
+        """
+        Appends the rows of `df` to the output file.
+        """
+        if df.empty:
+            return
+        with self._lock, operation('stream_write', rows=len(df)):
+            if self._columns is None:
+                self._columns = list(df.columns)
+            else:
+                df = df.reindex(columns=self._columns)
+
+            if self.format == 'csv':
+                df.to_csv(self.file_path, mode='a', header=self.rows == 0, index=False, date_format=CSV_DATE_FORMAT)
+            else:
+                self._pending.append(df)
+                self._pending_rows += len(df)
+                if self._pending_rows >= self.row_group_size:
+                    self._flush()
+            self.rows += len(df)
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._pending:
+            return
+        df = pd.concat(self._pending, ignore_index=True)
+        # Category sets differ between batches, so categorical columns are written as plain strings
+        df = df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+        self._pending = []
+        self._pending_rows = 0
+
+        if self._schema is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # Columns that are entirely empty in the first batch are stored as strings
+            self._schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            self._writer = pq.ParquetWriter(self.file_path, self._schema, **self.parquet_options)
+        self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def close(self):
+        """
+        Flushes and closes the output file.
+
+        Returns:
+        - Path: The written file, or None if no rows were written.
+        """
+        with self._lock, operation('stream_write'):
+            if self.format != 'csv':
+                self._flush()
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+            if not self.rows:
+                return None
+        print(f"Saved {self.rows} rows to {self.file_path}")
+        return self.file_path
+
+
+def read_batches(file_path: Path, format: str, batch_rows: int = STREAM_ROW_GROUP_SIZE):
+    """
+    Yields the rows of a CSV or Parquet file as DataFrames of at most `batch_rows` rows,
+    so that the file is never loaded whole.
     """
-    Save all dataframes (metrics and asset) to disk in the specified format, and optionally zip the files.
+    if format == 'csv':
+        with pd.read_csv(file_path, chunksize=batch_rows) as chunks:
+            yield from chunks
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows):
+        # Converted as a table so the pandas metadata of the file (e.g., categoricals) applies
+        yield pa.Table.from_batches([batch], schema=parquet_file.schema_arrow).to_pandas()
+
+
+def _serialize(df: pd.DataFrame, format: str, parquet_options: dict = None) -> bytes:
+    buffer = io.BytesIO()
+    if format == 'csv':
+        df.to_csv(buffer, index=False, date_format=CSV_DATE_FORMAT)
+    elif format == 'parquet':
+        df.to_parquet(buffer, index=False, **(parquet_options or {}))
+    return buffer.getvalue()
+
+
+def save_dataframes(output_dir: Path, format: str, metrics_data: dict, prefix: str, zip_files: bool,
+                    archive: ArchiveWriter = None, parquet_options: dict = None):
+    """
+    Save all dataframes (metrics and asset) to disk in the specified format, or straight into an archive.
+    Entries that are a Path have already been written by a StreamingWriter and are only archived.
 
     Args:
     - output_dir (Path): Directory where files will be saved.
     - format (str): File format, either 'csv' or 'parquet'.
     - metrics_data (dict): Dictionary of metrics dataframes.
     - prefix (str): Unique prefix for all files.
-    - zip_files (bool): If True, zip the files after saving.
+    - zip_files (bool): If True, the files are written into '<prefix>_metrics_and_assets.zip'
+      next to `output_dir` instead of to disk.
+    - archive (ArchiveWriter): An open archive, shared by several calls, to write the files into
+      instead of to disk. The caller closes it.
+    - parquet_options (dict): Parquet writer options (see parquet_options).
     """
-    
+    owned_archive = None
+    if zip_files and archive is None:
+        owned_archive = archive = ArchiveWriter(archive_path_for(output_dir, prefix), output_dir)
+
     # Save all metric dataframes
     for metric_name, df in metrics_data.items():
+        if isinstance(df, Path):
+            if archive is not None and df.exists():
+                archive.add_file(df, remove=True)
+            continue
         file_path = output_dir / f"{prefix}_{metric_name}.{format}"
         try:
-            if format == 'csv':
-                df.to_csv(file_path, index=False)
-            elif format == 'parquet':
-                df.to_parquet(file_path, index=False)
-            print(f"Saved {metric_name} metrics to {file_path}")
+            with operation('write', rows=len(df)) as counters:
+                if archive is not None:
+                    data = _serialize(df, format, parquet_options)
+                    counters['bytes'] = len(data)
+                    archive.add_bytes(file_path, data)
+                    print(f"Archived {metric_name} metrics as {file_path.name}")
+                elif format == 'csv':
+                    df.to_csv(file_path, index=False, date_format=CSV_DATE_FORMAT)
+                    counters['bytes'] = file_path.stat().st_size
+                    print(f"Saved {metric_name} metrics to {file_path}")
+                elif format == 'parquet':
+                    df.to_parquet(file_path, index=False, **(parquet_options or {}))
+                    counters['bytes'] = file_path.stat().st_size
+                    print(f"Saved {metric_name} metrics to {file_path}")
         except Exception as e:
             print(f"Failed to save {metric_name} metrics to {file_path}. Error: {e}")
 
+    if owned_archive is not None:
+        owned_archive.close()
+
 
-    # Optionally zip the files
-    if zip_files:
-        zip_file_path = output_dir.parent / f"{prefix}_metrics_and_assets.zip"
+def zip_output_dir(output_dir: Path, prefix: str, archive_format: str = DEFAULT_ARCHIVE_FORMAT, level: int = None):
+    """
+    Compress all files below `output_dir` into '<prefix>_metrics_and_assets' next to it.
+
+    Files are compressed in parallel (see ArchiveWriter). Exports that know their outputs
+    up front should write them into an ArchiveWriter directly instead.
+
+    Args:
+    - output_dir (Path): Directory holding the files to compress.
+    - prefix (str): Unique prefix of the archive file.
+    - archive_format (str): One of ARCHIVE_FORMATS.
+    - level (int): Compression level. Defaults to the level of the archive format.
+    """
+    archive_path = archive_path_for(output_dir, prefix, archive_format)
+    try:
+        archive = ArchiveWriter(archive_path, output_dir, archive_format, level)
         try:
-            with zipfile.ZipFile(zip_file_path, 'w') as zipf:
-                for root, _, files in os.walk(output_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        zipf.write(file_path, os.path.relpath(file_path, output_dir))
-            print(f"Zipped files into {zip_file_path}")
-        except Exception as e:
-            print(f"Failed to zip files into {zip_file_path}. Error: {e}")
+            for root, _, files in os.walk(output_dir):
+                for file in sorted(files):
+                    archive.add_file(Path(root) / file)
+        finally:
+            archive.close()
+    except Exception as e:
+        print(f"Failed to zip files into {archive_path}. Error: {e}")
+
+
+def remove_empty_dirs(output_dir: Path):
+    """
+    Removes `output_dir` and the folders below it that are left empty, e.g. after their
+    files were written into an archive.
+    """
+    for directory in sorted(Path(output_dir).rglob('*'), reverse=True):
+        if directory.is_dir() and not any(directory.iterdir()):
+            directory.rmdir()
+    if Path(output_dir).is_dir() and not any(Path(output_dir).iterdir()):
+        Path(output_dir).rmdir()
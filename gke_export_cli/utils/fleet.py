@@ -0,0 +1,258 @@
+import pickle
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import click
+import pandas as pd
+from utils.cache import DEFAULT_CACHE_MAX_BYTES, WindowCache
+from utils.clients import get_credentials, get_service, set_credentials
+from utils.fetch_gke_metrics import DEFAULT_MAX_WORKERS, METRICS_INFO, fetch_all_metrics
+from utils.file import StreamingWriter, read_batches, save_dataframes
+from utils.options import DEFAULT_MAX_PROCESSES
+from utils.scheduler import configure_scheduler, execute, get_scheduler
+
+
+# Columns of the per-target summary
+SUMMARY_COLUMNS = [
+    "target", "project_id", "location", "cluster_name", "status", "metrics", "rows", "seconds",
+    "api_calls", "retries", "throttled", "error"
+]
+
+
+def discover_clusters(project_ids: list) -> list:
+    """
+    Lists the GKE clusters of each project in all locations.
+
+    Parameters:
+    - project_ids (list): The projects to search.
+
+    Returns:
+    - list: One target dictionary (project_id, location, cluster_name) per cluster.
+    """
+    service = get_service('container', 'v1')
+    targets = []
+    for project_id in project_ids:
+        response = execute('container', service.projects().locations().clusters().list(
+            parent=f"projects/{project_id}/locations/-"
+        ))
+        for cluster in response.get('clusters', []):
+            targets.append({
+                'project_id': project_id,
+                'location': cluster['location'],
+                'cluster_name': cluster['name']
+            })
+        for location in response.get('missingZones', []):
+            click.echo(f"Could not list clusters of {project_id} in {location}.")
+    return targets
+
+
+def target_id(target: dict) -> str:
+    """
+    Returns a file name friendly identifier of a target.
+    """
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', f"{target['project_id']}_{target['location']}_{target['cluster_name']}")
+
+
+def _init_worker(credentials_blob, scheduler_options):
+    """
+    Installs the credentials refreshed by the parent process and the request scheduler
+    settings in a worker process.
+    """
+    if credentials_blob is not None:
+        set_credentials(pickle.loads(credentials_blob))
+    configure_scheduler(**scheduler_options)
+
+
+def _scheduler_totals() -> dict:
+    """
+    Returns the request scheduler counters of this process summed over all APIs.
+    """
+    totals = {'api_calls': 0, 'retries': 0, 'throttled': 0}
+    for stats in get_scheduler().stats().values():
+        totals['api_calls'] += stats['calls']
+        totals['retries'] += stats['retries']
+        totals['throttled'] += stats['throttled']
+    return totals
+
+
+def export_target(target: dict, options: dict) -> dict:
+    """
+    Exports the metrics of one target into `<run_dir>/targets/<target id>/`. Runs in a worker process.
+
+    Parameters:
+    - target (dict): The project_id, location and cluster_name to export, plus the optional
+      namespace, controller_name and controller_type filters.
+    - options (dict): The run options (see run_fleet).
+
+    Returns:
+    - dict: The summary row of the target.
+    """
+    started = time.perf_counter()
+    counters_before = _scheduler_totals()
+    key = target_id(target)
+    summary = {
+        'target': key,
+        'project_id': target['project_id'],
+        'location': target['location'],
+        'cluster_name': target['cluster_name'],
+        'status': 'failed',
+        'metrics': 0,
+        'rows': 0,
+        'seconds': 0.0,
+        'error': ''
+    }
+
+    try:
+        cache = None
+        if options['use_cache']:
+            cache = WindowCache(max_bytes=options['cache_max_bytes'], auto_evict=False)
+
+        data = fetch_all_metrics(
+            project_id=target['project_id'],
+            location=target['location'],
+            cluster_name=target['cluster_name'],
+            namespace=target.get('namespace', ''),
+            container_name=target.get('container_name', ''),
+            controller_name=target.get('controller_name', ''),
+            controller_type=target.get('controller_type', ''),
+            start_time=options['start_time'],
+            end_time=options['end_time'],
+            metrics_info=options['metrics_info'],
+            max_workers=options['max_workers'],
+            shard_duration=options['shard_duration'],
+            cache=cache,
+            fetch_assets=options['fetch_assets']
+        )
+
+        target_dir = Path(options['run_dir']) / 'targets' / key
+        target_dir.mkdir(parents=True, exist_ok=True)
+        save_dataframes(target_dir, options['format'], data, key, False, parquet_options=options.get('parquet_options'))
+
+        # The pod startup times are not a metric, and are empty when the asset lookup failed
+        metrics = [key for key in data if key in options['metrics_info']]
+        summary['metrics'] = len(metrics)
+        summary['rows'] = int(sum(len(data[key]) for key in metrics))
+        summary['status'] = 'ok' if len(metrics) == len(options['metrics_info']) else ('partial' if metrics else 'no data')
+    except Exception as e:
+        summary['error'] = str(e)
+
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    # Worker processes are reused across targets, so only this target's calls are counted
+    summary.update({name: value - counters_before[name] for name, value in _scheduler_totals().items()})
+    return summary
+
+
+def combine_target_outputs(run_dir: Path, format: str, prefix: str, keys: list, parquet_options: dict = None) -> dict:
+    """
+    Combines the per-target files of each metric (or pod_startup) into one file per key in
+    `run_dir`. The parts are appended batch by batch, so memory use does not grow with the
+    number of targets.
+
+    Returns:
+    - dict: The combined file path per key.
+    """
+    combined = {}
+    for key in keys:
+        parts = sorted((run_dir / 'targets').glob(f"*/*_{key}.{format}"))
+        if not parts:
+            continue
+        writer = StreamingWriter(run_dir / f"{prefix}_{key}.{format}", format, parquet_options=parquet_options)
+        for part in parts:
+            for df in read_batches(part, format):
+                writer.write(df)
+        file_path = writer.close()
+        if file_path is not None:
+            combined[key] = file_path
+    return combined
+
+
+def run_fleet(targets: list, run_dir: Path, prefix: str, start_time: str, end_time: str, format: str = 'parquet',
+              max_processes: int = DEFAULT_MAX_PROCESSES, max_workers: int = DEFAULT_MAX_WORKERS,
+              shard_duration=None, use_cache: bool = True, cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+              metrics_info: dict = METRICS_INFO, scheduler_options: dict = None, parquet_options: dict = None,
+              fetch_assets: bool = True) -> pd.DataFrame:
+    """
+    Exports a list of targets in a bounded process pool and combines the results.
+
+    The credentials are refreshed once in this process and handed to the workers. Each
+    worker fetches its target's metrics and, unless `fetch_assets` is False, the pod startup
+    times from the asset inventory, and writes them below `run_dir/targets`; they are then
+    combined into one file per metric and one pod_startup file in `run_dir`, next to a '<prefix>_fleet_summary.csv' with one row per target.
+
+    Parameters:
+    - targets (list): Target dictionaries (see export_target).
+    - run_dir (Path): Directory of this run.
+    - prefix (str): Unique prefix for the combined files.
+    - start_time (str): Start time in RFC3339 format.
+    - end_time (str): End time in RFC3339 format.
+    - format (str): File format, either 'csv' or 'parquet'.
+    - max_processes (int): Number of targets exported in parallel.
+    - max_workers (int): Number of fetch threads per target.
+    - shard_duration (timedelta): Optional time-window sharding.
+    - use_cache (bool): Whether to use the local window cache.
+    - cache_max_bytes (int): Size limit of the window cache.
+    - metrics_info (dict): The metrics to fetch.
+    - scheduler_options (dict): Request scheduler settings of each worker (see RequestScheduler).
+    - parquet_options (dict): Parquet writer options (see utils.file.parquet_options).
+    - fetch_assets (bool): Whether to fetch the pod startup times of each target.
+
+    Returns:
+    - pd.DataFrame: The per-target summary.
+    """
+    try:
+        credentials_blob = pickle.dumps(get_credentials())
+    except Exception as e:
+        click.echo(f"Credentials cannot be shared with worker processes ({e}); each worker will authenticate.")
+        credentials_blob = None
+
+    options = {
+        'run_dir': str(run_dir),
+        'start_time': start_time,
+        'end_time': end_time,
+        'format': format,
+        'max_workers': max_workers,
+        'shard_duration': shard_duration,
+        'use_cache': use_cache,
+        'cache_max_bytes': cache_max_bytes,
+        'metrics_info': metrics_info,
+        'parquet_options': parquet_options,
+        'fetch_assets': fetch_assets
+    }
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=max(1, max_processes), initializer=_init_worker, initargs=(credentials_blob, scheduler_options or {})) as executor:
+        futures = {executor.submit(export_target, target, options): target for target in targets}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                target = futures[future]
+                summary = {
+                    'target': target_id(target),
+                    'project_id': target['project_id'],
+                    'location': target['location'],
+                    'cluster_name': target['cluster_name'],
+                    'status': 'failed',
+                    'metrics': 0,
+                    'rows': 0,
+                    'seconds': 0.0,
+                    'api_calls': 0,
+                    'retries': 0,
+                    'throttled': 0,
+                    'error': str(e)
+                }
+            click.echo(f"[{summary['status']}] {summary['target']} ({summary['rows']} rows, {summary['seconds']}s) {summary['error']}".rstrip())
+            summaries.append(summary)
+
+    if use_cache:
+        WindowCache(max_bytes=cache_max_bytes).evict()
+
+    combine_target_outputs(run_dir, format, prefix, list(metrics_info) + (['pod_startup'] if fetch_assets else []), parquet_options)
+
+    summary_df = pd.DataFrame(summaries, columns=SUMMARY_COLUMNS).sort_values('target').reset_index(drop=True)
+    summary_path = run_dir / f"{prefix}_fleet_summary.csv"
+    summary_df.to_csv(summary_path, index=False)
+    click.echo(f"Saved fleet summary to {summary_path}")
+    return summary_df
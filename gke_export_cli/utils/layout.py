@@ -0,0 +1,173 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from utils.decode import LABEL_COLUMNS
+
+# Integer key joining the points tables to the series table
+SERIES_ID_COLUMN = "series_id"
+
+# Name of the series dimension table in a normalized export
+SERIES_TABLE = "series"
+
+# Suffix of the points fact table of each metric in a normalized export
+POINTS_SUFFIX = "_points"
+
+# Timestamp columns parsed back into timestamps when a CSV export is loaded
+TIMESTAMP_COLUMNS = ["interval.startTime", "interval.endTime", "valid_from", "valid_to"]
+
+
+class SeriesRegistry:
+    """
+    Assigns an integer id to every unique set of series labels (see LABEL_COLUMNS).
+
+    One registry is shared by all metrics of an export, so the series table holds each
+    label set once. Ids are assigned in order of first appearance and are thread safe.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def assign(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Returns the series id of each row of `df`, registering new label sets.
+        """
+        labels = df.reindex(columns=LABEL_COLUMNS)
+        # Label sets are looked up once per distinct set, not once per point
+        local_codes = labels.groupby(LABEL_COLUMNS, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+        uniques = labels.drop_duplicates()
+
+        local_ids = np.empty(len(uniques), dtype=np.int32)
+        with self._lock:
+            for position, row in enumerate(uniques.itertuples(index=False, name=None)):
+                key = tuple(None if pd.isna(value) else str(value) for value in row)
+                if key not in self._ids:
+                    self._ids[key] = len(self._rows)
+                    self._rows.append(key)
+                local_ids[position] = self._ids[key]
+
+        return local_ids[local_codes]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the series dimension table: the series id and the label columns of each series.
+        """
+        with self._lock:
+            series = pd.DataFrame(self._rows, columns=LABEL_COLUMNS, dtype=object)
+        series.insert(0, SERIES_ID_COLUMN, np.arange(len(series), dtype=np.int32))
+        return series
+
+
+def normalize_points(df: pd.DataFrame, registry: SeriesRegistry) -> pd.DataFrame:
+    """
+    Replaces the label columns of a metric DataFrame with a series id.
+
+    Parameters:
+    - df (pd.DataFrame): Points with the label columns, as returned by fetch_all_metrics.
+    - registry (SeriesRegistry): The registry assigning the series ids.
+
+    Returns:
+    - pd.DataFrame: The series id followed by the interval and value columns.
+    """
+    points = df.drop(columns=[column for column in LABEL_COLUMNS if column in df.columns])
+    points.insert(0, SERIES_ID_COLUMN, registry.assign(df))
+    return points
+
+
+def is_time_series(df) -> bool:
+    """
+    Returns True if `df` holds metric points or change-point intervals that can be normalized.
+    """
+    return isinstance(df, pd.DataFrame) and not df.empty and 'metric.type' in df.columns
+
+
+def normalize_metrics(metrics_data: dict, registry: SeriesRegistry = None) -> dict:
+    """
+    Converts the metric DataFrames of an export to the normalized layout.
+
+    Each metric becomes a '<metric>_points' table and a shared 'series' table is added
+    if any series were registered.
+    Other entries (e.g., pod_startup) and files already written by a streaming writer
+    are returned unchanged.
+
+    Parameters:
+    - metrics_data (dict): The DataFrames returned by fetch_all_metrics.
+    - registry (SeriesRegistry): The registry to use, e.g. the one shared with the
+      NormalizingWriter of a streamed export. A new one is used if not given.
+
+    Returns:
+    - dict: The tables to save with save_dataframes.
+    """
+    registry = registry or SeriesRegistry()
+    normalized = {}
+    for key, df in metrics_data.items():
+        if is_time_series(df):
+            normalized[f"{key}{POINTS_SUFFIX}"] = normalize_points(df, registry)
+        else:
+            normalized[key] = df
+    series = registry.to_frame()
+    if not series.empty:
+        normalized[SERIES_TABLE] = series
+    return normalized
+
+
+class NormalizingWriter:
+    """
+    Wraps a StreamingWriter so streamed pages are written as points tables.
+    """
+
+    def __init__(self, writer, registry: SeriesRegistry):
+        self.writer = writer
+        self.registry = registry
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        self.writer.write(normalize_points(df, self.registry))
+
+    def close(self):
+        return self.writer.close()
+
+
+def _read_table(file_path: Path) -> pd.DataFrame:
+    if file_path.suffix == '.csv':
+        df = pd.read_csv(file_path, dtype={column: object for column in LABEL_COLUMNS})
+        for column in TIMESTAMP_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], utc=True).astype('datetime64[ns, UTC]')
+        return df
+    return pd.read_parquet(file_path)
+
+
+def load_wide(output_dir: Path, prefix: str, metric_name: str, format: str = 'parquet') -> pd.DataFrame:
+    """
+    Rebuilds the wide view of one metric from a normalized export.
+
+    Parameters:
+    - output_dir (Path): Directory holding the export.
+    - prefix (str): The unique prefix of the export files.
+    - metric_name (str): The metric key (e.g., 'cpu_usage').
+    - format (str): File format of the export, either 'csv' or 'parquet'.
+
+    Returns:
+    - pd.DataFrame: The points with categorical label columns, as fetch_all_metrics returns them.
+    """
+    output_dir = Path(output_dir)
+    series = _read_table(output_dir / f"{prefix}_{SERIES_TABLE}.{format}")
+    points = _read_table(output_dir / f"{prefix}_{metric_name}{POINTS_SUFFIX}.{format}")
+
+    # Series ids are mapped to row positions of the series table, which index the label categories
+    positions = pd.Series(np.arange(len(series)), index=series[SERIES_ID_COLUMN])
+    codes = positions.reindex(points[SERIES_ID_COLUMN]).to_numpy()
+    if np.isnan(codes).any():
+        raise ValueError(f"{metric_name} points reference series missing from the series table")
+    codes = codes.astype(np.int64)
+
+    wide = points.drop(columns=[SERIES_ID_COLUMN])
+    for column in LABEL_COLUMNS:
+        label_codes, categories = pd.factorize(series[column], use_na_sentinel=True)
+        wide[column] = pd.Categorical.from_codes(label_codes[codes], categories=categories)
+    return wide
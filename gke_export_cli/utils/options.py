@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+# Defaults and choices of the command line options. This module must not import heavy
+# dependencies (pandas, numpy, pyarrow, Google API clients): cli.py and fleet.py import it
+# at startup so that --help and argument validation stay fast.
+
+# Default number of metric/asset fetches run in parallel
+DEFAULT_MAX_WORKERS = 5
+
+# Default alignment period of timeSeries.list queries
+ALIGNMENT_PERIOD = timedelta(seconds=60)
+
+# Default upper bound for the total size of cached data
+DEFAULT_CACHE_MAX_BYTES = 1024 ** 3
+
+# Default number of targets exported in parallel
+DEFAULT_MAX_PROCESSES = 4
+
+# Parquet compression codecs offered by --parquet-compression
+PARQUET_CODECS = ['zstd', 'snappy', 'gzip', 'brotli', 'lz4', 'none']
+
+DEFAULT_PARQUET_CODEC = 'zstd'
+
+# Statistics that can be requested, with the quantile used when computed locally (None for mean)
+STATISTICS = {
+    "mean": None,
+    "max": 1.0,
+    "p50": 0.5,
+    "p90": 0.9,
+    "p95": 0.95,
+    "p99": 0.99
+}
+
+GRANULARITIES = ["pod", "container"]
+
+# HTTP transports offered by --http-transport: googleapiclient on threads, or httpx on an event loop
+HTTP_TRANSPORTS = ["sync", "async"]
+
+
+def parse_statistics(value: str) -> list:
+    """
+    Parses a comma separated list of statistics (e.g., 'p95,max').
+
+    Raises:
+    - ValueError: If a statistic is unknown.
+    """
+    statistics = [item.strip().lower() for item in (value or '').split(',') if item.strip()]
+    unknown = [item for item in statistics if item not in STATISTICS]
+    if unknown or not statistics:
+        raise ValueError(f"Unknown statistic(s): {', '.join(unknown) or '(none)'}. Use: {', '.join(STATISTICS)}")
+    return list(dict.fromkeys(statistics))
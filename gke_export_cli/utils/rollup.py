@@ -0,0 +1,167 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from utils.decode import LABEL_COLUMNS
+from utils.encoding import VALUE_COLUMNS, expand_change_points
+
+# Percentiles computed for each series and bucket, as (column, quantile)
+ROLLUP_PERCENTILES = [("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99)]
+
+# Time buckets of the rollup, as (bucket name, pandas frequency); None covers the whole window
+ROLLUP_BUCKETS = [("hour", "h"), ("day", "D"), ("window", None)]
+
+# Usage metrics and the request metric they are compared with
+REQUEST_METRICS = {
+    "cpu_usage": "cpu_request",
+    "memory_usage": "memory_request"
+}
+
+# Labels identifying a series in the rollup; the metric is identified by its key instead of metric.type
+SERIES_COLUMNS = [column for column in LABEL_COLUMNS if column != 'metric.type']
+
+SUMMARY_NAME = "summary"
+
+
+def load_points(data) -> pd.DataFrame:
+    """
+    Returns the points of a metric, reading files written by a StreamingWriter and
+    expanding change-point intervals.
+    """
+    if isinstance(data, Path):
+        if data.suffix == '.csv':
+            data = pd.read_csv(data, dtype={column: object for column in LABEL_COLUMNS})
+            for column in ['interval.startTime', 'interval.endTime', 'valid_from', 'valid_to']:
+                if column in data.columns:
+                    data[column] = pd.to_datetime(data[column], utc=True).astype('datetime64[ns, UTC]')
+        else:
+            data = pd.read_parquet(data)
+    if 'valid_from' in data.columns:
+        data = expand_change_points(data)
+    return data
+
+
+def point_values(df: pd.DataFrame) -> np.ndarray:
+    values = np.full(len(df), np.nan)
+    for column in VALUE_COLUMNS:
+        if column in df.columns:
+            column_values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = np.where(np.isnan(values), column_values, values)
+    return values
+
+
+def rollup_metric(df: pd.DataFrame, start_time: str = None) -> pd.DataFrame:
+    """
+    Computes the rollup statistics of one metric per series and time bucket. Points are
+    assigned to the hour and day their alignment period falls in, i.e. (start, end].
+
+    Parameters:
+    - df (pd.DataFrame): The points of the metric.
+    - start_time (str): Start of the exported time range, used as the bucket start of the
+      whole window. Defaults to the first point.
+
+    Returns:
+    - pd.DataFrame: One row per bucket and series with the point count, mean, percentiles and max.
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    end_times = df['interval.endTime']
+    # A point covers the alignment period ending at its end time, so a point ending on a
+    # bucket boundary belongs to the bucket before it
+    covered_times = end_times - pd.Timedelta(1, 'ns')
+    values = point_values(df)
+    series = df.reindex(columns=SERIES_COLUMNS)
+    series_codes = series.groupby(SERIES_COLUMNS, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    series_labels = series.astype(object).drop_duplicates().reset_index(drop=True)
+
+    frames = []
+    for bucket, frequency in ROLLUP_BUCKETS:
+        if frequency:
+            bucket_starts = covered_times.dt.floor(frequency)
+        else:
+            window_start = pd.Timestamp(start_time) if start_time else end_times.min()
+            bucket_starts = pd.Series(window_start, index=df.index).astype(end_times.dtype)
+
+        bucket_codes, bucket_values = pd.factorize(bucket_starts)
+        codes, group_keys = pd.factorize(series_codes * len(bucket_values) + bucket_codes)
+
+        # One grouped pass per statistic over all series and buckets at once
+        grouped = pd.Series(values).groupby(codes, sort=True)
+        statistics = grouped.agg(['count', 'mean', 'max'])
+        percentiles = grouped.quantile([quantile for _, quantile in ROLLUP_PERCENTILES]).unstack()
+
+        rollup = series_labels.take(group_keys // len(bucket_values)).reset_index(drop=True)
+        rollup.insert(0, 'bucket_start', bucket_values.take(group_keys % len(bucket_values)))
+        rollup.insert(0, 'bucket', bucket)
+        rollup['points'] = statistics['count'].to_numpy()
+        rollup['mean'] = statistics['mean'].to_numpy()
+        for column, quantile in ROLLUP_PERCENTILES:
+            rollup[column] = percentiles[quantile].to_numpy()
+        rollup['max'] = statistics['max'].to_numpy()
+        frames.append(rollup.sort_values(SERIES_COLUMNS + ['bucket_start'], kind='stable', na_position='last'))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def rollup_metrics(metrics_data: dict, start_time: str = None) -> pd.DataFrame:
+    """
+    Computes the rightsizing summary of an export.
+
+    Every metric is rolled up per series and per hour, day and whole window (see
+    rollup_metric). Usage metrics also get the largest request of the same container in
+    the bucket (see REQUEST_METRICS), in a 'request' column.
+
+    Parameters:
+    - metrics_data (dict): The DataFrames returned by fetch_all_metrics (or the files
+      written when streaming).
+    - start_time (str): Start of the exported time range in RFC3339 format.
+
+    Returns:
+    - pd.DataFrame: The summary, with a 'metric' column holding the metric key.
+    """
+    rollups = {}
+    for key, data in metrics_data.items():
+        if isinstance(data, pd.DataFrame) and 'metric.type' not in data.columns:
+            continue
+        if isinstance(data, Path) and not data.exists():
+            continue
+        rollup = rollup_metric(load_points(data), start_time)
+        if not rollup.empty:
+            rollup.insert(0, 'metric', key)
+            rollups[key] = rollup
+
+    frames = []
+    join_columns = ['bucket', 'bucket_start'] + SERIES_COLUMNS
+    for key, rollup in rollups.items():
+        request_key = REQUEST_METRICS.get(key)
+        if request_key in rollups:
+            requests = rollups[request_key][join_columns + ['max']].rename(columns={'max': 'request'})
+            rollup = rollup.merge(requests, on=join_columns, how='left')
+        frames.append(rollup)
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def add_summary(metrics_data: dict, start_time: str = None, summary_only: bool = False) -> dict:
+    """
+    Adds the rightsizing summary (see rollup_metrics) to the DataFrames of an export.
+
+    Parameters:
+    - metrics_data (dict): The DataFrames returned by fetch_all_metrics.
+    - start_time (str): Start of the exported time range in RFC3339 format.
+    - summary_only (bool): If True, the metric points are left out and only the summary
+      and the other entries (e.g., pod_startup) are kept.
+
+    Returns:
+    - dict: The DataFrames to save, with the summary under SUMMARY_NAME.
+    """
+    summary = rollup_metrics(metrics_data, start_time)
+    if summary_only:
+        metrics_data = {
+            key: data for key, data in metrics_data.items()
+            if isinstance(data, pd.DataFrame) and 'metric.type' not in data.columns
+        }
+    return {**metrics_data, SUMMARY_NAME: summary}
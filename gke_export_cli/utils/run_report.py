@@ -0,0 +1,271 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Interval between two resident memory samples, in seconds
+RSS_SAMPLE_INTERVAL = 0.01
+
+# Interval between two stack samples of the sampling profiler, in seconds
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+# Number of functions listed in the profile section of the run report
+PROFILE_TOP_FUNCTIONS = 25
+
+RUN_REPORT_SUFFIX = "_run_report.json"
+PROFILE_SUFFIX = "_profile.folded"
+
+
+def current_rss() -> int:
+    """
+    Returns the resident memory of the process in bytes.
+
+    Without /proc (e.g., on macOS) the peak resident memory of the process is returned
+    instead, and 0 where neither is available (e.g., on Windows).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        pass
+    try:
+        # POSIX only, so imported here to keep the tool starting on Windows
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakRss:
+    """
+    Samples the resident memory of the process on a background thread while the block runs.
+    The highest sample is available as `peak`.
+    """
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all threads at a fixed interval.
+
+    Unlike cProfile, which only follows the thread that enabled it, this covers the fetch,
+    decode and write work running on thread pools. Samples are kept as folded stacks
+    ('outer;inner count' lines), the input format of flame graph tools such as speedscope.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = Counter()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._done.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_folded(self, file_path: Path):
+        with open(file_path, 'w') as file:
+            for stack, count in self._stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit: int = PROFILE_TOP_FUNCTIONS) -> list:
+        """
+        Returns the functions with the most samples, with their own ('self') samples and
+        the samples of the stacks they are part of ('total').
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for function in set(frames):
+                total[function] += count
+        return [
+            {'function': function, 'self_samples': own[function], 'total_samples': count}
+            for function, count in total.most_common(limit)
+        ]
+
+
+class RunReport:
+    """
+    Collects the instrumentation of one export.
+
+    Phases are the sequential steps of the export (fetch, save, archive, ...); each records
+    its wall time and the peak resident memory while it ran. Operations are the work done
+    inside the phases, often on several threads at once (API calls, decoding, writing);
+    each records its count, the seconds summed over all threads, and counters such as
+    rows and bytes.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._phases = {}
+        self._operations = {}
+        self._lock = threading.Lock()
+        self.profiler = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Times a phase of the export and samples the peak memory while it runs. A phase
+        entered several times (e.g., once per resolution tier) is summed.
+        """
+        started = time.perf_counter()
+        rss = PeakRss()
+        try:
+            with rss:
+                yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                phase = self._phases.setdefault(name, {'count': 0, 'seconds': 0.0, 'peak_rss_bytes': 0})
+                phase['count'] += 1
+                phase['seconds'] += seconds
+                phase['peak_rss_bytes'] = max(phase['peak_rss_bytes'], rss.peak)
+
+    def record(self, name: str, seconds: float = 0.0, **counters):
+        """
+        Adds one occurrence of an operation, its duration and counters (e.g., rows=10).
+        """
+        with self._lock:
+            operation = self._operations.setdefault(name, {'count': 0, 'seconds': 0.0})
+            operation['count'] += 1
+            operation['seconds'] += seconds
+            for counter, value in counters.items():
+                operation[counter] = operation.get(counter, 0) + value
+
+    @contextmanager
+    def operation(self, name: str, **counters):
+        """
+        Times the block as one occurrence of an operation. The block can add counters to
+        the yielded dictionary.
+        """
+        counters = dict(counters)
+        started = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            self.record(name, time.perf_counter() - started, **counters)
+
+    def to_dict(self, **extra) -> dict:
+        """
+        Returns the report as a JSON serializable dictionary, with `extra` entries added.
+        """
+        with self._lock:
+            phases = {name: dict(values) for name, values in self._phases.items()}
+            operations = {name: dict(values) for name, values in self._operations.items()}
+        for values in list(phases.values()) + list(operations.values()):
+            values['seconds'] = round(values['seconds'], 4)
+
+        report = {
+            'started_at': self.started_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'seconds': round(time.perf_counter() - self._started, 4),
+            'peak_rss_bytes': max([current_rss()] + [phase['peak_rss_bytes'] for phase in phases.values()]),
+            'phases': phases,
+            'operations': operations,
+            **extra
+        }
+        if self.profiler is not None:
+            report['profile'] = {
+                'samples': self.profiler.samples,
+                'interval_seconds': self.profiler.interval,
+                'top_functions': self.profiler.top_functions()
+            }
+        return report
+
+    def write(self, file_path: Path, **extra) -> Path:
+        """
+        Writes the report (see to_dict) to `file_path` as JSON, and the folded profile
+        stacks next to it if profiling.
+        """
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler.write_folded(Path(file_path).with_name(Path(file_path).name.replace(RUN_REPORT_SUFFIX, PROFILE_SUFFIX)))
+        with open(file_path, 'w') as file:
+            json.dump(self.to_dict(**extra), file, indent=2, default=str)
+        return Path(file_path)
+
+
+_report = RunReport()
+
+
+def get_run_report() -> RunReport:
+    """
+    Returns the run report of the process.
+    """
+    return _report
+
+
+def start_run_report(profile: bool = False) -> RunReport:
+    """
+    Starts a new run report for the process, optionally with the sampling profiler running.
+    """
+    global _report
+    _report = RunReport()
+    if profile:
+        _report.profiler = SamplingProfiler().start()
+    return _report
+
+
+def record(name: str, seconds: float = 0.0, **counters):
+    """
+    Adds one occurrence of an operation to the run report of the process (see RunReport.record).
+    """
+    _report.record(name, seconds, **counters)
+
+
+def operation(name: str, **counters):
+    """
+    Times the block as an operation of the run report of the process (see RunReport.operation).
+    """
+    return _report.operation(name, **counters)
+
+
+def phase(name: str):
+    """
+    Times the block as a phase of the run report of the process (see RunReport.phase).
+    """
+    return _report.phase(name)
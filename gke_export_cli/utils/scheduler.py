@@ -0,0 +1,438 @@
+import asyncio
+import random
+import socket
+import threading
+import time
+from collections import deque
+
+import click
+import httplib2
+from googleapiclient.errors import HttpError
+
+# Default request rates per API, in requests per second
+DEFAULT_RATE_LIMITS = {
+    "monitoring": 50.0,
+    "cloudasset": 5.0,
+    "container": 10.0
+}
+
+# Rate used for APIs without an entry in the rate limits
+FALLBACK_RATE_LIMIT = 10.0
+
+# HTTP statuses that signal throttling or a transient server error and are retried
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Statuses that mean the server asked us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_INITIAL_CONCURRENCY = 8
+DEFAULT_MAX_CONCURRENCY = 64
+
+# Concurrency of the async calls of each API. A waiting async call costs a coroutine
+# instead of a thread, so far more of them can be in flight than with the thread pool.
+DEFAULT_INITIAL_ASYNC_CONCURRENCY = 32
+DEFAULT_MAX_ASYNC_CONCURRENCY = 512
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` requests per second with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        Takes one token if one is available.
+
+        Returns:
+        - float: 0.0 if a token was taken, otherwise the seconds until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> float:
+        """
+        Takes one token, waiting until one is available.
+
+        Returns:
+        - float: The number of seconds waited.
+        """
+        waited = 0.0
+        while (delay := self.try_acquire()) > 0:
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def acquire_async(self) -> float:
+        """
+        Takes one token like acquire, without blocking the event loop.
+        """
+        waited = 0.0
+        while (delay := self.try_acquire()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted with additive increase / multiplicative decrease (AIMD).
+
+    The limit grows by about one slot per `limit` successful calls and is halved when the
+    API throttles. Concurrent requests throttled by the same congestion event halve it only
+    once: throttles of requests sent before the last decrease are ignored.
+    """
+
+    def __init__(self, initial: int = DEFAULT_INITIAL_CONCURRENCY, maximum: int = DEFAULT_MAX_CONCURRENCY, minimum: int = 1):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial)
+        self._in_flight = 0
+        self._decreased_at = float('-inf')
+        self._condition = threading.Condition()
+        # (event loop, future) of each coroutine waiting in acquire_async, oldest first
+        self._async_waiters = deque()
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a slot if one is free, without waiting.
+        """
+        with self._condition:
+            if self._in_flight >= int(self.limit):
+                return False
+            self._in_flight += 1
+            return True
+
+    async def acquire_async(self):
+        """
+        Takes a slot like acquire, without blocking the event loop. Waiting coroutines are
+        woken by release and on_success, from any thread, as slots become free.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._in_flight < int(self.limit):
+                    self._in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def _wake_async_waiters(self):
+        # Called with the condition held: wakes one waiting coroutine per free slot
+        free = int(self.limit) - self._in_flight
+        while free > 0 and self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            if waiter.cancelled():
+                continue
+            loop.call_soon_threadsafe(self._resolve, waiter)
+            free -= 1
+
+    def _resolve(self, waiter):
+        # Runs on the waiter's event loop
+        if waiter.done():
+            # Cancelled after it was picked, so the free slot goes to the next waiter
+            with self._condition:
+                self._wake_async_waiters()
+        else:
+            waiter.set_result(None)
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+    def on_success(self):
+        with self._condition:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+    def on_throttle(self, started: float = None) -> bool:
+        """
+        Halves the limit after a throttled request, unless the request was sent before the
+        last decrease and is therefore already accounted for.
+
+        Parameters:
+        - started (float): time.perf_counter() when the throttled request was sent. Defaults
+          to now, which always halves the limit.
+
+        Returns:
+        - bool: Whether the limit was decreased.
+        """
+        now = time.perf_counter()
+        with self._condition:
+            if (now if started is None else started) < self._decreased_at:
+                return False
+            self.limit = max(self.minimum, self.limit / 2)
+            self._decreased_at = now
+            return True
+
+
+class RequestScheduler:
+    """
+    Central gate for Google API calls with per-API rate limiting, adaptive concurrency and retries.
+
+    Calls through execute and execute_async share the rate limit of their API but have
+    separate concurrency limits, since async calls are not bounded by a thread pool.
+    Calls are retried with exponential backoff and full jitter on throttling, transient server
+    errors and connection errors, honouring Retry-After when the server sends it. Counters
+    of calls, retries, throttling and wasted calls are kept per API (see `stats`).
+    """
+
+    def __init__(self, rate_limits: dict = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 initial_async_concurrency: int = DEFAULT_INITIAL_ASYNC_CONCURRENCY,
+                 max_async_concurrency: int = DEFAULT_MAX_ASYNC_CONCURRENCY):
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.initial_async_concurrency = initial_async_concurrency
+        self.max_async_concurrency = max_async_concurrency
+        self._apis = {}
+        self._lock = threading.Lock()
+
+    def _api_state(self, api: str) -> dict:
+        with self._lock:
+            if api not in self._apis:
+                self._apis[api] = {
+                    'bucket': TokenBucket(self.rate_limits.get(api, FALLBACK_RATE_LIMIT)),
+                    'limiter': AdaptiveLimiter(self.initial_concurrency, self.max_concurrency),
+                    'async_limiter': AdaptiveLimiter(
+                        min(self.initial_async_concurrency, self.max_async_concurrency), self.max_async_concurrency
+                    ),
+                    'stats': {
+                        'calls': 0,
+                        'succeeded': 0,
+                        'retries': 0,
+                        'throttled': 0,
+                        'failed': 0,
+                        'wasted_calls': 0,
+                        'rate_wait_seconds': 0.0,
+                        'backoff_seconds': 0.0,
+                        'request_seconds': 0.0
+                    }
+                }
+            return self._apis[api]
+
+    def _count(self, state: dict, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                state['stats'][name] += value
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        if isinstance(error, HttpError):
+            retry_after = error.resp.get('retry-after')
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _on_error(self, state: dict, limiter: AdaptiveLimiter, error: Exception, attempt: int, started: float):
+        """
+        Counts a failed call.
+
+        Returns:
+        - float: The delay before the next attempt, or None if the error must be raised.
+        """
+        self._count(state, request_seconds=time.perf_counter() - started)
+        throttled = isinstance(error, HttpError) and error.resp.status in THROTTLE_STATUSES
+        retryable = throttled or (isinstance(error, HttpError) and error.resp.status in RETRYABLE_STATUSES) or \
+            isinstance(error, (ConnectionError, socket.timeout, httplib2.HttpLib2Error))
+        self._count(state, wasted_calls=1, throttled=int(throttled))
+        if throttled:
+            limiter.on_throttle(started)
+        if not retryable or attempt >= self.max_retries:
+            self._count(state, failed=1)
+            return None
+
+        delay = self._backoff_delay(attempt, error)
+        self._count(state, retries=1, backoff_seconds=delay)
+        return delay
+
+    def _on_success(self, state: dict, limiter: AdaptiveLimiter, started: float):
+        self._count(state, succeeded=1, request_seconds=time.perf_counter() - started)
+        limiter.on_success()
+
+    def execute(self, api: str, request):
+        """
+        Executes a googleapiclient request through the scheduler.
+
+        Parameters:
+        - api (str): The API name used for rate limiting and statistics (e.g., 'monitoring').
+        - request (googleapiclient.http.HttpRequest): The request to execute.
+
+        Returns:
+        - dict: The response.
+
+        Raises:
+        - HttpError: If the request fails with a non-retryable status or retries are exhausted.
+        """
+        state = self._api_state(api)
+        attempt = 0
+        while True:
+            waited = state['bucket'].acquire()
+            state['limiter'].acquire()
+            started = time.perf_counter()
+            try:
+                self._count(state, calls=1, rate_wait_seconds=waited)
+                response = request.execute(num_retries=0)
+            except Exception as e:
+                delay = self._on_error(state, state['limiter'], e, attempt, started)
+                if delay is None:
+                    raise
+            else:
+                self._on_success(state, state['limiter'], started)
+                return response
+            finally:
+                state['limiter'].release()
+
+            time.sleep(delay)
+            attempt += 1
+
+    async def execute_async(self, api: str, send):
+        """
+        Runs an async API call through the scheduler, with the same rate limit, retries and
+        counters as execute, and the async concurrency limit of the API.
+
+        Parameters:
+        - api (str): The API name used for rate limiting and statistics (e.g., 'monitoring').
+        - send (callable): Called without arguments for each attempt; returns an awaitable
+          of the response. Errors are classified as in execute (HttpError, ConnectionError).
+
+        Returns:
+        - dict: The response.
+        """
+        state = self._api_state(api)
+        attempt = 0
+        while True:
+            waited = await state['bucket'].acquire_async()
+            await state['async_limiter'].acquire_async()
+            started = time.perf_counter()
+            try:
+                self._count(state, calls=1, rate_wait_seconds=waited)
+                response = await send()
+            except Exception as e:
+                delay = self._on_error(state, state['async_limiter'], e, attempt, started)
+                if delay is None:
+                    raise
+            else:
+                self._on_success(state, state['async_limiter'], started)
+                return response
+            finally:
+                state['async_limiter'].release()
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the counters per API, including the current concurrency limits.
+        """
+        with self._lock:
+            return {
+                api: {
+                    **state['stats'],
+                    'concurrency_limit': round(state['limiter'].limit, 2),
+                    'async_concurrency_limit': round(state['async_limiter'].limit, 2)
+                }
+                for api, state in self._apis.items()
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    Returns the request scheduler shared by the process.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def configure_scheduler(**options) -> RequestScheduler:
+    """
+    Replaces the shared request scheduler with one built from `options` (see RequestScheduler).
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = RequestScheduler(**options)
+        return _scheduler
+
+
+def scheduler_options_from_config(config: dict) -> dict:
+    """
+    Returns the RequestScheduler options set in the configuration file.
+
+    The 'rate_limits' key maps API names to requests per second; 'max_retries' sets the
+    number of retries per call and 'max_async_concurrency' the ceiling of the async calls
+    in flight per API.
+    """
+    options = {}
+    if config.get('rate_limits'):
+        options['rate_limits'] = {api: float(rate) for api, rate in config['rate_limits'].items()}
+    if config.get('max_retries') is not None:
+        options['max_retries'] = int(config['max_retries'])
+    if config.get('max_async_concurrency') is not None:
+        options['max_async_concurrency'] = int(config['max_async_concurrency'])
+    return options
+
+
+def report_stats():
+    """
+    Prints the request scheduler counters of each API used so far.
+    """
+    for api, stats in get_scheduler().stats().items():
+        click.echo(
+            f"{api} API: {stats['calls']} calls, {stats['retries']} retries, {stats['throttled']} throttled, "
+            f"{stats['wasted_calls']} wasted, {stats['failed']} failed, "
+            f"{stats['rate_wait_seconds'] + stats['backoff_seconds']:.1f}s waiting, concurrency limit {stats['concurrency_limit']} (async {stats['async_concurrency_limit']})"
+        )
+
+
+def execute(api: str, request):
+    """
+    Executes a googleapiclient request through the shared request scheduler.
+    """
+    return get_scheduler().execute(api, request)
+
+
+async def execute_async(api: str, send):
+    """
+    Runs an async API call through the shared request scheduler (see RequestScheduler.execute_async).
+    """
+    return await get_scheduler().execute_async(api, send)
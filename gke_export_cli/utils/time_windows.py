@@ -0,0 +1,189 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+# Units accepted by parse_duration, e.g. '90s', '15m', '6h', '1d', '1w'
+DURATION_UNITS = {
+    's': 'seconds',
+    'm': 'minutes',
+    'h': 'hours',
+    'd': 'days',
+    'w': 'weeks'
+}
+
+_DURATION_PATTERN = re.compile(r'^\s*(\d+)\s*([smhdw])\s*$', re.IGNORECASE)
+
+# Default point budget per series in adaptive mode (one day of 60s points)
+DEFAULT_MAX_POINTS_PER_SERIES = 1440
+
+# Alignment periods chosen from in adaptive mode, shortest first
+ALIGNMENT_PERIOD_CHOICES = [
+    timedelta(minutes=1), timedelta(minutes=2), timedelta(minutes=5), timedelta(minutes=10),
+    timedelta(minutes=15), timedelta(minutes=30), timedelta(hours=1), timedelta(hours=2),
+    timedelta(hours=6), timedelta(hours=12), timedelta(days=1)
+]
+
+
+def parse_duration(value: str) -> timedelta:
+    """
+    Parses a duration string such as '60s', '6h' or '1d'.
+
+    Parameters:
+    - value (str): The duration string.
+
+    Returns:
+    - timedelta: The parsed duration.
+
+    Raises:
+    - ValueError: If the string is not a positive duration.
+    """
+    match = _DURATION_PATTERN.match(value or '')
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid duration '{value}'. Use a positive number followed by one of: {', '.join(DURATION_UNITS)}")
+    return timedelta(**{DURATION_UNITS[match.group(2).lower()]: int(match.group(1))})
+
+
+def format_duration(value: timedelta) -> str:
+    """
+    Formats a duration in the largest unit that divides it exactly (e.g., '5m', '1h', '90s').
+    """
+    seconds = int(value.total_seconds())
+    for unit, size in (('w', 604800), ('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+def parse_rfc3339(value: str) -> datetime:
+    """
+    Parses an RFC3339 timestamp (e.g., '2024-08-22T15:10:00Z') into a timezone-aware UTC datetime.
+    """
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00').replace('z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def format_rfc3339(value: datetime) -> str:
+    """
+    Formats a datetime as an RFC3339 UTC timestamp (e.g., '2024-08-22T15:10:00Z').
+    """
+    value = value.astimezone(timezone.utc)
+    if value.microsecond:
+        return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def split_time_range(start_time: str, end_time: str, shard_duration: timedelta, alignment_period: timedelta) -> list:
+    """
+    Splits a time range into consecutive sub-windows of at most `shard_duration`.
+
+    Window boundaries are laid out backwards from `end_time` in whole multiples of the
+    alignment period, so every boundary falls on an alignment point of the full query.
+
+    Parameters:
+    - start_time (str): Start of the range in RFC3339 format.
+    - end_time (str): End of the range in RFC3339 format.
+    - shard_duration (timedelta): The maximum length of a sub-window.
+    - alignment_period (timedelta): The alignment period of the query.
+
+    Returns:
+    - list: (start_time, end_time) RFC3339 string pairs, oldest window first.
+    """
+    start = parse_rfc3339(start_time)
+    end = parse_rfc3339(end_time)
+
+    # Round the shard length up to a whole number of alignment periods
+    periods = max(1, -(-shard_duration // alignment_period))
+    step = alignment_period * periods
+
+    windows = []
+    window_end = end
+    while window_end > start:
+        window_start = max(start, window_end - step)
+        windows.append((
+            start_time if window_start == start else format_rfc3339(window_start),
+            end_time if window_end == end else format_rfc3339(window_end)
+        ))
+        window_end = window_start
+
+    windows.reverse()
+    return windows or [(start_time, end_time)]
+
+
+def choose_alignment_period(start_time: str, end_time: str, max_points_per_series: int) -> timedelta:
+    """
+    Returns the shortest alignment period of ALIGNMENT_PERIOD_CHOICES that keeps every series
+    of the time range within `max_points_per_series` points.
+
+    The longest choice is returned if none fits the budget.
+    """
+    duration = parse_rfc3339(end_time) - parse_rfc3339(start_time)
+    for period in ALIGNMENT_PERIOD_CHOICES:
+        if duration // period + 1 <= max_points_per_series:
+            return period
+    return ALIGNMENT_PERIOD_CHOICES[-1]
+
+
+def parse_resolution_tiers(value: str) -> list:
+    """
+    Parses a multi-resolution specification such as '1m:1d,5m:7d,1h'.
+
+    Each comma separated tier is PERIOD:AGE, newest tier first: the tier fetches the data
+    younger than AGE (and older than the previous tier's AGE) with alignment period PERIOD.
+    The AGE of the last tier may be left out; the last tier always extends to the start
+    of the time range.
+
+    Returns:
+    - list: (alignment period, age) timedelta pairs, the age of the last tier being None.
+
+    Raises:
+    - ValueError: If the specification is invalid.
+    """
+    tiers = []
+    for part in (value or '').split(','):
+        period, _, age = part.strip().partition(':')
+        tiers.append((parse_duration(period), parse_duration(age) if age.strip() else None))
+    if not tiers:
+        raise ValueError("Specify at least one tier")
+
+    previous_age = timedelta(0)
+    for index, (period, age) in enumerate(tiers):
+        if age is None and index < len(tiers) - 1:
+            raise ValueError(f"Tier {index + 1} needs an age (PERIOD:AGE); only the last tier may omit it")
+        if age is not None and age <= previous_age:
+            raise ValueError("Tier ages must increase from the newest to the oldest tier")
+        previous_age = age or previous_age
+        if index and period <= tiers[index - 1][0]:
+            raise ValueError("Tier periods must grow from the newest to the oldest tier")
+
+    tiers[-1] = (tiers[-1][0], None)
+    return tiers
+
+
+def split_resolution_tiers(start_time: str, end_time: str, tiers: list) -> list:
+    """
+    Splits a time range into the windows of the resolution tiers (see parse_resolution_tiers).
+
+    Neighbouring tiers share their boundary time. Tiers that fall entirely before
+    `start_time` are left out.
+
+    Returns:
+    - list: (start_time, end_time, alignment period) tuples, newest tier first.
+    """
+    start = parse_rfc3339(start_time)
+    end = parse_rfc3339(end_time)
+
+    windows = []
+    window_end = end
+    for period, age in tiers:
+        window_start = max(start, end - age) if age is not None else start
+        if window_start < window_end or not windows:
+            windows.append((
+                start_time if window_start == start else format_rfc3339(window_start),
+                end_time if window_end == end else format_rfc3339(window_end),
+                period
+            ))
+        window_end = window_start
+        if window_end <= start:
+            break
+    return windows
@@ -0,0 +1,159 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from utils.rollup import SERIES_COLUMNS, load_points, point_values
+
+# Resources of the usage table, as (usage metric, request metric)
+USAGE_RESOURCES = {
+    "cpu": ("cpu_usage", "cpu_request"),
+    "memory": ("memory_usage", "memory_request")
+}
+
+# Value type of the usage and request columns per resource: cores, and bytes
+RESOURCE_DTYPES = {
+    "cpu": "float64",
+    "memory": "Int64"
+}
+
+# Labels joining a container series to its row in pod_startup
+STARTUP_JOIN_COLUMNS = {
+    "resource.labels.namespace_name": "namespace",
+    "resource.labels.pod_name": "pod_name",
+    "resource.labels.container_name": "container_name"
+}
+
+USAGE_TABLE_NAME = "usage"
+
+
+def _startup_columns(pod_startup: pd.DataFrame, labels: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the readiness probe, scheduled and ready times and startup seconds of the
+    container of each row of `labels`, missing where pod_startup has no such container.
+    """
+    columns = pd.DataFrame({
+        'readiness_probe_exists': pd.array([pd.NA] * len(labels), dtype='boolean'),
+        'pod_scheduled_time': pd.Series(pd.NaT, index=labels.index, dtype='datetime64[ns, UTC]'),
+        'pod_ready_time': pd.Series(pd.NaT, index=labels.index, dtype='datetime64[ns, UTC]')
+    }, index=labels.index)
+
+    required = list(STARTUP_JOIN_COLUMNS.values()) + ['PodScheduled_lastTransitionTime', 'Ready_lastTransitionTime']
+    if isinstance(pod_startup, pd.DataFrame) and not pod_startup.empty and set(required) <= set(pod_startup.columns):
+        startup = pd.DataFrame({
+            **{label: pod_startup[column].astype(object) for label, column in STARTUP_JOIN_COLUMNS.items()},
+            'readiness_probe_exists': pod_startup['readiness_probe_exists'].astype('boolean'),
+            # Conditions not reported by the pod are 'Unknown'
+            'pod_scheduled_time': pd.to_datetime(pod_startup['PodScheduled_lastTransitionTime'], errors='coerce', utc=True),
+            'pod_ready_time': pd.to_datetime(pod_startup['Ready_lastTransitionTime'], errors='coerce', utc=True)
+        }).drop_duplicates(list(STARTUP_JOIN_COLUMNS), keep='last')
+        joined = labels[list(STARTUP_JOIN_COLUMNS)].astype(object).merge(startup, on=list(STARTUP_JOIN_COLUMNS), how='left')
+        for column in columns.columns:
+            columns[column] = joined[column].astype(columns[column].dtype).to_numpy()
+
+    columns['startup_seconds'] = (columns['pod_ready_time'] - columns['pod_scheduled_time']).dt.total_seconds()
+    return columns
+
+
+def build_usage_table(metrics_data: dict) -> pd.DataFrame:
+    """
+    Joins the usage and request metrics of an export, and the startup of each pod, into one
+    wide table with a row per container series and point in time.
+
+    The rows are the points of the usage metrics, joined on the series labels and
+    interval.endTime. Each row gets the request of the same series in effect at its end
+    time: the latest request point at or before it, since requests hold until they change.
+    The series and times of all metrics are coded as integers, so both joins are one sort
+    and binary searches over arrays instead of merges of label columns.
+
+    Parameters:
+    - metrics_data (dict): The DataFrames returned by fetch_all_metrics (or the files
+      written when streaming), including pod_startup when assets were fetched.
+
+    Returns:
+    - pd.DataFrame: The series labels (categorical), interval times (UTC), per resource of
+      USAGE_RESOURCES the usage, request and utilization (usage / request, missing without
+      a positive request), and the readiness probe, scheduled, ready and startup seconds
+      of the pod. Ordered by series, then oldest point first. Empty without usage metrics.
+    """
+    points = {}
+    for usage_key, request_key in USAGE_RESOURCES.values():
+        for key in (usage_key, request_key):
+            data = metrics_data.get(key)
+            if isinstance(data, Path) and not data.exists():
+                continue
+            if data is not None:
+                df = load_points(data)
+                if not df.empty:
+                    points[key] = df
+    usage_keys = [usage_key for usage_key, _ in USAGE_RESOURCES.values() if usage_key in points]
+    if not usage_keys:
+        return pd.DataFrame()
+
+    # Series codes shared by all metrics, in label order, so equal labels get equal codes
+    keys = list(points)
+    labels = pd.concat([points[key].reindex(columns=SERIES_COLUMNS).astype(object) for key in keys], ignore_index=True)
+    codes = labels.groupby(SERIES_COLUMNS, dropna=False, sort=True).ngroup().to_numpy(dtype=np.int64)
+    offsets = np.cumsum([0] + [len(points[key]) for key in keys])
+    end_times = {key: points[key]['interval.endTime'].to_numpy(dtype='datetime64[ns]').view(np.int64) for key in keys}
+    all_times = np.unique(np.concatenate(list(end_times.values())))
+
+    # One int64 key per (series, time), ordered by series and then time
+    join_keys = {
+        key: codes[offsets[index]:offsets[index + 1]] * len(all_times) + np.searchsorted(all_times, end_times[key])
+        for index, key in enumerate(keys)
+    }
+    row_keys = np.unique(np.concatenate([join_keys[key] for key in usage_keys]))
+    row_codes = row_keys // len(all_times)
+
+    # The usage metrics share the end times of a row; the first one present sets its start time
+    start_times = np.full(len(row_keys), np.datetime64('NaT'), dtype='datetime64[ns]')
+    for key in reversed(usage_keys):
+        start_times[np.searchsorted(row_keys, join_keys[key])] = points[key]['interval.startTime'].to_numpy(dtype='datetime64[ns]')
+    table = pd.DataFrame({
+        'interval.startTime': pd.DatetimeIndex(start_times).tz_localize('UTC'),
+        'interval.endTime': pd.DatetimeIndex(all_times[row_keys % len(all_times)]).tz_localize('UTC')
+    })
+
+    # Labels of each series code, expanded to the rows as categoricals without copying strings
+    series_labels = labels.take(np.unique(codes, return_index=True)[1]).reset_index(drop=True)
+    for column in SERIES_COLUMNS:
+        label_codes, label_values = pd.factorize(series_labels[column])
+        table[column] = pd.Categorical.from_codes(label_codes[row_codes], categories=label_values)
+
+    for resource, (usage_key, request_key) in USAGE_RESOURCES.items():
+        usage = np.full(len(row_keys), np.nan)
+        if usage_key in points:
+            usage[np.searchsorted(row_keys, join_keys[usage_key])] = point_values(points[usage_key])
+
+        request = np.full(len(row_keys), np.nan)
+        if request_key in points:
+            # As-of join: the last request point of the same series at or before each row
+            order = np.argsort(join_keys[request_key], kind='stable')
+            request_keys = join_keys[request_key][order]
+            positions = np.searchsorted(request_keys, row_keys, side='right') - 1
+            matched = (positions >= 0) & (request_keys[np.maximum(positions, 0)] // len(all_times) == row_codes)
+            request_values = point_values(points[request_key])[order]
+            request = np.where(matched, request_values[np.maximum(positions, 0)], np.nan)
+
+        dtype = RESOURCE_DTYPES[resource]
+        table[f'{resource}_usage'] = pd.Series(usage if dtype == 'float64' else usage.round()).astype(dtype)
+        table[f'{resource}_request'] = pd.Series(request if dtype == 'float64' else request.round()).astype(dtype)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table[f'{resource}_utilization'] = np.where(request > 0, usage / request, np.nan)
+
+    startup = _startup_columns(metrics_data.get('pod_startup'), table)
+    return pd.concat([table, startup], axis=1)
+
+
+def add_usage_table(metrics_data: dict) -> dict:
+    """
+    Adds the usage table (see build_usage_table) to the DataFrames of an export.
+
+    Returns:
+    - dict: The DataFrames to save, with the usage table under USAGE_TABLE_NAME if the
+      export has usage metrics.
+    """
+    table = build_usage_table(metrics_data)
+    if table.empty:
+        return metrics_data
+    return {**metrics_data, USAGE_TABLE_NAME: table}